@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Device memory sub-allocator. Vulkan drivers limit the number of memory
+    allocations (maxMemoryAllocationCount) and each allocation has a cost, so
+    the resources share large memory blocks instead of calling
+    vkAllocateMemory once per buffer or image.
+
+    The blocks are grouped by memory type. Each block keeps a sorted free
+    list of ranges; freed ranges are merged with their neighbours.
+"""
+import vk, weakref
+from bisect import bisect_left, insort
+from ctypes import byref
+
+# Default size of a memory block
+DEFAULT_BLOCK_SIZE = 16 * 1024 * 1024
+
+def align_up(value, alignment):
+    return (value + alignment - 1) // alignment * alignment
+
+class Allocation(object):
+    """
+        A range of a memory block. `offset` is the aligned offset of the resource in
+        `memory`, `start` and `end` delimit the range reserved in the block (with the
+        alignment padding).
+    """
+
+    __slots__ = ('block', 'memory', 'offset', 'size', 'start', 'end', 'linear')
+
+    def __init__(self, block, offset, size, start, end, linear):
+        self.block = block
+        self.memory = block.memory
+        self.offset = offset
+        self.size = size
+        self.start = start
+        self.end = end
+        self.linear = linear
+
+    @property
+    def mapped(self):
+        """
+            Host address of the allocation. The block is mapped the first time
+            and stays mapped until it is released.
+        """
+        return self.block.map() + self.offset
+
+class MemoryBlock(object):
+    """
+        A single vkAllocateMemory allocation split in ranges
+    """
+
+    def __init__(self, allocator, memory_type, size, dedicated=False):
+        app = allocator.app()
+
+        alloc_info = vk.MemoryAllocateInfo(
+            s_type=vk.STRUCTURE_TYPE_MEMORY_ALLOCATE_INFO, next=None,
+            allocation_size=size, memory_type_index=memory_type
+        )
+
+        memory = vk.DeviceMemory(0)
+        result = app.AllocateMemory(app.device, byref(alloc_info), None, byref(memory))
+        if result != vk.SUCCESS:
+            raise RuntimeError('Could not allocate a memory block of {} bytes'.format(size))
+
+        self.allocator = weakref.ref(allocator)
+        self.memory = memory
+        self.memory_type = memory_type
+        self.size = size
+        self.dedicated = dedicated       # Holds a single resource
+        self.mapped_ptr = None
+        self.free_ranges = [(0, size)]  # Sorted (offset, size) of the free ranges
+        self.allocations = {}           # start -> Allocation
+        self.allocations_end = {}       # end -> Allocation
+
+    def map(self):
+        if self.mapped_ptr is None:
+            app = self.allocator().app()
+            mapped = vk.c_void_p(0)
+            result = app.MapMemory(app.device, self.memory, 0, self.size, 0, byref(mapped))
+            if result != vk.SUCCESS:
+                raise RuntimeError('Failed to map a memory block')
+
+            self.mapped_ptr = mapped.value
+
+        return self.mapped_ptr
+
+    def allocate(self, size, alignment, linear, granularity):
+        """
+            Return an allocation of `size` bytes or None if the block is too fragmented.
+            Linear (buffers) and non-linear (optimal images) resources that are neighbours
+            never share a `granularity` page (bufferImageGranularity).
+        """
+        for index, (start, free_size) in enumerate(self.free_ranges):
+            end = start + free_size
+            offset = align_up(start, alignment)
+
+            # The previous resource is of another kind and may share the first page
+            previous = self.allocations_end.get(start)
+            if previous is not None and previous.linear != linear:
+                offset = align_up(offset, granularity)
+
+            if offset + size > end:
+                continue
+
+            # The next resource is of another kind and may share the last page
+            following = self.allocations.get(end)
+            if following is not None and following.linear != linear:
+                if (offset + size - 1) // granularity == end // granularity:
+                    continue
+
+            allocation = Allocation(self, offset, size, start, offset + size, linear)
+            if allocation.end == end:
+                del self.free_ranges[index]
+            else:
+                self.free_ranges[index] = (allocation.end, end - allocation.end)
+
+            self.allocations[allocation.start] = allocation
+            self.allocations_end[allocation.end] = allocation
+            return allocation
+
+        return None
+
+    def free(self, allocation):
+        del self.allocations[allocation.start]
+        del self.allocations_end[allocation.end]
+
+        start, end = allocation.start, allocation.end
+        ranges = self.free_ranges
+        index = bisect_left(ranges, (start, 0))
+
+        # Merge with the next free range
+        if index < len(ranges) and ranges[index][0] == end:
+            end += ranges[index][1]
+            del ranges[index]
+
+        # Merge with the previous free range
+        if index > 0 and sum(ranges[index-1]) == start:
+            index -= 1
+            start = ranges[index][0]
+            del ranges[index]
+
+        insort(ranges, (start, end - start))
+
+    def release(self):
+        app = self.allocator().app()
+        if self.mapped_ptr is not None:
+            app.UnmapMemory(app.device, self.memory)
+            self.mapped_ptr = None
+
+        app.FreeMemory(app.device, self.memory, None)
+
+class MemoryAllocator(object):
+    """
+        Sub-allocate the device memory. The blocks are keyed by memory type (see
+        `Application.get_memory_type`). Resources bigger than half a block get a
+        dedicated block that is released with the resource.
+
+        Usage:
+            allocation = allocator.allocate_buffer(buffer, vk.MEMORY_PROPERTY_DEVICE_LOCAL_BIT)
+            ...
+            allocator.free(allocation)
+    """
+
+    def __init__(self, app, block_size=DEFAULT_BLOCK_SIZE):
+        self.app = weakref.ref(app)
+        self.block_size = block_size
+        self.blocks = {}  # memory type -> [MemoryBlock]
+
+        limits = app.gpu_props.limits
+        self.granularity = max(limits.buffer_image_granularity, 1)
+        self.max_allocations = limits.max_memory_allocation_count
+        self.counters = {'allocated': 0, 'freed': 0, 'blocks_allocated': 0, 'blocks_released': 0}
+
+    def memory_type(self, memreq, properties):
+        app = self.app()
+        found, memory_type = app.get_memory_type(memreq.memory_type_bits, properties)
+        if not found:
+            raise RuntimeError('Could not find a memory type with the properties {}'.format(properties))
+
+        return memory_type
+
+    def block_size_for(self, memory_type):
+        # Small heaps (ex: the host visible device local heap of some GPU) get smaller blocks
+        app = self.app()
+        heap = app.gpu_mem.memory_heaps[app.gpu_mem.memory_types[memory_type].heap_index]
+        return max(min(self.block_size, heap.size // 8), 1)
+
+    def allocate(self, memreq, properties, linear=True):
+        """
+            Return an Allocation matching the memory requirements `memreq`
+        """
+        memory_type = self.memory_type(memreq, properties)
+        size, alignment = memreq.size, max(memreq.alignment, 1)
+        blocks = self.blocks.setdefault(memory_type, [])
+
+        block_size = self.block_size_for(memory_type)
+        if size <= block_size // 2:
+            for block in blocks:
+                allocation = block.allocate(size, alignment, linear, self.granularity)
+                if allocation is not None:
+                    break
+            else:
+                block = self.new_block(memory_type, block_size)
+                allocation = block.allocate(size, alignment, linear, self.granularity)
+        else:
+            block = self.new_block(memory_type, size, dedicated=True)
+            allocation = block.allocate(size, alignment, linear, self.granularity)
+
+        self.counters['allocated'] += 1
+        return allocation
+
+    def allocate_buffer(self, buffer, properties):
+        """
+            Allocate and bind the memory of a buffer
+        """
+        app = self.app()
+        memreq = vk.MemoryRequirements()
+        app.GetBufferMemoryRequirements(app.device, buffer, byref(memreq))
+
+        allocation = self.allocate(memreq, properties, linear=True)
+        result = app.BindBufferMemory(app.device, buffer, allocation.memory, allocation.offset)
+        if result != vk.SUCCESS:
+            raise RuntimeError('Could not bind the buffer memory')
+
+        return allocation
+
+    def allocate_image(self, image, properties, linear=False):
+        """
+            Allocate and bind the memory of an image. `linear` must be True for images
+            created with the linear tiling.
+        """
+        app = self.app()
+        memreq = vk.MemoryRequirements()
+        app.GetImageMemoryRequirements(app.device, image, byref(memreq))
+
+        allocation = self.allocate(memreq, properties, linear=linear)
+        result = app.BindImageMemory(app.device, image, allocation.memory, allocation.offset)
+        if result != vk.SUCCESS:
+            raise RuntimeError('Could not bind the image memory')
+
+        return allocation
+
+    def new_block(self, memory_type, size, dedicated=False):
+        if self.max_allocations and self.block_count() >= self.max_allocations:
+            raise RuntimeError('Reached the maximum number of memory allocations ({})'.format(self.max_allocations))
+
+        block = MemoryBlock(self, memory_type, size, dedicated)
+        self.blocks[memory_type].append(block)
+        self.counters['blocks_allocated'] += 1
+        return block
+
+    def free(self, allocation):
+        """
+            Return the range of an allocation to its block. Empty blocks are released,
+            except the last block of a memory type.
+        """
+        if allocation is None:
+            return
+
+        block = allocation.block
+        block.free(allocation)
+        self.counters['freed'] += 1
+
+        blocks = self.blocks[block.memory_type]
+        if len(block.allocations) == 0 and (len(blocks) > 1 or block.dedicated):
+            blocks.remove(block)
+            block.release()
+            self.counters['blocks_released'] += 1
+
+    def block_count(self):
+        return sum(len(blocks) for blocks in self.blocks.values())
+
+    def stats(self):
+        """
+            Return the memory usage per memory type and in total. `fragmentation` is
+            1 - (largest free range / free bytes): 0 when the free memory is contiguous.
+        """
+        def summary(blocks):
+            free_ranges = [size for block in blocks for _, size in block.free_ranges]
+            reserved = sum(block.size for block in blocks)
+            free = sum(free_ranges)
+            largest = max(free_ranges, default=0)
+            return {
+                'blocks': len(blocks),
+                'allocations': sum(len(block.allocations) for block in blocks),
+                'reserved': reserved,
+                'used': reserved - free,
+                'free': free,
+                'largest_free': largest,
+                'free_ranges': len(free_ranges),
+                'fragmentation': (1.0 - largest / free) if free else 0.0,
+            }
+
+        stats = {'types': {memory_type: summary(blocks) for memory_type, blocks in self.blocks.items() if blocks}}
+        stats['total'] = summary([block for blocks in self.blocks.values() for block in blocks])
+        stats['total'].update(self.counters)
+        return stats
+
+    def destroy(self):
+        for blocks in self.blocks.values():
+            for block in blocks:
+                block.release()
+
+        self.blocks = {}
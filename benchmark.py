@@ -0,0 +1,1057 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Benchmarks for the vulkan triangle example. Each benchmark prints
+    its results on the standard output.
+
+    To run every benchmark call:
+    ``python benchmark.py``
+
+    To run some benchmarks call:
+    ``python benchmark.py frames_in_flight``
+"""
+import sys, os, gc, time, timeit, re, subprocess
+from os import path
+
+
+def render_for(app, duration):
+    """
+        Render frames for `duration` seconds and return the frame rate
+    """
+    frames = 0
+    start = time.perf_counter()
+    end = start + duration
+    now = start
+    while now < end:
+        app.render_frame()
+        frames += 1
+        now = time.perf_counter()
+
+    app.DeviceWaitIdle(app.device)
+    return frames / (now - start)
+
+
+def bench_frames_in_flight(duration=5.0):
+    """
+        Compare the fully serialized rendering with the pipelined rendering
+    """
+    from triangle import TriangleApplication
+
+    for frames_in_flight in (0, 1, 2, 3):
+        app = TriangleApplication(frames_in_flight=frames_in_flight)
+        app.initialized = True
+        fps = render_for(app, duration)
+
+        del app
+        gc.collect()
+
+        if frames_in_flight == 0:
+            label = 'serialized'
+        else:
+            label = '{} frame(s) in flight'.format(frames_in_flight)
+
+        print('{:<24} {:>10.1f} fps'.format(label, fps))
+
+
+def bench_post_present(duration=5.0):
+    """
+        Compare a separate post present submit with a post present barrier
+        merged into the draw command buffers
+    """
+    from triangle import TriangleApplication
+
+    for frames_in_flight in (0, 2):
+        for merge in (False, True):
+            app = TriangleApplication(frames_in_flight=frames_in_flight, merge_post_present=merge)
+            app.initialized = True
+            fps = render_for(app, duration)
+            counters = app.counters_per_frame()
+
+            del app
+            gc.collect()
+
+            label = '{} / {}'.format(
+                'serialized' if frames_in_flight == 0 else 'pipelined',
+                'merged' if merge else 'separate'
+            )
+            print('{:<24} {:>10.1f} fps {:>6.2f} submits/frame {:>6.2f} waits/frame'.format(
+                label, fps, counters['submits'], counters['queue_waits']
+            ))
+
+
+def bench_xmath(number=100000):
+    """
+        Compare the cost per call of the pure python and the numpy matrix functions.
+        The lru caches of the python functions are bypassed.
+    """
+    import xmath, xmath_numpy
+    from xmath import Mat4
+
+    out = Mat4().as_array()
+    cases = (
+        ('perspective', lambda: xmath.perspective.__wrapped__(60.0, 1.7, 0.1, 256.0),
+                        lambda: xmath_numpy.perspective(60.0, 1.7, 0.1, 256.0, out=out)),
+        ('translate', lambda: xmath.translate.__wrapped__(None, (0.0, 0.0, -2.5)),
+                      lambda: xmath_numpy.translate(None, (0.0, 0.0, -2.5), out=out)),
+        ('rotate', lambda: xmath.rotate(None, 45.0, (1.0, 0.0, 0.0)),
+                   lambda: xmath_numpy.rotate(None, 45.0, (1.0, 0.0, 0.0), out=out)),
+    )
+
+    for name, python_fn, numpy_fn in cases:
+        python_t = timeit.timeit(python_fn, number=number) / number * 1e6
+        numpy_t = timeit.timeit(numpy_fn, number=number) / number * 1e6
+        print('{:<12} python {:>8.2f} us/call   numpy {:>8.2f} us/call'.format(name, python_t, numpy_t))
+
+
+def bench_xmath_many(count=10000, number=10):
+    """
+        Compute `count` model matrices with a python loop VS the batched functions
+    """
+    import numpy as np
+    import xmath_numpy
+    from xmath import rotate
+
+    angles = np.random.uniform(0.0, 360.0, (count, 2))
+    offsets = np.random.uniform(-10.0, 10.0, (count, 3))
+    block = np.empty((count, 4, 4), dtype=np.float32)
+
+    def loop():
+        for index in range(count):
+            mat = rotate(None, angles[index, 0], (1.0, 0.0, 0.0))
+            mat = rotate(mat, angles[index, 1], (0.0, 1.0, 0.0))
+            block[index] = mat
+            block[index, 3] += np.dot(offsets[index], block[index, :3])
+
+    def batched():
+        mats = xmath_numpy.rotate_many(None, angles[:, 0], (1.0, 0.0, 0.0))
+        mats = xmath_numpy.rotate_many(mats, angles[:, 1], (0.0, 1.0, 0.0))
+        xmath_numpy.translate_many(mats, offsets, out=block)
+
+    loop_t = timeit.timeit(loop, number=number) / number * 1e3
+    batched_t = timeit.timeit(batched, number=number) / number * 1e3
+    print('{} matrices: python loop {:>8.2f} ms   batched {:>8.2f} ms'.format(count, loop_t, batched_t))
+
+
+def bench_function_loading(number=200):
+    """
+        Compare the eager loading of every vulkan function with the lazy function
+        tables. A stub loader returns the same function pointer for every name, so
+        the benchmark measures the python side of the loading only.
+        The lazy tables resolve the functions used by triangle.py.
+    """
+    from ctypes import cast, c_void_p
+    import vk
+
+    stub = cast(vk.GetInstanceProcAddr, c_void_p).value
+    loader = lambda vk_object, name: stub
+
+    functions_lists = (
+        vk.InstanceFunctions, vk.PhysicalDeviceFunctions, vk.QueueFunctions,
+        vk.DeviceFunctions, vk.CommandBufferFunctions
+    )
+
+    with open(path.join(path.dirname(path.abspath(__file__)), 'triangle.py')) as f:
+        used = set(re.findall(r'(?:self|app)\.([A-Z]\w+)\(', f.read()))
+
+    def eager():
+        vk.function_prototype.cache_clear()
+        for functions_list in functions_lists:
+            vk.load_functions(0, functions_list, loader)
+
+    def lazy():
+        vk.function_prototype.cache_clear()
+        tables = [vk.FunctionTable(0, functions_list, loader) for functions_list in functions_lists]
+        for name in used:
+            for table in tables:
+                if name in table:
+                    getattr(table, name)
+                    break
+
+    count = sum(len(x) for x in functions_lists)
+    eager_t = timeit.timeit(eager, number=number) / number * 1e3
+    lazy_t = timeit.timeit(lazy, number=number) / number * 1e3
+    print('eager ({} functions) {:>8.3f} ms'.format(count, eager_t))
+    print('lazy  ({} functions) {:>8.3f} ms'.format(len(used), lazy_t))
+
+
+def bench_import_time(runs=5):
+    """
+        Cold start of the vk module measured with ``python -X importtime``, then
+        the time needed to create every lazy definition of the module. Fails if a
+        public name of the module before the lazy definitions (vk_exports.txt) is
+        missing, or if the names cannot be created from several threads at once.
+    """
+    root = path.dirname(path.abspath(__file__))
+    code = (
+        'import time, vk\n'
+        't = time.perf_counter()\n'
+        'names = [n for n in dir(vk) if not n.startswith("__")]\n'
+        'for n in names: getattr(vk, n)\n'
+        'print("resolve", len(names), (time.perf_counter()-t)*1e6)\n'
+    )
+
+    import_us, resolve_us, count = [], [], 0
+    for _ in range(runs):
+        out = subprocess.run(
+            (sys.executable, '-X', 'importtime', '-c', code),
+            cwd=root, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True
+        )
+        if out.returncode != 0:
+            raise RuntimeError(out.stderr)
+
+        for line in out.stderr.splitlines():
+            fields = [x.strip() for x in line.split('|')]
+            if len(fields) == 3 and fields[2] == 'vk':
+                import_us.append(int(fields[1]))
+
+        _, count, resolve = out.stdout.split()
+        resolve_us.append(float(resolve))
+
+    print('import vk (cumulative)   {:>10.0f} us'.format(min(import_us)))
+    print('resolve {} names     {:>10.0f} us'.format(count, min(resolve_us)))
+
+    # The names are checked against a frozen list, not against `dir(vk)` that lists the lazy definitions
+    code = (
+        'import sys, vk\n'
+        'names = open("vk_exports.txt").read().split()\n'
+        'missing = [n for n in names if not hasattr(vk, n)]\n'
+        'if missing: sys.exit(repr(missing[:20]))\n'
+        'print(len(names))\n'
+    )
+    out = subprocess.run((sys.executable, '-c', code), cwd=root, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if out.returncode != 0:
+        raise RuntimeError('Missing vk names: ' + out.stderr)
+    count = out.stdout.strip()
+    print('{} exported names: ok'.format(count))
+
+    # The first access of the definitions from several threads at once
+    code = (
+        'import sys, threading, random, vk\n'
+        'sys.setswitchinterval(1e-6)\n'
+        'names = open("vk_exports.txt").read().split()\n'
+        'errors = []\n'
+        'def resolve(names):\n'
+        '    for n in names:\n'
+        '        try: getattr(vk, n)\n'
+        '        except Exception as e: errors.append((n, e))\n'
+        'threads = [threading.Thread(target=resolve, args=(random.sample(names, len(names)),)) for _ in range(8)]\n'
+        'for t in threads: t.start()\n'
+        'for t in threads: t.join()\n'
+        'if errors: sys.exit(repr(errors[:5]))\n'
+    )
+    out = subprocess.run((sys.executable, '-c', code), cwd=root, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if out.returncode != 0:
+        raise RuntimeError('Concurrent resolution of the vk names failed: ' + out.stderr)
+    print('resolve {} names from 8 threads: ok'.format(count))
+
+
+def bench_headless(duration=5.0):
+    """
+        Frame rate of the offscreen rendering. Without the presentation engine,
+        the numbers measure the CPU side of a frame and the GPU throughput.
+    """
+    from triangle import TriangleApplication
+
+    for frames_in_flight in (0, 1, 2, 3):
+        app = TriangleApplication(frames_in_flight=frames_in_flight, headless=True)
+        app.initialized = True
+        fps = render_for(app, duration)
+        counters = app.counters_per_frame()
+
+        del app
+        gc.collect()
+
+        if frames_in_flight == 0:
+            label = 'serialized'
+        else:
+            label = '{} frame(s) in flight'.format(frames_in_flight)
+
+        print('{:<24} {:>10.1f} fps {:>6.2f} submits/frame'.format(label, fps, counters['submits']))
+
+
+def bench_readback(duration=5.0):
+    """
+        Frame rate of the offscreen rendering with and without the frame readback.
+        The frames are consumed with a copy of their data, like an encoder would.
+    """
+    from triangle import TriangleApplication
+
+    for readback in (False, True):
+        app = TriangleApplication(headless=True, readback=readback)
+        app.initialized = True
+
+        frames = copied = 0
+        start = time.perf_counter()
+        end = start + duration
+        now = start
+        while now < end:
+            app.render_frame()
+            frames += 1
+            if readback:
+                for frame in app.readback.poll():
+                    copied += len(bytes(frame['data']))
+            now = time.perf_counter()
+
+        app.DeviceWaitIdle(app.device)
+        elapsed = now - start
+        dropped = app.readback.dropped if readback else 0
+
+        del app
+        gc.collect()
+
+        label = 'readback' if readback else 'no readback'
+        print('{:<24} {:>10.1f} fps {:>10.1f} MB/s {:>6} dropped'.format(
+            label, frames / elapsed, copied / elapsed / 1e6, dropped
+        ))
+
+
+def bench_memory(count=1000):
+    """
+        Create `count` small vertex buffers with one vkAllocateMemory each VS the
+        memory sub-allocator, then print the allocator statistics
+    """
+    from ctypes import byref
+    from triangle import TriangleApplication
+    import vk
+
+    app = TriangleApplication(headless=True)
+    buffer_info = vk.BufferCreateInfo(
+        s_type=vk.STRUCTURE_TYPE_BUFFER_CREATE_INFO, next=None,
+        flags=0, size=256, usage=vk.BUFFER_USAGE_VERTEX_BUFFER_BIT,
+        sharing_mode=0, queue_family_index_count=0, queue_family_indices=None
+    )
+
+    def create_buffers():
+        buffers = [vk.Buffer(0) for _ in range(count)]
+        for buffer in buffers:
+            app.CreateBuffer(app.device, byref(buffer_info), None, byref(buffer))
+        return buffers
+
+    def per_resource(buffers):
+        memreq = vk.MemoryRequirements()
+        memories = []
+        for buffer in buffers:
+            app.GetBufferMemoryRequirements(app.device, buffer, byref(memreq))
+            alloc_info = vk.MemoryAllocateInfo(
+                s_type=vk.STRUCTURE_TYPE_MEMORY_ALLOCATE_INFO, next=None, allocation_size=memreq.size,
+                memory_type_index=app.get_memory_type(memreq.memory_type_bits, vk.MEMORY_PROPERTY_DEVICE_LOCAL_BIT)[1]
+            )
+            memory = vk.DeviceMemory(0)
+            app.AllocateMemory(app.device, byref(alloc_info), None, byref(memory))
+            app.BindBufferMemory(app.device, buffer, memory, 0)
+            memories.append(memory)
+
+        for buffer, memory in zip(buffers, memories):
+            app.DestroyBuffer(app.device, buffer, None)
+            app.FreeMemory(app.device, memory, None)
+
+    def sub_allocated(buffers):
+        allocations = [app.allocator.allocate_buffer(buffer, vk.MEMORY_PROPERTY_DEVICE_LOCAL_BIT) for buffer in buffers]
+        stats = app.allocator.stats()['total']
+
+        for buffer, allocation in zip(buffers, allocations):
+            app.DestroyBuffer(app.device, buffer, None)
+            app.allocator.free(allocation)
+
+        return stats
+
+    buffers = create_buffers()
+    start = time.perf_counter()
+    per_resource(buffers)
+    per_resource_t = (time.perf_counter() - start) * 1e3
+
+    buffers = create_buffers()
+    start = time.perf_counter()
+    stats = sub_allocated(buffers)
+    sub_allocated_t = (time.perf_counter() - start) * 1e3
+
+    del app
+    gc.collect()
+
+    print('one allocation per buffer {:>10.2f} ms ({} allocations)'.format(per_resource_t, count))
+    print('sub-allocator             {:>10.2f} ms ({} blocks)'.format(sub_allocated_t, stats['blocks']))
+    print('used {} / reserved {} bytes, fragmentation {:.2f}'.format(stats['used'], stats['reserved'], stats['fragmentation']))
+
+
+def bench_upload(count=1000, size=256):
+    """
+        Upload `count` blocks of `size` bytes with one submit and one queue wait per
+        block VS the batched uploader. Fails if awaiting an unfinished upload fails.
+    """
+    from ctypes import byref
+    from triangle import TriangleApplication
+    import vk
+
+    app = TriangleApplication(headless=True)
+    buffer_info = vk.BufferCreateInfo(
+        s_type=vk.STRUCTURE_TYPE_BUFFER_CREATE_INFO, next=None,
+        flags=0, size=count*size, usage=vk.BUFFER_USAGE_TRANSFER_DST_BIT,
+        sharing_mode=0, queue_family_index_count=0, queue_family_indices=None
+    )
+    buffer = vk.Buffer(0)
+    app.CreateBuffer(app.device, byref(buffer_info), None, byref(buffer))
+    memory = app.allocator.allocate_buffer(buffer, vk.MEMORY_PROPERTY_DEVICE_LOCAL_BIT)
+    data = bytes(size)
+
+    def one_by_one():
+        # One submit and one queue wait per block, like the old create_triangle
+        for index in range(count):
+            app.uploader.upload(buffer, data, index*size)
+            app.uploader.flush()
+            app.QueueWaitIdle(app.queue)
+
+    def batched():
+        for index in range(count):
+            app.uploader.upload(buffer, data, index*size)
+        app.uploader.flush().wait()
+
+    start = time.perf_counter()
+    one_by_one()
+    one_by_one_t = (time.perf_counter() - start) * 1e3
+
+    start = time.perf_counter()
+    batched()
+    batched_t = (time.perf_counter() - start) * 1e3
+
+    # Await an upload that was not even submitted
+    import asyncio
+    future = app.uploader.upload(buffer, bytes(count*size))
+    if future.done():
+        raise RuntimeError('The upload completed before its batch was submitted')
+    async def await_upload():
+        await future
+    asyncio.run(await_upload())
+    if not future.done():
+        raise RuntimeError('The awaited upload is not done')
+
+    app.DeviceWaitIdle(app.device)
+    app.DestroyBuffer(app.device, buffer, None)
+    app.allocator.free(memory)
+    del app
+    gc.collect()
+
+    print('one submit per upload {:>10.2f} ms'.format(one_by_one_t))
+    print('batched               {:>10.2f} ms'.format(batched_t))
+
+
+def bench_pipeline_cache(runs=5):
+    """
+        Startup time of the application with an empty pipeline cache VS the cache
+        saved by the previous run. The cache files are written in a temporary directory.
+    """
+    import tempfile, shutil
+    import triangle
+
+    def startup():
+        start = time.perf_counter()
+        app = triangle.TriangleApplication(headless=True)
+        elapsed = time.perf_counter() - start
+        del app
+        gc.collect()
+        return elapsed * 1e3
+
+    cache_dir = tempfile.mkdtemp()
+    default_dir = triangle.PIPELINE_CACHE_DIR
+    triangle.PIPELINE_CACHE_DIR = cache_dir
+    try:
+        cold, warm = [], []
+        for _ in range(runs):
+            for name in os.listdir(cache_dir):
+                os.unlink(path.join(cache_dir, name))
+            cold.append(startup())
+            warm.append(startup())
+    finally:
+        triangle.PIPELINE_CACHE_DIR = default_dir
+        shutil.rmtree(cache_dir)
+
+    print('startup, empty cache {:>10.2f} ms'.format(min(cold)))
+    print('startup, saved cache {:>10.2f} ms'.format(min(warm)))
+
+
+def bench_shader_read(number=1000):
+    """
+        Read the triangle shaders with the per byte unpack of the old load_shader
+        VS a readinto in a ctypes buffer (shaders.py). The modules are not created.
+    """
+    from ctypes import c_ubyte
+    from shaders import ShaderRegistry
+
+    root = path.join(path.dirname(path.abspath(__file__)), 'shaders')
+    names = ('triangle.vert.spv', 'triangle.frag.spv')
+    registry = ShaderRegistry.__new__(ShaderRegistry)
+    registry.counters = {'reads': 0}
+
+    def unpack():
+        for name in names:
+            with open(path.join(root, name), 'rb') as f:
+                data = f.read()
+            (c_ubyte*len(data))(*data)
+
+    def readinto():
+        for name in names:
+            registry.read(path.join(root, name))
+
+    unpack_t = timeit.timeit(unpack, number=number) / number * 1e6
+    readinto_t = timeit.timeit(readinto, number=number) / number * 1e6
+    print('per byte unpack      {:>10.2f} us'.format(unpack_t))
+    print('readinto + sha1      {:>10.2f} us'.format(readinto_t))
+
+
+def bench_pipelines(runs=3):
+    """
+        Wall clock time to compile a batch of pipeline permutations one after the
+        other VS in the thread pool of `compile_pipelines`. Each run starts with an
+        empty pipeline cache, so the driver really compiles the pipelines.
+    """
+    import tempfile, shutil, itertools
+    import triangle
+    import vk
+    from pipelines import PipelineDescription
+
+    permutations = [
+        PipelineDescription(polygon_mode=polygon_mode, cull_mode=cull_mode, blend=blend, depth_test=depth_test)
+        for polygon_mode, cull_mode, blend, depth_test in itertools.product(
+            (vk.POLYGON_MODE_FILL, vk.POLYGON_MODE_LINE),
+            (vk.CULL_MODE_NONE, vk.CULL_MODE_BACK_BIT),
+            (False, True),
+            (False, True),
+        )
+    ]
+
+    def compile_batch(parallel):
+        for name in os.listdir(cache_dir):
+            os.unlink(path.join(cache_dir, name))
+
+        app = triangle.TriangleApplication(headless=True)
+        start = time.perf_counter()
+        if parallel:
+            pipelines = [future.result() for future in app.compile_pipelines(permutations)]
+        else:
+            pipelines = [app.compile_pipeline(desc) for desc in permutations]
+        elapsed = time.perf_counter() - start
+
+        for pipeline in pipelines:
+            app.destroy_pipeline(pipeline)
+        del app
+        gc.collect()
+        return elapsed * 1e3
+
+    cache_dir = tempfile.mkdtemp()
+    default_dir = triangle.PIPELINE_CACHE_DIR
+    triangle.PIPELINE_CACHE_DIR = cache_dir
+    try:
+        serial = [compile_batch(False) for _ in range(runs)]
+        parallel = [compile_batch(True) for _ in range(runs)]
+    finally:
+        triangle.PIPELINE_CACHE_DIR = default_dir
+        shutil.rmtree(cache_dir)
+
+    print('{} pipelines, serial       {:>10.2f} ms'.format(len(permutations), min(serial)))
+    print('{} pipelines, {} threads   {:>10.2f} ms'.format(len(permutations), triangle.PIPELINE_COMPILE_THREADS, min(parallel)))
+
+
+def bench_pipeline_registry(materials=64, variants=4):
+    """
+        Time to get the pipelines of `materials` materials sharing `variants` pipeline
+        states: one compile per material VS the pipeline registry (pipelines.py).
+    """
+    import vk
+    from triangle import TriangleApplication
+    from pipelines import PipelineDescription
+
+    descriptions = [
+        PipelineDescription(cull_mode=vk.CULL_MODE_BACK_BIT if i % 2 else vk.CULL_MODE_NONE, blend=bool(i % variants // 2))
+        for i in range(materials)
+    ]
+
+    app = TriangleApplication(headless=True)
+
+    start = time.perf_counter()
+    pipelines = [app.compile_pipeline(desc) for desc in descriptions]
+    compile_t = time.perf_counter() - start
+    for pipeline in pipelines:
+        app.destroy_pipeline(pipeline)
+
+    start = time.perf_counter()
+    pipelines = [app.pipelines.acquire(desc) for desc in descriptions]
+    registry_t = time.perf_counter() - start
+    for pipeline in pipelines:
+        app.pipelines.release(pipeline)
+
+    counters = dict(app.pipelines.counters)
+    del app
+    gc.collect()
+
+    print('compile per material {:>10.2f} ms'.format(compile_t * 1e3))
+    print('pipeline registry    {:>10.2f} ms {:>4} hits {:>4} misses'.format(registry_t * 1e3, counters['hits'], counters['misses']))
+
+
+def bench_record(draw_count=5000, runs=5):
+    """
+        Time to record the draw command buffers of every swapchain image with
+        `draw_count` draws, directly in the primary buffers VS in secondary buffers
+        recorded by a pool of threads (recorder.py).
+    """
+    from triangle import TriangleApplication
+
+    for threads in (0, 2, 4, os.cpu_count() or 1):
+        app = TriangleApplication(headless=True, record_threads=threads, draw_count=draw_count)
+        record_t = min(timeit.repeat(app.init_command_buffers, number=1, repeat=runs))
+        del app
+        gc.collect()
+
+        label = 'primary only' if threads == 0 else '{} thread(s)'.format(threads)
+        print('{:<16} {:>10.2f} ms'.format(label, record_t * 1e3))
+
+
+def bench_rerecord(duration=3.0):
+    """
+        Frame rate of the offscreen rendering with the draw command buffers prerecorded
+        once VS recorded every frame from the transient command pool of the frame slot
+    """
+    from triangle import TriangleApplication
+
+    for draw_count in (1, 1000):
+        for rerecord in (False, True):
+            app = TriangleApplication(headless=True, rerecord=rerecord, draw_count=draw_count)
+            app.initialized = True
+            fps = render_for(app, duration)
+            del app
+            gc.collect()
+
+            label = '{} draw(s), {}'.format(draw_count, 'rerecorded' if rerecord else 'prerecorded')
+            print('{:<28} {:>10.1f} fps'.format(label, fps))
+
+
+def bench_gpu_profile(duration=3.0):
+    """
+        GPU time of the frame regions measured by the timestamp queries of the profiler
+    """
+    from triangle import TriangleApplication
+
+    for draw_count in (1, 1000):
+        app = TriangleApplication(headless=True, profile=True, draw_count=draw_count)
+        if app.profiler is None:
+            return
+
+        app.initialized = True
+        fps = render_for(app, duration)
+        averages = app.profiler.averages()
+        del app
+        gc.collect()
+
+        times = ' '.join('{} {:>8.3f} ms'.format(name, ms) for name, ms in averages.items())
+        print('{:>5} draw(s) {:>10.1f} fps  {}'.format(draw_count, fps, times))
+
+
+def bench_frame_times(duration=5.0):
+    """
+        Distribution of the CPU frame time of the offscreen rendering: percentiles
+        and histogram (frametimes.py). The jitter shows in the p99 and the max.
+    """
+    from triangle import TriangleApplication
+
+    for frames_in_flight in (0, 2):
+        app = TriangleApplication(frames_in_flight=frames_in_flight, headless=True)
+        app.initialized = True
+        render_for(app, duration)
+        report = app.frame_timer.report()
+        histogram = app.frame_timer.histogram('total')
+        del app
+        gc.collect()
+
+        print('{} frame(s) in flight'.format(frames_in_flight))
+        for phase, stats in report.items():
+            print('  {:<8} p50 {p50:>8.3f} p95 {p95:>8.3f} p99 {p99:>8.3f} max {max:>8.3f} ms'.format(phase, **stats))
+        print('  total histogram ' + ' '.join('<={}:{}'.format(bound, count) if bound else '>:{}'.format(count) for bound, count in histogram))
+
+
+class StubFunctionTable(object):
+    """
+        Function table of `Application.__getattr__` answering every vulkan function
+        with a stub that returns VK_SUCCESS. No GPU is involved.
+    """
+
+    def __contains__(self, name):
+        return True
+
+    def __getattr__(self, name):
+        return stub_vulkan_function
+
+
+def stub_vulkan_function(*args):
+    return 0
+
+
+def stub_application(headless=True, merge_post_present=True, frames_in_flight=2):
+    """
+        Return a triangle application that is not initialized, with only the state
+        used by `render_frame` and a stub function table. Its frames run without a
+        vulkan device. Outside of the headless mode, the present path is taken with a
+        null swapchain handle.
+    """
+    from ctypes import c_ubyte, sizeof, addressof
+    import triangle, vk
+
+    app = triangle.TriangleApplication.__new__(triangle.TriangleApplication)
+    app.__dict__.update(
+        function_tables=[StubFunctionTable()], instance=None, device=None, queue=None,
+        headless=headless, merge_post_present=merge_post_present, frames_in_flight=frames_in_flight,
+        rerecord=False, readback=None, profiler=None, counters={'frames': 0, 'submits': 0, 'queue_waits': 0},
+        frame_timer=triangle.FrameTimer(), pacer=triangle.FramePacer(),
+        input_state=None, applied_input=None, input_time=None, input_latency=[],
+        input_counters={'events': 0, 'updates': 0, 'skipped': 0},
+        matrices=(triangle.Mat4*3)(), frames=[], frame_index=0
+    )
+
+    app.swapchain = triangle.OffscreenSwapchain(app)
+    app.swapchain.images = (vk.Image*app.swapchain.image_count)()
+    if not headless:
+        app.swapchain.swapchain = vk.SwapchainKHR(0)
+
+    app.image_fences = [None] * app.swapchain.image_count
+    app.draw_buffers = (vk.CommandBuffer*app.swapchain.image_count)()
+    app.post_present_buffers = [] if merge_post_present else (vk.CommandBuffer*app.swapchain.image_count)()
+
+    app.ubo = (c_ubyte * (sizeof(app.matrices) * app.swapchain.image_count))()
+    app.uniform_data = {'mapped': addressof(app.ubo), 'slot_size': sizeof(app.matrices)}
+
+    for _ in range(max(frames_in_flight, 1)):
+        frame = {'present': vk.Semaphore(0), 'render': vk.Semaphore(0), 'fence': vk.Fence(0), 'cmd_pool': None, 'cmdbuf': None}
+        app.create_frame_submit_info(frame)
+        app.frames.append(frame)
+
+    return app
+
+
+def check_gc_free(frames=2000, warmup=2000):
+    """
+        Run `draw` with a stub function table and fail if the steady state frames
+        allocate python objects (tracemalloc). Every submit path is checked: merged
+        and separate post present barrier, offscreen and presented images.
+    """
+    import tracemalloc
+
+    for headless in (True, False):
+        for merge in (True, False):
+            app = stub_application(headless=headless, merge_post_present=merge)
+
+            def render(count):
+                for _ in range(count):
+                    app.render_frame()
+
+            # The stubs are bound and the rings of the frame statistics are filled first
+            render(warmup)
+
+            # Both snapshots are taken at the same point of the loop: the values replaced every
+            # frame (counters, times) are alive once in each of them
+            gc.collect()
+            tracemalloc.start()
+            render(frames)
+            before = tracemalloc.take_snapshot()
+            render(frames)
+            after = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+
+            ignore = (tracemalloc.Filter(False, tracemalloc.__file__),)
+            after, before = after.filter_traces(ignore), before.filter_traces(ignore)
+            stats = [stat for stat in after.compare_to(before, 'lineno') if stat.count_diff > 0]
+            blocks = sum(stat.count_diff for stat in stats)
+            print('{} frames, headless {}, merged post present {}: {} new blocks'.format(frames, headless, merge, blocks))
+            if blocks > 0:
+                raise RuntimeError('draw allocates in the steady state:\n' + '\n'.join(str(stat) for stat in stats[:10]))
+
+
+def check_counters(frames=100):
+    """
+        Run frames with a stub function table and fail if the queue submits and
+        queue waits per frame are not the expected ones. In serialized mode, the
+        device is idled before and after the frame, and the queue once more between
+        the two submits of a separate post present barrier.
+    """
+    expected = {
+        # (frames_in_flight, merge_post_present): counters per frame
+        (2, True): {'submits': 1, 'queue_waits': 0},
+        (2, False): {'submits': 2, 'queue_waits': 0},
+        (0, True): {'submits': 1, 'queue_waits': 2},
+        (0, False): {'submits': 2, 'queue_waits': 3},
+    }
+
+    for (frames_in_flight, merge), counters in expected.items():
+        app = stub_application(merge_post_present=merge, frames_in_flight=frames_in_flight)
+        for _ in range(frames):
+            app.render_frame()
+
+        result = app.counters_per_frame()
+        print('{} frame(s) in flight, merged post present {}: {}'.format(frames_in_flight, merge, result))
+        if result != counters:
+            raise RuntimeError('Expected {} per frame, got {}'.format(counters, result))
+
+
+def bench_gc_free(frames=5000):
+    """
+        Allocations of the steady state render loop, measured with tracemalloc, and
+        frame time jitter with the garbage collector enabled VS frozen (FREEZE_GC)
+    """
+    import tracemalloc
+    import triangle
+
+    for freeze in (False, True):
+        app = triangle.TriangleApplication(headless=True)
+        app.initialized = True
+        for _ in range(100):
+            app.render_frame()
+
+        collections = [0]
+        def count_collections(phase, info):
+            if phase == 'start':
+                collections[0] += 1
+        gc.callbacks.append(count_collections)
+
+        default_freeze = triangle.FREEZE_GC
+        triangle.FREEZE_GC = freeze
+        app.pause_gc()
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        for _ in range(frames):
+            app.render_frame()
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        app.resume_gc()
+        triangle.FREEZE_GC = default_freeze
+        gc.callbacks.remove(count_collections)
+
+        blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+        total = app.frame_timer.report()['total']
+        app.DeviceWaitIdle(app.device)
+        del app
+        gc.collect()
+
+        label = 'gc frozen' if freeze else 'gc enabled'
+        print('{:<12} {:>8.3f} net blocks/frame {:>5} collections  p50 {:>7.3f} ms p99 {:>7.3f} ms max {:>7.3f} ms'.format(
+            label, blocks / frames, collections[0], total['p50'], total['p99'], total['max']
+        ))
+
+
+def bench_render_thread(duration=5.0, input_interval=1/120):
+    """
+        Input latency (input event to the submit of the first frame using it) and frame
+        rate of the asyncio scheduler VS the render thread. The input events are
+        simulated by a coroutine of the event loop.
+    """
+    import asyncio
+    from triangle import TriangleApplication
+
+    loop = asyncio.get_event_loop()
+    for threaded in (False, True):
+        app = TriangleApplication(headless=True, render_thread=threaded)
+
+        async def inputs():
+            end = time.perf_counter() + duration
+            while time.perf_counter() < end:
+                app.rotation[1] += 1.0
+                app.input_changed()
+                await asyncio.sleep(input_interval)
+
+            app.running = False
+            await app.rendering_done.wait()
+
+        app.run()
+        loop.run_until_complete(inputs())
+        latency = app.latency_report()
+        fps = app.counters['frames'] / duration
+        del app
+        gc.collect()
+
+        label = 'render thread' if threaded else 'asyncio'
+        print('{:<14} {:>10.1f} fps  latency p50 {:>7.3f} ms p99 {:>7.3f} ms max {:>7.3f} ms ({} events)'.format(
+            label, fps, latency['p50'], latency['p99'], latency['max'], latency['events']
+        ))
+
+
+def bench_input_coalescing(frames=1000, events_per_frame=8):
+    """
+        Time spent on the camera matrices with `events_per_frame` input events per
+        frame: one matrix update per event VS the input snapshots applied once per
+        frame by `draw`
+    """
+    from triangle import TriangleApplication
+
+    for coalesced in (False, True):
+        app = TriangleApplication(headless=True)
+        app.render_frame()
+
+        t_start = time.perf_counter()
+        for _ in range(frames):
+            for _ in range(events_per_frame):
+                app.rotation[1] += 0.1
+                app.input_changed()
+                if not coalesced:
+                    app.apply_input()
+            app.render_frame()
+        elapsed = time.perf_counter() - t_start
+
+        app.DeviceWaitIdle(app.device)
+        counters = dict(app.input_counters)
+        del app
+        gc.collect()
+
+        label = 'coalesced' if coalesced else 'per event'
+        print('{:<10} {:>8.3f} ms/frame  {} events, {} updates, {} skipped'.format(
+            label, elapsed * 1e3 / frames, counters['events'], counters['updates'], counters['skipped']
+        ))
+
+
+def check_window_events(burst=100, timeout=1.0):
+    """
+        Send synthetic motion events to an XCB window (needs an X server, for example
+        ``xvfb-run``) and fail if they are not handled by the reader of the connection
+        socket within a frame of the old 30 Hz poll, or if a burst is not coalesced.
+        The window is not rendered: the events are only handled by the socket reader.
+    """
+    import asyncio
+    from ctypes import byref
+    import xlib
+
+    if not os.environ.get('DISPLAY'):
+        raise RuntimeError('No X server, run the check with xvfb-run')
+
+    class EventsApplication(object):
+        def __init__(self):
+            self.rotation, self.zoom = [0.0, 0.0, 0.0], -2.5
+            self.running = True
+            self.rendering_done = asyncio.Event()
+            self.handled = None
+            self.handled_time = None
+
+        def input_changed(self):
+            if self.handled_time is None:
+                self.handled_time = time.perf_counter()
+            if self.handled is not None and not self.handled.done():
+                self.handled.set_result(None)
+
+        def resize_display(self, width, height):
+            pass
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    app = EventsApplication()
+    window = xlib.XlibWindow(app)
+    window.show()
+
+    def send_motions(count):
+        event = xlib.xcb_motion_notify_event_t(response_type=xlib.XCB_MOTION_NOTIFY, event=window.window, same_screen=1)
+        for i in range(count):
+            event.event_x, event.event_y = i % 1280, i % 720
+            xlib.xcb_send_event(window.connection, 0, window.window, xlib.XCB_EVENT_MASK_POINTER_MOTION, byref(event))
+        xlib.xcb_flush(window.connection)
+
+    def wait_handled(count):
+        app.handled, app.handled_time = loop.create_future(), None
+        send_motions(count)
+        t_sent = time.perf_counter()
+        loop.run_until_complete(asyncio.wait_for(app.handled, timeout))
+        return app.handled_time - t_sent
+
+    try:
+        # The events of the window creation (map, configure) are handled first
+        loop.run_until_complete(asyncio.sleep(0.1))
+        for name in window.counters:
+            window.counters[name] = 0
+
+        # A single event: handled as soon as the socket is readable
+        latency = wait_handled(1)
+
+        # A burst: the events are all in the socket before the loop runs again
+        app.handled, app.handled_time = None, None
+        send_motions(burst)
+        time.sleep(0.05)
+        loop.run_until_complete(asyncio.sleep(0.05))
+    finally:
+        window.stop_events()
+        counters = dict(window.counters)
+        del window
+        loop.close()
+        asyncio.set_event_loop(None)
+
+    print('latency {:.3f} ms, {} wakeups, {} queue drains, {} events, {} coalesced'.format(
+        latency * 1e3, counters['wakeups'], counters['queue_drains'], counters['events'], counters['coalesced']
+    ))
+    if latency >= 1/30:
+        raise RuntimeError('A motion event took {:.3f} ms to be handled'.format(latency * 1e3))
+    if counters['wakeups'] == 0 or counters['queue_drains'] > 0:
+        raise RuntimeError('The events were not handled by the socket reader')
+    if counters['events'] < burst + 1:
+        raise RuntimeError('{} events handled out of {}'.format(counters['events'], burst + 1))
+    if counters['coalesced'] == 0:
+        raise RuntimeError('The motion events of the burst were not coalesced')
+
+
+def bench_frame_pacing(duration=3.0, input_interval=1/120):
+    """
+        Frame rate, CPU frame time and input latency of every frame pacing policy
+        (pacing.py). The policies are switched at runtime in the same application, the
+        swapchain is recreated when the present mode changes. With TRIANGLE_HEADLESS=1,
+        only the frame rate limit of the policies applies.
+    """
+    from triangle import TriangleApplication
+    from pacing import PACING_POLICIES
+
+    app = TriangleApplication()
+    app.initialized = True
+
+    for policy in PACING_POLICIES:
+        app.set_frame_pacing(policy)
+
+        end = time.perf_counter() + duration
+        t_input = 0.0
+        while time.perf_counter() < end:
+            t_now = time.perf_counter()
+            if t_now - t_input > input_interval:
+                app.rotation[1] += 1.0
+                app.input_changed()
+                t_input = t_now
+
+            app.render_frame()
+            app.pacer.wait()
+
+    app.DeviceWaitIdle(app.device)
+    print(app.pacer.summary())
+    del app
+    gc.collect()
+
+
+BENCHMARKS = {
+    'frames_in_flight': bench_frames_in_flight,
+    'post_present': bench_post_present,
+    'xmath': bench_xmath,
+    'xmath_many': bench_xmath_many,
+    'function_loading': bench_function_loading,
+    'import_time': bench_import_time,
+    'headless': bench_headless,
+    'readback': bench_readback,
+    'memory': bench_memory,
+    'upload': bench_upload,
+    'pipeline_cache': bench_pipeline_cache,
+    'shader_read': bench_shader_read,
+    'pipelines': bench_pipelines,
+    'pipeline_registry': bench_pipeline_registry,
+    'record': bench_record,
+    'rerecord': bench_rerecord,
+    'gpu_profile': bench_gpu_profile,
+    'frame_times': bench_frame_times,
+    'gc_free': bench_gc_free,
+    'gc_free_check': check_gc_free,
+    'counters_check': check_counters,
+    'render_thread': bench_render_thread,
+    'input_coalescing': bench_input_coalescing,
+    'window_events_check': check_window_events,
+    'frame_pacing': bench_frame_pacing,
+}
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS.keys())
+    for name in names:
+        print('--- {} ---'.format(name))
+        BENCHMARKS[name]()
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+"""
+    CPU frame time recorder. The durations of the last frames are kept in
+    preallocated `array('d')` rings (one per phase of the frame), so recording
+    a frame never allocates. The report gives the percentiles and a histogram
+    of every phase: the jitter is visible, not only the average frame rate.
+
+    Usage:
+        timer.record(acquire, submit, present, total)   # seconds
+        timer.report()['total']['p99']                  # milliseconds
+        timer.export('frames.csv')                      # or .json
+"""
+import json, csv
+from array import array
+
+# Number of frames kept by the recorder
+FRAME_TIMES_CAPACITY = 4096
+
+# Phases of a frame
+FRAME_PHASES = ('acquire', 'submit', 'present', 'total')
+
+# Upper bounds of the histogram bins, in milliseconds. The last bin holds the slower frames
+HISTOGRAM_BINS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.7, 33.3, 50.0, 100.0)
+
+def percentile(ordered, p):
+    """
+        Return the percentile `p` (0-100) of a sorted sequence, with the nearest rank method
+    """
+    if not ordered:
+        return 0.0
+
+    rank = max(int(-(-p * len(ordered) // 100)), 1)
+    return ordered[rank - 1]
+
+class FrameTimer(object):
+    """
+        Ring of the phase durations of the last `capacity` frames
+    """
+
+    def __init__(self, capacity=FRAME_TIMES_CAPACITY):
+        self.capacity = capacity
+        self.rings = {phase: array('d', bytes(8 * capacity)) for phase in FRAME_PHASES}
+        self.index = 0    # Next slot of the rings
+        self.count = 0    # Number of frames recorded, all time
+
+    def record(self, acquire, submit, present, total):
+        """
+            Record the durations (in seconds) of a frame
+        """
+        i = self.index
+        rings = self.rings
+        rings['acquire'][i] = acquire
+        rings['submit'][i] = submit
+        rings['present'][i] = present
+        rings['total'][i] = total
+
+        self.index = (i + 1) % self.capacity
+        self.count += 1
+
+    def values(self, phase):
+        """
+            Return the durations of a phase in milliseconds, oldest first
+        """
+        ring = self.rings[phase]
+        if self.count < self.capacity:
+            values = ring[:self.count]
+        else:
+            values = ring[self.index:] + ring[:self.index]
+
+        return [v * 1e3 for v in values]
+
+    def histogram(self, phase, bins=HISTOGRAM_BINS):
+        """
+            Return the number of frames in each bin: [(upper bound in ms, count)]. The
+            upper bound of the last bin is None.
+        """
+        counts = [0] * (len(bins) + 1)
+        for value in self.values(phase):
+            for i, bound in enumerate(bins):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+
+        return list(zip(tuple(bins) + (None,), counts))
+
+    def report(self):
+        """
+            Return the mean, p50, p95, p99 and max of every phase, in milliseconds
+        """
+        report = {}
+        for phase in FRAME_PHASES:
+            values = sorted(self.values(phase))
+            report[phase] = {
+                'frames': len(values),
+                'mean': (sum(values) / len(values)) if values else 0.0,
+                'p50': percentile(values, 50),
+                'p95': percentile(values, 95),
+                'p99': percentile(values, 99),
+                'max': values[-1] if values else 0.0,
+            }
+
+        return report
+
+    def summary(self):
+        """
+            Return a log line with the percentiles of the frame time
+        """
+        total = self.report()['total']
+        return 'frame p50 {p50:.3f} ms, p95 {p95:.3f} ms, p99 {p99:.3f} ms, max {max:.3f} ms'.format(**total)
+
+    def export(self, path):
+        """
+            Write the recorded frames to `path`. A .json file also holds the report and the
+            histograms, any other extension is written as CSV (one row per frame).
+        """
+        columns = [self.values(phase) for phase in FRAME_PHASES]
+
+        if path.endswith('.json'):
+            data = {
+                'frames': {phase: values for phase, values in zip(FRAME_PHASES, columns)},
+                'report': self.report(),
+                'histogram': {phase: self.histogram(phase) for phase in FRAME_PHASES},
+            }
+            with open(path, 'w') as f:
+                json.dump(data, f, indent=1)
+        else:
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['frame'] + ['{}_ms'.format(phase) for phase in FRAME_PHASES])
+                first = self.count - len(columns[0])
+                for i, row in enumerate(zip(*columns)):
+                    writer.writerow([first + i] + ['{:.6f}'.format(v) for v in row])
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Frame pacing. A policy selects the present mode and the number of images
+    of the swapchain, and can limit the frame rate by sleeping until the
+    deadline of the next frame. The achieved frame rate, the CPU frame time
+    and the input latency are kept per policy, so the policies can be compared
+    in a single run.
+
+    Policies:
+        throughput      mailbox or immediate, one image more than the minimum
+        low_latency     immediate or mailbox, the minimum number of images
+        power_saving    fifo (vsync), the minimum number of images, limited to `target_fps`
+
+    Usage:
+        mode = pacer.present_mode(available_modes)    # in Swapchain.create
+        count = pacer.image_count(cap.min_image_count, cap.max_image_count)
+        ...
+        pacer.record_frame(t_end, frame_time)         # after the present
+        time.sleep(pacer.next_delay())                # before the next frame
+"""
+import vk, time
+from collections import namedtuple, deque
+from frametimes import percentile
+
+# Frame rate limit of the power saving policy
+DEFAULT_TARGET_FPS = 30
+
+# Number of frame times and input latencies kept per policy
+PACING_HISTORY = 1024
+
+PacingPolicy = namedtuple('PacingPolicy', ('present_modes', 'extra_images', 'limit_fps'))
+
+PACING_POLICIES = {
+    # Render as many frames as possible, without tearing if mailbox is supported
+    'throughput': PacingPolicy(
+        (vk.PRESENT_MODE_MAILBOX_KHR, vk.PRESENT_MODE_IMMEDIATE_KHR, vk.PRESENT_MODE_FIFO_KHR), 1, False
+    ),
+    # Show the frames as soon as they are rendered, with the shortest present queue
+    'low_latency': PacingPolicy(
+        (vk.PRESENT_MODE_IMMEDIATE_KHR, vk.PRESENT_MODE_MAILBOX_KHR, vk.PRESENT_MODE_FIFO_KHR), 0, False
+    ),
+    # Wait for the vertical blank and sleep between the frames
+    'power_saving': PacingPolicy(
+        (vk.PRESENT_MODE_FIFO_KHR,), 0, True
+    ),
+}
+
+class FramePacer(object):
+    """
+        Present mode, swapchain image count and frame rate limit of the current policy
+    """
+
+    def __init__(self, policy='throughput', target_fps=DEFAULT_TARGET_FPS):
+        self.policy = None
+        self.target_fps = target_fps
+        self.interval = 0.0       # Minimum time between two frames, in seconds. 0 disables the limit
+        self.deadline = 0.0       # Start time of the next frame
+        self.last_frame = None    # End time of the last frame
+        self.stats = {}
+        self.set_policy(policy, target_fps)
+
+    def set_policy(self, policy, target_fps=None):
+        """
+            Select a policy. Return True if the swapchain must be recreated for the
+            new policy (the present mode or the image count change).
+            Can be called while another thread renders: the stats of the policy exist
+            before the policy is switched, with a single attribute assignment.
+        """
+        if policy not in PACING_POLICIES:
+            raise RuntimeError('Unknown frame pacing policy: {}'.format(policy))
+
+        old = PACING_POLICIES.get(self.policy)
+        new = PACING_POLICIES[policy]
+
+        if target_fps is not None:
+            self.target_fps = target_fps
+
+        if policy not in self.stats:
+            self.stats[policy] = {
+                'frames': 0,
+                'time': 0.0,
+                'frame_times': deque(maxlen=PACING_HISTORY),
+                'latencies': deque(maxlen=PACING_HISTORY),
+            }
+
+        self.interval = (1.0 / self.target_fps) if new.limit_fps and self.target_fps > 0 else 0.0
+        self.deadline = 0.0
+        self.last_frame = None
+        self.policy = policy
+
+        return old is None or old.present_modes != new.present_modes or old.extra_images != new.extra_images
+
+    def present_mode(self, available):
+        """
+            Return the preferred present mode of the policy among the `available` modes.
+            FIFO is always supported.
+        """
+        for mode in PACING_POLICIES[self.policy].present_modes:
+            if mode in available:
+                return mode
+
+        return vk.PRESENT_MODE_FIFO_KHR
+
+    def image_count(self, min_image_count, max_image_count):
+        """
+            Return the number of swapchain images of the policy. `max_image_count` is 0
+            if the surface has no limit.
+        """
+        count = min_image_count + PACING_POLICIES[self.policy].extra_images
+        if max_image_count > 0 and count > max_image_count:
+            count = max_image_count
+
+        return count
+
+    def next_delay(self):
+        """
+            Return the time to wait before starting the next frame, in seconds. A late
+            frame moves the deadline: the policy never renders a burst of frames to catch up.
+        """
+        if self.interval == 0.0:
+            return 0.0
+
+        now = time.perf_counter()
+        deadline = self.deadline + self.interval
+        if deadline < now:
+            deadline = now
+
+        self.deadline = deadline
+        return deadline - now
+
+    def wait(self):
+        """
+            Sleep until the deadline of the next frame
+        """
+        delay = self.next_delay()
+        if delay > 0.0:
+            time.sleep(delay)
+
+    def record_frame(self, t_end, frame_time):
+        """
+            Record a frame presented at `t_end` (seconds) that took `frame_time` seconds
+            of CPU time
+        """
+        stats = self.stats[self.policy]
+        if self.last_frame is not None:
+            stats['time'] += t_end - self.last_frame
+            stats['frames'] += 1
+
+        stats['frame_times'].append(frame_time * 1e3)
+        self.last_frame = t_end
+
+    def record_latency(self, latency):
+        """
+            Record the time between an input event and the submit of the frame using
+            it, in milliseconds
+        """
+        self.stats[self.policy]['latencies'].append(latency)
+
+    def report(self):
+        """
+            Return the achieved frame rate, the CPU frame time and the input latency
+            (p50 and p99, in milliseconds) of every policy used so far
+        """
+        report = {}
+        for policy, stats in list(self.stats.items()):
+            frame_times, latencies = sorted(tuple(stats['frame_times'])), sorted(tuple(stats['latencies']))
+            report[policy] = {
+                'frames': stats['frames'],
+                'fps': (stats['frames'] / stats['time']) if stats['time'] > 0 else 0.0,
+                'frame_p50': percentile(frame_times, 50),
+                'frame_p99': percentile(frame_times, 99),
+                'latency_p50': percentile(latencies, 50),
+                'latency_p99': percentile(latencies, 99),
+            }
+
+        return report
+
+    def summary(self):
+        """
+            Return a log line per policy with its frame rate and latencies
+        """
+        line = '{policy:<13} {fps:>9.1f} fps  frame p50 {frame_p50:.3f} ms p99 {frame_p99:.3f} ms  latency p50 {latency_p50:.3f} ms p99 {latency_p99:.3f} ms'
+        return '\n'.join(line.format(policy=policy, **values) for policy, values in self.report().items())
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Pipeline descriptions and registry. A PipelineDescription is an immutable
+    and hashable description of the state of a graphics pipeline, so it can be
+    used as a dictionary key. The registry returns the pipeline already
+    compiled for an identical description and keeps the unused pipelines in a
+    LRU list, the least recently used ones are destroyed when there are too many.
+
+    Usage:
+        desc = PipelineDescription(cull_mode=vk.CULL_MODE_BACK_BIT)
+        pipeline = app.pipelines.acquire(desc)
+        ...
+        app.pipelines.release(pipeline)
+"""
+import vk, weakref, threading
+from collections import namedtuple, OrderedDict
+from functools import lru_cache
+from ctypes import pointer, cast, c_uint, POINTER
+
+# Number of unused pipelines kept by the registry
+DEFAULT_PIPELINE_CAPACITY = 32
+
+PIPELINE_FIELDS = (
+    'vertex_shader', 'fragment_shader', 'topology', 'polygon_mode', 'cull_mode',
+    'front_face', 'depth_test', 'depth_write', 'depth_compare_op', 'blend',
+    'color_write_mask'
+)
+
+class PipelineDescription(namedtuple('PipelineDescription', PIPELINE_FIELDS, defaults=(
+        'triangle.vert.spv',                    # vertex_shader
+        'triangle.frag.spv',                    # fragment_shader
+        vk.PRIMITIVE_TOPOLOGY_TRIANGLE_LIST,    # topology
+        vk.POLYGON_MODE_FILL,                   # polygon_mode
+        vk.CULL_MODE_NONE,                      # cull_mode
+        vk.FRONT_FACE_CLOCKWISE,                # front_face
+        True,                                   # depth_test
+        True,                                   # depth_write
+        vk.COMPARE_OP_LESS_OR_EQUAL,            # depth_compare_op
+        False,                                  # blend (alpha blending)
+        0xF,                                    # color_write_mask
+    ))):
+    """
+        State of a graphics pipeline. The default values describe the triangle pipeline.
+        Use `replace` to derive a description from another one.
+    """
+
+    __slots__ = ()
+
+    def replace(self, **fields):
+        return self._replace(**fields)
+
+    def states(self):
+        """
+            Return the fixed function create infos of the description. The structures are
+            built once per description and must not be modified.
+        """
+        return build_states(self)
+
+@lru_cache(maxsize=DEFAULT_PIPELINE_CAPACITY*2)
+def build_states(desc):
+    # Input assembly state
+    # Describes the topoloy used with this pipeline
+    input_assembly = vk.PipelineInputAssemblyStateCreateInfo(
+        s_type=vk.STRUCTURE_TYPE_PIPELINE_INPUT_ASSEMBLY_STATE_CREATE_INFO, next=None,
+        flags=0, primitive_restart_enable=0, topology=desc.topology
+    )
+
+    # Rasterization state
+    rasterization = vk.PipelineRasterizationStateCreateInfo(
+        s_type=vk.STRUCTURE_TYPE_PIPELINE_RASTERIZATION_STATE_CREATE_INFO, next=None,
+        flags=0, polygon_mode=desc.polygon_mode, cull_mode=desc.cull_mode,
+        front_face=desc.front_face, depth_clamp_enable=0, rasterizer_discard_enable=0,
+        depth_bias_enable=0, line_width=1.0
+    )
+
+    # Color blend state
+    # Describes blend modes and color masks
+    blend_attachment = vk.PipelineColorBlendAttachmentState(
+        color_write_mask=desc.color_write_mask, blend_enable=0
+    )
+    if desc.blend:
+        blend_attachment.blend_enable = 1
+        blend_attachment.src_color_blend_factor = vk.BLEND_FACTOR_SRC_ALPHA
+        blend_attachment.dst_color_blend_factor = vk.BLEND_FACTOR_ONE_MINUS_SRC_ALPHA
+        blend_attachment.color_blend_op = vk.BLEND_OP_ADD
+        blend_attachment.src_alpha_blend_factor = vk.BLEND_FACTOR_ONE
+        blend_attachment.dst_alpha_blend_factor = vk.BLEND_FACTOR_ZERO
+        blend_attachment.alpha_blend_op = vk.BLEND_OP_ADD
+
+    color_blend = vk.PipelineColorBlendStateCreateInfo(
+        s_type=vk.STRUCTURE_TYPE_PIPELINE_COLOR_BLEND_STATE_CREATE_INFO, next=None,
+        flags=0, logic_op_enable=0, attachment_count=1, attachments=pointer(blend_attachment)
+    )
+
+    # Viewport state, the viewport and the scissor are dynamic
+    viewport = vk.PipelineViewportStateCreateInfo(
+        s_type=vk.STRUCTURE_TYPE_PIPELINE_VIEWPORT_STATE_CREATE_INFO,
+        viewport_count=1, scissor_count=1
+    )
+
+    # Dynamic states can be set even after the pipeline has been created
+    # So there is no need to create new pipelines just for changing
+    # a viewport's dimensions or a scissor box
+    dynamic_states = (c_uint*2)(vk.DYNAMIC_STATE_VIEWPORT, vk.DYNAMIC_STATE_SCISSOR)
+    dynamic = vk.PipelineDynamicStateCreateInfo(
+        s_type=vk.STRUCTURE_TYPE_PIPELINE_DYNAMIC_STATE_CREATE_INFO, next=None,
+        flags=0, dynamic_state_count=2,
+        dynamic_states=cast(dynamic_states, POINTER(c_uint))
+    )
+
+    # Depth and stencil state
+    # No stencil used
+    op_state = vk.StencilOpState(
+        fail_op=vk.STENCIL_OP_KEEP, pass_op=vk.STENCIL_OP_KEEP,
+        compare_op=vk.COMPARE_OP_ALWAYS
+    )
+    depth_stencil = vk.PipelineDepthStencilStateCreateInfo(
+        s_type=vk.STRUCTURE_TYPE_PIPELINE_DEPTH_STENCIL_STATE_CREATE_INFO, next=None,
+        flags=0, depth_test_enable=int(desc.depth_test), depth_write_enable=int(desc.depth_write),
+        depth_compare_op=desc.depth_compare_op,
+        depth_bounds_test_enable=0, stencil_test_enable=0,
+        front=op_state, back=op_state
+    )
+
+    # Multi sampling state
+    # No multi sampling used
+    multisample = vk.PipelineMultisampleStateCreateInfo(
+        s_type=vk.STRUCTURE_TYPE_PIPELINE_MULTISAMPLE_STATE_CREATE_INFO, next=None,
+        flags=0, rasterization_samples=vk.SAMPLE_COUNT_1_BIT
+    )
+
+    # The arrays referenced by the create infos are kept alive with them
+    return {
+        'input_assembly': input_assembly,
+        'rasterization': rasterization,
+        'blend_attachment': blend_attachment,
+        'color_blend': color_blend,
+        'viewport': viewport,
+        'dynamic_states': dynamic_states,
+        'dynamic': dynamic,
+        'depth_stencil': depth_stencil,
+        'multisample': multisample,
+    }
+
+class PipelineRegistry(object):
+    """
+        Share the pipelines between identical descriptions. The pipelines are compiled
+        with `app.compile_pipeline` and reference counted. At most `capacity` unused
+        pipelines are kept, in LRU order.
+    """
+
+    def __init__(self, app, capacity=DEFAULT_PIPELINE_CAPACITY):
+        self.app = weakref.ref(app)
+        self.capacity = capacity
+        self.lock = threading.RLock()
+        self.entries = OrderedDict()  # description -> [pipeline, reference count], least recently used first
+        self.descriptions = {}        # pipeline handle -> description
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def acquire(self, description):
+        """
+            Return the pipeline of `description` and increase its reference count. The
+            pipeline is compiled if the registry does not have it.
+        """
+        with self.lock:
+            entry = self.entries.get(description)
+            if entry is None:
+                self.counters['misses'] += 1
+                entry = self.add(description, self.app().compile_pipeline(description))
+            else:
+                self.counters['hits'] += 1
+                self.entries.move_to_end(description)
+
+            entry[1] += 1
+            return entry[0]
+
+    def acquire_many(self, descriptions):
+        """
+            Same as `acquire` for a list of descriptions. The missing pipelines are
+            compiled in parallel (see `compile_pipelines`).
+        """
+        with self.lock:
+            missing = list(OrderedDict.fromkeys(d for d in descriptions if d not in self.entries))
+            if missing:
+                # Every compilation is waited for and every compiled pipeline is kept,
+                # even if one of them failed, so that none of them leaks
+                futures = self.app().compile_pipelines(missing)
+                error = None
+                for description, future in zip(missing, futures):
+                    try:
+                        self.add(description, future.result())
+                    except Exception as e:
+                        if error is None:
+                            error = e
+
+                if error is not None:
+                    raise error
+
+            pipelines = []
+            for description in descriptions:
+                entry = self.entries[description]
+                self.entries.move_to_end(description)
+                entry[1] += 1
+                pipelines.append(entry[0])
+
+            self.counters['misses'] += len(missing)
+            self.counters['hits'] += len(descriptions) - len(missing)
+            return pipelines
+
+    def add(self, description, pipeline):
+        entry = [pipeline, 0]
+        self.entries[description] = entry
+        self.descriptions[pipeline.value] = description
+        return entry
+
+    def release(self, pipeline):
+        """
+            Decrease the reference count of a pipeline. Unused pipelines stay in the
+            registry until they are evicted.
+        """
+        with self.lock:
+            description = self.descriptions[getattr(pipeline, 'value', pipeline)]
+            entry = self.entries[description]
+            entry[1] -= 1
+            self.evict()
+
+    def evict(self):
+        """
+            Destroy the least recently used pipelines that are not used anymore while
+            there are more than `capacity` unused pipelines
+        """
+        with self.lock:
+            unused = [desc for desc, (_, refcount) in self.entries.items() if refcount == 0]
+            for description in unused[:max(len(unused) - self.capacity, 0)]:
+                pipeline, _ = self.entries.pop(description)
+                del self.descriptions[pipeline.value]
+                self.app().destroy_pipeline(pipeline)
+                self.counters['evictions'] += 1
+
+    def destroy(self):
+        app = self.app()
+        with self.lock:
+            for pipeline, _ in self.entries.values():
+                app.destroy_pipeline(pipeline)
+
+            self.entries = OrderedDict()
+            self.descriptions = {}
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""
+    GPU timestamp profiler. Every swapchain image has its own range of
+    timestamp queries, written by its draw command buffer around named
+    regions. The results of an image are read when the image is about to be
+    rendered again: its previous frame is done, so the read never waits.
+
+    Usage:
+        profiler.reset(cmdbuf, index)             # outside of a render pass
+        profiler.begin(cmdbuf, index, 'render_pass')
+        ...
+        profiler.end(cmdbuf, index, 'render_pass')
+
+        profiler.collect(index)                   # before the next submit of the image
+        profiler.last['render_pass']              # GPU time in milliseconds
+"""
+import vk, weakref
+from collections import deque
+from ctypes import byref, c_uint64, sizeof
+
+# Number of frames kept by the profiler to compute the averages
+PROFILER_HISTORY = 120
+
+class GpuProfiler(object):
+    """
+        Measure the GPU time of named regions of the draw command buffers
+    """
+
+    def __init__(self, app, regions, history=PROFILER_HISTORY):
+        self.app = weakref.ref(app)
+        self.regions = {name: i for i, name in enumerate(regions)}
+        self.query_pool = None
+        self.image_count = 0
+        self.queries_per_image = 2 * len(self.regions)
+        self.results = None
+        self.pending = []    # Per image: True if the queries were submitted and not read yet
+
+        # Timestamps are in ticks of `timestamp_period` nanoseconds and only the low
+        # `timestamp_valid_bits` bits are meaningful
+        self.period = app.gpu_props.limits.timestamp_period
+        self.mask = (1 << app.timestamp_valid_bits) - 1
+
+        self.last = {name: 0.0 for name in regions}                      # Last GPU times in ms
+        self.history = {name: deque(maxlen=history) for name in regions}
+        self.counters = {'frames': 0, 'not_ready': 0}
+
+    @property
+    def supported(self):
+        return self.mask != 0 and self.period > 0
+
+    def create(self):
+        """
+            Create the query pool for the current swapchain images
+        """
+        app = self.app()
+        self.destroy()
+
+        self.image_count = len(app.swapchain.images)
+        self.pending = [False] * self.image_count
+
+        pool_info = vk.QueryPoolCreateInfo(
+            s_type=vk.STRUCTURE_TYPE_QUERY_POOL_CREATE_INFO, next=None, flags=0,
+            query_type=vk.QUERY_TYPE_TIMESTAMP,
+            query_count=self.image_count * self.queries_per_image,
+            pipeline_statistics=0
+        )
+
+        self.query_pool = vk.QueryPool(0)
+        if app.CreateQueryPool(app.device, byref(pool_info), None, byref(self.query_pool)) != vk.SUCCESS:
+            raise RuntimeError('Could not create the timestamp query pool')
+
+        self.results = (c_uint64 * self.queries_per_image)()
+
+    def query(self, index, name, end):
+        return index * self.queries_per_image + 2 * self.regions[name] + end
+
+    def reset(self, cmdbuf, index):
+        """
+            Record the reset of the queries of the image `index`. Must be recorded
+            before the first region, outside of a render pass.
+        """
+        app = self.app()
+        app.CmdResetQueryPool(cmdbuf, self.query_pool, index * self.queries_per_image, self.queries_per_image)
+
+    def begin(self, cmdbuf, index, name, stage=vk.PIPELINE_STAGE_TOP_OF_PIPE_BIT):
+        app = self.app()
+        app.CmdWriteTimestamp(cmdbuf, stage, self.query_pool, self.query(index, name, 0))
+
+    def end(self, cmdbuf, index, name, stage=vk.PIPELINE_STAGE_BOTTOM_OF_PIPE_BIT):
+        app = self.app()
+        app.CmdWriteTimestamp(cmdbuf, stage, self.query_pool, self.query(index, name, 1))
+
+    def submitted(self, index):
+        self.pending[index] = True
+
+    def collect(self, index):
+        """
+            Read the timestamps of the last frame rendered in the image `index`. Never waits:
+            if the results are not available, the frame is skipped.
+        """
+        if not self.pending[index]:
+            return False
+
+        app = self.app()
+        results = self.results
+        result = app.GetQueryPoolResults(
+            app.device, self.query_pool, index * self.queries_per_image, self.queries_per_image,
+            sizeof(results), results, sizeof(c_uint64), vk.QUERY_RESULT_64_BIT
+        )
+
+        # The queries are reset by the next submit of the image, the results are lost
+        self.pending[index] = False
+        if result != vk.SUCCESS:
+            self.counters['not_ready'] += 1
+            return False
+
+        mask, scale = self.mask, self.period / 1e6
+        for name, region in self.regions.items():
+            ticks = (results[2*region+1] - results[2*region]) & mask
+            ms = ticks * scale
+            self.last[name] = ms
+            self.history[name].append(ms)
+
+        self.counters['frames'] += 1
+        return True
+
+    def averages(self):
+        """
+            Return the average GPU time in milliseconds of every region over the last frames
+        """
+        return {name: (sum(times) / len(times) if times else 0.0) for name, times in self.history.items()}
+
+    def summary(self):
+        """
+            Return a log line with the average GPU time of every region
+        """
+        return 'GPU ' + ', '.join('{} {:.3f} ms'.format(name, ms) for name, ms in self.averages().items())
+
+    def destroy(self):
+        if self.query_pool is not None:
+            app = self.app()
+            app.DestroyQueryPool(app.device, self.query_pool, None)
+            self.query_pool = None
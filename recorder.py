@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Multi-threaded recording of secondary command buffers. Command pools are
+    externally synchronized, so each worker thread records from its own pool.
+    The secondary command buffers are executed by a primary command buffer
+    with vkCmdExecuteCommands.
+
+    Usage:
+        futures = recorder.record(render_pass, framebuffer, [job, job, ...])
+        ... begin the render pass with SUBPASS_CONTENTS_SECONDARY_COMMAND_BUFFERS ...
+        recorder.execute(primary, futures)
+
+    A job is a callable receiving the secondary command buffer being recorded.
+"""
+import vk, weakref, threading
+from concurrent.futures import ThreadPoolExecutor
+from ctypes import byref, pointer, cast, POINTER
+
+class WorkerPool(object):
+    """
+        The command pool of a worker thread and its secondary command buffers.
+        The buffers are reused after `reset`.
+    """
+
+    def __init__(self, recorder):
+        app = recorder.app()
+
+        pool_info = vk.CommandPoolCreateInfo(
+            s_type=vk.STRUCTURE_TYPE_COMMAND_POOL_CREATE_INFO, next=None,
+            flags=0, queue_family_index=app.main_queue_family
+        )
+
+        self.cmd_pool = vk.CommandPool(0)
+        if app.CreateCommandPool(app.device, byref(pool_info), None, byref(self.cmd_pool)) != vk.SUCCESS:
+            raise RuntimeError('Could not create a worker command pool')
+
+        self.buffers = []
+        self.used = 0
+
+    def next_buffer(self, app):
+        if self.used == len(self.buffers):
+            alloc_info = vk.CommandBufferAllocateInfo(
+                s_type=vk.STRUCTURE_TYPE_COMMAND_BUFFER_ALLOCATE_INFO, next=None,
+                command_pool=self.cmd_pool,
+                level=vk.COMMAND_BUFFER_LEVEL_SECONDARY,
+                command_buffer_count=1
+            )
+
+            cmdbuf = vk.CommandBuffer(0)
+            if app.AllocateCommandBuffers(app.device, byref(alloc_info), byref(cmdbuf)) != vk.SUCCESS:
+                raise RuntimeError('Failed to allocate a secondary command buffer')
+            self.buffers.append(cmdbuf)
+
+        cmdbuf = self.buffers[self.used]
+        self.used += 1
+        return cmdbuf
+
+class SecondaryRecorder(object):
+    """
+        Record secondary command buffers in a thread pool, with one command pool
+        per worker thread
+    """
+
+    def __init__(self, app, threads):
+        self.app = weakref.ref(app)
+        self.threads = threads
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.pools = []   # WorkerPool of every worker thread
+        self.counters = {'jobs': 0}
+
+    def worker_pool(self):
+        pool = getattr(self.local, 'pool', None)
+        if pool is None:
+            pool = WorkerPool(self)
+            self.local.pool = pool
+            with self.lock:
+                self.pools.append(pool)
+
+        return pool
+
+    def record_job(self, render_pass, framebuffer, job):
+        app = self.app()
+        cmdbuf = self.worker_pool().next_buffer(app)
+
+        # The secondary buffers run entirely inside the render pass of the primary buffer
+        inheritance_info = vk.CommandBufferInheritanceInfo(
+            s_type=vk.STRUCTURE_TYPE_COMMAND_BUFFER_INHERITANCE_INFO, next=None,
+            render_pass=render_pass, subpass=0, framebuffer=framebuffer,
+            occlusion_query_enable=0, query_flags=0, pipeline_statistics=0
+        )
+        begin_info = vk.CommandBufferBeginInfo(
+            s_type=vk.STRUCTURE_TYPE_COMMAND_BUFFER_BEGIN_INFO, next=None,
+            flags=vk.COMMAND_BUFFER_USAGE_RENDER_PASS_CONTINUE_BIT,
+            inheritance_info=pointer(inheritance_info)
+        )
+
+        if app.BeginCommandBuffer(cmdbuf, byref(begin_info)) != vk.SUCCESS:
+            raise RuntimeError('Failed to start recording a secondary command buffer')
+
+        job(cmdbuf)
+
+        if app.EndCommandBuffer(cmdbuf) != vk.SUCCESS:
+            raise RuntimeError('Failed to end a secondary command buffer')
+
+        return cmdbuf
+
+    def record(self, render_pass, framebuffer, jobs):
+        """
+            Record every job in its own secondary command buffer. Return the futures of
+            the command buffers, in the order of the jobs.
+        """
+        self.counters['jobs'] += len(jobs)
+        return [self.executor.submit(self.record_job, render_pass, framebuffer, job) for job in jobs]
+
+    def execute(self, cmdbuf, futures):
+        """
+            Wait for the recording of the secondary command buffers and execute them in
+            the primary command buffer `cmdbuf`
+        """
+        app = self.app()
+        buffers = (vk.CommandBuffer*len(futures))(*(future.result() for future in futures))
+        app.CmdExecuteCommands(cmdbuf, len(buffers), cast(buffers, POINTER(vk.CommandBuffer)))
+
+    def reset(self):
+        """
+            Reset every worker command pool. The command buffers recorded before must not
+            be in use by the device anymore.
+        """
+        app = self.app()
+        with self.lock:
+            for pool in self.pools:
+                app.ResetCommandPool(app.device, pool.cmd_pool, 0)
+                pool.used = 0
+
+    def destroy(self):
+        app = self.app()
+        self.executor.shutdown()
+
+        with self.lock:
+            for pool in self.pools:
+                app.DestroyCommandPool(app.device, pool.cmd_pool, None)
+            self.pools = []
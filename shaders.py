@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Shader module registry. The SPIR-V files are read directly into a ctypes
+    buffer and the modules are deduplicated by the hash of their code, so a
+    shader used by many pipelines is only created once. The modules are
+    reference counted and destroyed when the last pipeline releases them.
+
+    Usage:
+        stage = registry.stage_info('triangle.vert.spv', vk.SHADER_STAGE_VERTEX_BIT)
+        ... create the pipeline ...
+        registry.release(stage.module)   # when the pipeline is destroyed
+"""
+import vk, weakref, os, hashlib, threading
+from ctypes import byref, sizeof, cast, c_uint, POINTER
+
+# Magic number of the SPIR-V files
+SPIRV_MAGIC = 0x07230203
+
+class ShaderRegistry(object):
+
+    def __init__(self, app, directory):
+        self.app = weakref.ref(app)
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.files = {}     # path -> (mtime, size, hash) of the files already read
+        self.modules = {}   # hash -> [module, reference count]
+        self.hashes = {}    # module handle -> hash
+        self.counters = {'loads': 0, 'reads': 0, 'modules_created': 0, 'modules_destroyed': 0}
+
+    def read(self, path):
+        """
+            Read a SPIR-V file into a c_uint array. Return the array and its hash.
+        """
+        size = os.path.getsize(path)
+        if size == 0 or size % 4 != 0:
+            raise RuntimeError('Invalid SPIR-V file size for {}'.format(path))
+
+        code = (c_uint*(size//4))()
+        with open(path, 'rb') as f:
+            if f.readinto(code) != size:
+                raise RuntimeError('Could not read the shader at {}'.format(path))
+
+        if code[0] != SPIRV_MAGIC:
+            raise RuntimeError('{} is not a SPIR-V file'.format(path))
+
+        self.counters['reads'] += 1
+        return code, hashlib.sha1(code).digest()
+
+    def acquire(self, name):
+        """
+            Return the shader module of the file `name` and increase its reference count
+        """
+        path = os.path.join(self.directory, name)
+        stat = os.stat(path)
+
+        with self.lock:
+            self.counters['loads'] += 1
+
+            # The file is only read again if it changed
+            known = self.files.get(path)
+            code = None
+            if known is not None and known[:2] == (stat.st_mtime_ns, stat.st_size) and known[2] in self.modules:
+                digest = known[2]
+            else:
+                code, digest = self.read(path)
+                self.files[path] = (stat.st_mtime_ns, stat.st_size, digest)
+
+            entry = self.modules.get(digest)
+            if entry is None:
+                entry = [self.create_module(code, path), 0]
+                self.modules[digest] = entry
+                self.hashes[entry[0].value] = digest
+
+            entry[1] += 1
+            return entry[0]
+
+    def create_module(self, code, path):
+        app = self.app()
+
+        module = vk.ShaderModule(0)
+        module_create_info = vk.ShaderModuleCreateInfo(
+            s_type=vk.STRUCTURE_TYPE_SHADER_MODULE_CREATE_INFO, next=None,
+            flags=0, code_size=sizeof(code), code=cast(code, POINTER(c_uint))
+        )
+
+        result = app.CreateShaderModule(app.device, byref(module_create_info), None, byref(module))
+        if result != vk.SUCCESS:
+            raise RuntimeError('Could not compile shader at {}'.format(path))
+
+        self.counters['modules_created'] += 1
+        return module
+
+    def stage_info(self, name, stage, entry_point=b'main'):
+        """
+            Return the shader stage create info of the file `name`. The module must be
+            released with `release` when the pipeline is destroyed.
+        """
+        return vk.PipelineShaderStageCreateInfo(
+            s_type=vk.STRUCTURE_TYPE_PIPELINE_SHADER_STAGE_CREATE_INFO, next=None,
+            flags=0, stage=stage, module=self.acquire(name), name=entry_point,
+            specialization_info=None
+        )
+
+    def release(self, module):
+        """
+            Decrease the reference count of a module. The module is destroyed when
+            it is not used anymore.
+        """
+        app = self.app()
+        module = getattr(module, 'value', module)
+
+        with self.lock:
+            digest = self.hashes[module]
+            entry = self.modules[digest]
+            entry[1] -= 1
+            if entry[1] == 0:
+                app.DestroyShaderModule(app.device, entry[0], None)
+                del self.modules[digest]
+                del self.hashes[module]
+                self.counters['modules_destroyed'] += 1
+
+    def destroy(self):
+        app = self.app()
+        with self.lock:
+            for module, _ in self.modules.values():
+                app.DestroyShaderModule(app.device, module, None)
+
+            self.modules = {}
+            self.hashes = {}
@@ -9,25 +9,114 @@
     To run this demo call:  
     ``python triangle.py``
 
+    To render offscreen, without a window:
+    ``python triangle.py --headless``
+
     @author: Gabriel Dubé
 """
-import platform, asyncio, vk, weakref
+import platform, asyncio, vk, weakref, os, sys, time, struct, zlib, tempfile, gc, threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 from ctypes import cast, c_char_p, c_uint, c_ubyte, c_ulonglong, pointer, POINTER, byref, c_float, Structure, sizeof, memmove
 from xmath import Mat4, perspective, translate, rotate
-from os.path import dirname
-from itertools import chain
+from allocator import MemoryAllocator
+from uploader import Uploader
+from shaders import ShaderRegistry
+from pipelines import PipelineDescription, PipelineRegistry
+from recorder import SecondaryRecorder
+from profiler import GpuProfiler
+from frametimes import FrameTimer, percentile
+from pacing import FramePacer, PACING_POLICIES
+from os.path import dirname, abspath, join
 
 system_name = platform.system()
-if system_name == 'Windows':
-    from win32 import Win32Window as Window, WinSwapchain as BaseSwapchain
-elif system_name == 'Linux':
-    from xlib import XlibWindow as Window, XlibSwapchain as BaseSwapchain
-else:
-    raise OSError("Platform not supported")
+try:
+    if system_name == 'Windows':
+        from win32 import Win32Window as Window, WinSwapchain as BaseSwapchain
+    elif system_name == 'Linux':
+        from xlib import XlibWindow as Window, XlibSwapchain as BaseSwapchain
+    else:
+        raise OSError("Platform not supported")
+except OSError as e:
+    # Without a windowing system, only the headless mode is available
+    Window, BaseSwapchain = None, object
+    window_import_error = e
 
 # Whether to enable validation layer or not
 ENABLE_VALIDATION = False
 
+# Compute the uniform matrices in place with numpy (see xmath_numpy.py)
+USE_NUMPY_MATH = False
+
+# Number of frames the CPU can record ahead of the GPU
+# 0 uses the fully serialized rendering (the device is idled around every frame)
+FRAMES_IN_FLIGHT = 2
+
+# Render in offscreen images instead of a window. Can also be enabled with
+# the `--headless` command line flag
+HEADLESS = os.environ.get('TRIANGLE_HEADLESS', '0') == '1'
+
+# Number of offscreen images in headless mode
+OFFSCREEN_IMAGE_COUNT = 3
+
+# Copy every rendered frame into host visible staging buffers (see FrameReadback)
+ENABLE_READBACK = False
+
+# Directory of the pipeline cache files. None disables the persistence of the pipeline cache
+PIPELINE_CACHE_DIR = os.environ.get('TRIANGLE_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'python-vulkan-triangle'))
+
+# Header of the pipeline cache files: magic, crc32 and size of the cache data
+PIPELINE_CACHE_MAGIC = b'PYVKPC01'
+PIPELINE_CACHE_FILE_HEADER = struct.Struct('<8sIQ')
+
+# Header written by the driver at the start of the cache data:
+# header size, header version, vendor id, device id, pipeline cache uuid
+PIPELINE_CACHE_DATA_HEADER = struct.Struct('<IIII16s')
+
+# Number of threads compiling the pipelines (see TriangleApplication.compile_pipelines)
+PIPELINE_COMPILE_THREADS = os.cpu_count() or 1
+
+# Number of threads recording the draws in secondary command buffers (see recorder.py)
+# 0 records the draws directly in the primary command buffers
+RECORD_THREADS = 0
+
+# Record the draw command buffer of every frame from a transient command pool per frame
+# in flight, instead of prerecording one command buffer per swapchain image
+RERECORD_COMMAND_BUFFERS = False
+
+# Measure the GPU time of the frames with timestamp queries (see profiler.py). The averages
+# are printed every second. Can also be enabled with TRIANGLE_PROFILE=1
+ENABLE_GPU_PROFILER = os.environ.get('TRIANGLE_PROFILE', '0') == '1'
+
+# Freeze the objects created before the render loop (gc.freeze) and disable the garbage
+# collector while rendering. `draw` does not allocate container objects, so nothing leaks.
+FREEZE_GC = False
+
+# Render in a dedicated thread instead of an asyncio task. The vulkan calls release the GIL,
+# so the window events are handled while the thread waits on the GPU
+RENDER_THREAD = False
+
+# Number of input latencies kept by the application (see `latency_report`)
+INPUT_LATENCY_HISTORY = 1024
+
+# Frame pacing policy: 'throughput', 'low_latency' or 'power_saving' (see pacing.py). The policy
+# selects the present mode and the number of swapchain images. Can also be set with TRIANGLE_PACING
+FRAME_PACING = os.environ.get('TRIANGLE_PACING', 'throughput')
+
+# Frame rate limit of the 'power_saving' policy
+PACING_TARGET_FPS = 30
+
+# Record the post present barrier at the start of the draw command buffers.
+# This way, a frame is a single queue submit without any idle wait
+MERGE_POST_PRESENT = True
+
+# Arguments of `draw`, created once
+WAIT_FOREVER = c_ulonglong(-1)
+NULL_FENCE = vk.Fence(0)
+
+if USE_NUMPY_MATH:
+    import xmath_numpy
+
 class Vertex(Structure):
     _fields_ = (('pos', c_float*3), ('col', c_float*3))
 
@@ -77,10 +166,15 @@ class Debugger(object):
 
 class Swapchain(BaseSwapchain):
 
+    # Layout of the images between two frames
+    final_layout = vk.IMAGE_LAYOUT_PRESENT_SRC_KHR
+
     def __init__(self, app):
         super().__init__(app)
 
         self.swapchain = None
+        self.present_mode = None
+        self.extent = (0, 0)    # Size of the images, may differ from the window size
         self.images = None
         self.views = None
 
@@ -113,17 +207,10 @@ class Swapchain(BaseSwapchain):
             width = swapchain_extent.width
             height = swapchain_extent.height
 
-        # Prefer mailbox mode if present, it's the lowest latency non-tearing present  mode
-        present_mode = vk.PRESENT_MODE_FIFO_KHR
-        if vk.PRESENT_MODE_MAILBOX_KHR in prez:
-            present_mode = vk.PRESENT_MODE_MAILBOX_KHR
-        elif vk.PRESENT_MODE_IMMEDIATE_KHR in prez:
-            present_mode = vk.PRESENT_MODE_IMMEDIATE_KHR
-
-        # Get the number of images
-        swapchain_image_count = cap.min_image_count + 1
-        if cap.max_image_count > 0 and swapchain_image_count > cap.max_image_count:
-            swapchain_image_count = cap.max_image_count
+        # The present mode and the number of images depend on the frame pacing policy
+        # The default policy prefers mailbox mode, it's the lowest latency non-tearing present mode
+        present_mode = app.pacer.present_mode(prez)
+        swapchain_image_count = app.pacer.image_count(cap.min_image_count, cap.max_image_count)
 
         # Default image transformation (use identity if supported)
         transform = cap.current_transform
@@ -150,12 +237,19 @@ class Swapchain(BaseSwapchain):
         app.formats['color'] = color_format
         color_space = formats[0].color_space
 
+        # The readback copies the images into host visible buffers
+        image_usage = vk.IMAGE_USAGE_COLOR_ATTACHMENT_BIT
+        if app.readback is not None:
+            if cap.supported_usage_flags & vk.IMAGE_USAGE_TRANSFER_SRC_BIT == 0:
+                raise RuntimeError('The swapchain images cannot be copied')
+            image_usage |= vk.IMAGE_USAGE_TRANSFER_SRC_BIT
+
         #Create the swapchain
         create_info = vk.SwapchainCreateInfoKHR(
             s_type=vk.STRUCTURE_TYPE_SWAPCHAIN_CREATE_INFO_KHR, next=None, 
             flags=0, surface=self.surface, min_image_count=swapchain_image_count,
             image_format=color_format, image_color_space=color_space, 
-            image_extent=swapchain_extent, image_array_layers=1, image_usage=vk.IMAGE_USAGE_COLOR_ATTACHMENT_BIT,
+            image_extent=swapchain_extent, image_array_layers=1, image_usage=image_usage,
             image_sharing_mode=vk.SHARING_MODE_EXCLUSIVE, queue_family_index_count=0,
             queue_family_indices=cast(None, POINTER(c_uint)), pre_transform=transform, 
             composite_alpha=vk.COMPOSITE_ALPHA_OPAQUE_BIT_KHR, present_mode=present_mode,
@@ -170,6 +264,8 @@ class Swapchain(BaseSwapchain):
             if self.swapchain is not None: #Destroy the old swapchain if it exists
                 self.destroy_swapchain()
             self.swapchain = swapchain
+            self.present_mode = present_mode
+            self.extent = (width, height)
             self.create_images(swapchain_image_count, color_format)
         else:
             raise RuntimeError('Failed to create the swapchain')
@@ -209,7 +305,7 @@ class Swapchain(BaseSwapchain):
                 app.setup_buffer, image, 
                 vk.IMAGE_ASPECT_COLOR_BIT,
                 vk.IMAGE_LAYOUT_UNDEFINED,
-                vk.IMAGE_LAYOUT_PRESENT_SRC_KHR)
+                self.final_layout)
 
             view = vk.ImageView(0)
             result = app.CreateImageView(app.device, byref(view_create_info), None, byref(view))
@@ -232,6 +328,399 @@ class Swapchain(BaseSwapchain):
         
 
 
+class OffscreenWindow(object):
+    """
+        Stand-in for the system window in headless mode. It only holds
+        the size of the offscreen images.
+    """
+
+    def __init__(self, app, width=1280, height=720):
+        self.app = weakref.ref(app)
+        self.size = (width, height)
+
+    def dimensions(self):
+        return self.size
+
+    def refresh_dimensions(self):
+        return self.size
+
+    def show(self):
+        pass
+
+    def set_title(self, title):
+        pass
+
+    def process_queued_events(self):
+        pass
+
+    def schedule_queued_events(self):
+        pass
+
+class OffscreenSwapchain(object):
+    """
+        Replace the swapchain in headless mode. The images are device local color
+        images rendered in turn. There is no surface and no presentation engine, the
+        images are left in the transfer source layout so that they can be copied.
+    """
+
+    # Layout of the images between two frames
+    final_layout = vk.IMAGE_LAYOUT_TRANSFER_SRC_OPTIMAL
+
+    def __init__(self, app, image_count=OFFSCREEN_IMAGE_COUNT):
+        self.app = weakref.ref(app)
+        self.surface = None
+        self.swapchain = None
+        self.image_count = image_count
+        self.extent = (0, 0)
+        self.images = None
+        self.views = None
+        self.memory = None
+        self.next_image = 0
+
+    def create(self):
+        app = self.app()
+
+        if self.images is not None:
+            self.destroy()
+
+        width, height = app.window.dimensions()
+        color_format = vk.FORMAT_R8G8B8A8_UNORM
+        app.formats['color'] = color_format
+        self.extent = (width, height)
+
+        create_info = vk.ImageCreateInfo(
+            s_type=vk.STRUCTURE_TYPE_IMAGE_CREATE_INFO, next=None, flags=0,
+            image_type=vk.IMAGE_TYPE_2D, format=color_format,
+            extent=vk.Extent3D(width, height, 1), mip_levels=1,
+            array_layers=1, samples=vk.SAMPLE_COUNT_1_BIT, tiling=vk.IMAGE_TILING_OPTIMAL,
+            usage=vk.IMAGE_USAGE_COLOR_ATTACHMENT_BIT | vk.IMAGE_USAGE_TRANSFER_SRC_BIT,
+            sharing_mode=vk.SHARING_MODE_EXCLUSIVE, initial_layout=vk.IMAGE_LAYOUT_UNDEFINED
+        )
+
+        view_create_info = vk.ImageViewCreateInfo(
+            s_type=vk.STRUCTURE_TYPE_IMAGE_VIEW_CREATE_INFO,
+            next=None, flags=0, view_type=vk.IMAGE_VIEW_TYPE_2D, format=color_format,
+            components=vk.ComponentMapping(
+                r=vk.COMPONENT_SWIZZLE_R, g=vk.COMPONENT_SWIZZLE_G,
+                b=vk.COMPONENT_SWIZZLE_B, a=vk.COMPONENT_SWIZZLE_A,
+            ),
+            subresource_range=vk.ImageSubresourceRange(
+                aspect_mask=vk.IMAGE_ASPECT_COLOR_BIT, base_mip_level=0,
+                level_count=1, base_array_layer=0, layer_count=1,
+            )
+        )
+
+        self.images = (vk.Image * self.image_count)()
+        self.views = (vk.ImageView * self.image_count)()
+        self.memory = []
+        self.next_image = 0
+
+        for index in range(self.image_count):
+            image = vk.Image(0)
+            result = app.CreateImage(app.device, byref(create_info), None, byref(image))
+            if result != vk.SUCCESS:
+                raise RuntimeError('Failed to create an offscreen image')
+
+            memory = app.allocator.allocate_image(image, vk.MEMORY_PROPERTY_DEVICE_LOCAL_BIT)
+
+            app.set_image_layout(
+                app.setup_buffer, image, 
+                vk.IMAGE_ASPECT_COLOR_BIT,
+                vk.IMAGE_LAYOUT_UNDEFINED,
+                self.final_layout)
+
+            view = vk.ImageView(0)
+            view_create_info.image = image
+            result = app.CreateImageView(app.device, byref(view_create_info), None, byref(view))
+            if result != vk.SUCCESS:
+                raise RuntimeError('Failed to create an image view.')
+
+            self.images[index] = image
+            self.views[index] = view
+            self.memory.append(memory)
+
+    def acquire(self):
+        """
+            Return the index of the next image to render. The images are used in turn,
+            the frame fences guarantee that the image is not in use.
+        """
+        index = self.next_image
+        self.next_image = (index + 1) % self.image_count
+        return index
+
+    def destroy(self):
+        app = self.app()
+        if self.images is None:
+            return
+
+        for view, image, memory in zip(self.views, self.images, self.memory):
+            app.DestroyImageView(app.device, view, None)
+            app.DestroyImage(app.device, image, None)
+            app.allocator.free(memory)
+
+        self.images = self.views = self.memory = None
+        
+
+class FrameReadback(object):
+    """
+        Copy the rendered frames into a ring of host visible staging buffers.
+
+        The ring has one slot per swapchain image and the copy is recorded at the end
+        of the draw command buffers. The frame fences tell when a copy is done, so
+        collecting the frames never waits on the GPU.
+
+        A frame is a dict with its number, its image index, its size, its format and a
+        zero-copy memoryview of the mapped slot. The data stays valid until the same
+        swapchain image is rendered again; frames that were not consumed in time are
+        dropped and counted in `dropped`.
+
+        Usage:
+            for frame in app.readback.poll(): ...
+            async for frame in app.readback: ...
+    """
+
+    # Size of a pixel. The color formats used by the example are 8 bits RGBA or BGRA
+    PIXEL_SIZE = 4
+
+    # Longest wait of the async iterator between two checks of the application state, in seconds
+    WAIT_TIMEOUT = 0.05
+
+    def __init__(self, app):
+        self.app = weakref.ref(app)
+        self.buffer = vk.Buffer(0)
+        self.memory = None
+        self.mapped = None
+        self.slot_size = 0
+        self.slot_count = 0
+        self.extent = (0, 0)
+
+        self.serials = []       # Number of the last frame submitted for each swapchain image
+        self.pending = deque()  # (fence, image, number) of the copies in flight, in submission order
+        self.ready = deque()    # (image, number) of the copies done
+        self.frame_number = 0
+        self.dropped = 0
+        self.waiter = None      # Future of the async iterator, resolved by `collect`
+
+    def create(self):
+        app = self.app()
+
+        if self.mapped is not None:
+            self.destroy()
+
+        # The copies have the size of the swapchain images, not the size of the window
+        width, height = app.swapchain.extent
+        slot_size = width * height * self.PIXEL_SIZE
+        slot_count = len(app.swapchain.images)
+
+        buffer_info = vk.BufferCreateInfo(
+            s_type=vk.STRUCTURE_TYPE_BUFFER_CREATE_INFO, next=None,
+            flags=0, size=slot_size*slot_count, usage=vk.BUFFER_USAGE_TRANSFER_DST_BIT,
+            sharing_mode=0, queue_family_index_count=0, queue_family_indices=None
+        )
+
+        result = app.CreateBuffer(app.device, byref(buffer_info), None, byref(self.buffer))
+        if result != vk.SUCCESS:
+            raise RuntimeError('Could not create the readback buffer')
+
+        # Cached memory makes the CPU reads much faster. Coherent memory does not need to be invalidated
+        memreq = vk.MemoryRequirements()
+        app.GetBufferMemoryRequirements(app.device, self.buffer, byref(memreq))
+        properties = vk.MEMORY_PROPERTY_HOST_VISIBLE_BIT | vk.MEMORY_PROPERTY_HOST_COHERENT_BIT
+        if app.get_memory_type(memreq.memory_type_bits, properties | vk.MEMORY_PROPERTY_HOST_CACHED_BIT)[0]:
+            properties |= vk.MEMORY_PROPERTY_HOST_CACHED_BIT
+
+        # The memory stays mapped until the buffer is destroyed
+        self.memory = app.allocator.allocate_buffer(self.buffer, properties)
+        self.mapped = self.memory.mapped
+        self.slot_size = slot_size
+        self.slot_count = slot_count
+        self.extent = (width, height)
+        self.serials = [None] * slot_count
+        self.pending.clear()
+        self.ready.clear()
+
+    def destroy(self):
+        app = self.app()
+
+        app.DestroyBuffer(app.device, self.buffer, None)
+        app.allocator.free(self.memory)
+
+        self.buffer = vk.Buffer(0)
+        self.memory = None
+        self.mapped = None
+        self.pending.clear()
+        self.ready.clear()
+
+    def record(self, cmdbuf, index):
+        """
+            Record the copy of the swapchain image `index` into its slot. The image must be in the color
+            attachment layout, it is left in the transfer source layout.
+        """
+        app = self.app()
+        width, height = self.extent
+
+        subres = vk.ImageSubresourceRange(
+            aspect_mask=vk.IMAGE_ASPECT_COLOR_BIT, base_mip_level=0,
+            level_count=1, base_array_layer=0, layer_count=1,
+        )
+
+        image_barrier = vk.ImageMemoryBarrier(
+            s_type=vk.STRUCTURE_TYPE_IMAGE_MEMORY_BARRIER, next=None,
+            src_access_mask=vk.ACCESS_COLOR_ATTACHMENT_WRITE_BIT,
+            dst_access_mask=vk.ACCESS_TRANSFER_READ_BIT,
+            old_layout=vk.IMAGE_LAYOUT_COLOR_ATTACHMENT_OPTIMAL,
+            new_layout=vk.IMAGE_LAYOUT_TRANSFER_SRC_OPTIMAL,
+            src_queue_family_index=vk.QUEUE_FAMILY_IGNORED,
+            dst_queue_family_index=vk.QUEUE_FAMILY_IGNORED,
+            image=app.swapchain.images[index], 
+            subresource_range=subres
+        )
+
+        app.CmdPipelineBarrier(
+            cmdbuf,
+            vk.PIPELINE_STAGE_COLOR_ATTACHMENT_OUTPUT_BIT,
+            vk.PIPELINE_STAGE_TRANSFER_BIT,
+            0,
+            0, None,
+            0, None,
+            1, byref(image_barrier))
+
+        region = vk.BufferImageCopy(
+            buffer_offset=index*self.slot_size, buffer_row_length=0, buffer_image_height=0,
+            image_subresource=vk.ImageSubresourceLayers(
+                aspect_mask=vk.IMAGE_ASPECT_COLOR_BIT, mip_level=0,
+                base_array_layer=0, layer_count=1
+            ),
+            image_offset=vk.Offset3D(0, 0, 0),
+            image_extent=vk.Extent3D(width, height, 1)
+        )
+
+        app.CmdCopyImageToBuffer(cmdbuf, app.swapchain.images[index], vk.IMAGE_LAYOUT_TRANSFER_SRC_OPTIMAL, self.buffer, 1, byref(region))
+
+        # Make the copy visible to the host once the frame fence is signaled
+        buffer_barrier = vk.BufferMemoryBarrier(
+            s_type=vk.STRUCTURE_TYPE_BUFFER_MEMORY_BARRIER, next=None,
+            src_access_mask=vk.ACCESS_TRANSFER_WRITE_BIT,
+            dst_access_mask=vk.ACCESS_HOST_READ_BIT,
+            src_queue_family_index=vk.QUEUE_FAMILY_IGNORED,
+            dst_queue_family_index=vk.QUEUE_FAMILY_IGNORED,
+            buffer=self.buffer, offset=index*self.slot_size, size=self.slot_size
+        )
+
+        app.CmdPipelineBarrier(
+            cmdbuf,
+            vk.PIPELINE_STAGE_TRANSFER_BIT,
+            vk.PIPELINE_STAGE_HOST_BIT,
+            0,
+            0, None,
+            1, byref(buffer_barrier),
+            0, None)
+
+        return vk.IMAGE_LAYOUT_TRANSFER_SRC_OPTIMAL
+
+    def submit(self, index, fence):
+        """
+            Register the frame that is about to be submitted into the swapchain image `index`.
+            `fence` is signaled when the frame is done.
+        """
+        number = self.frame_number
+        self.frame_number += 1
+        self.serials[index] = number
+        self.pending.append((fence, index, number))
+
+        # The previous content of the slot will be overwritten
+        ready_count = len(self.ready)
+        self.ready = deque(x for x in self.ready if x[0] != index)
+        self.dropped += ready_count - len(self.ready)
+
+    def collect(self):
+        """
+            Move the copies that are done to the ready queue. Never waits.
+            Must be called before a frame fence is reset.
+        """
+        app = self.app()
+        pending = self.pending
+        while pending:
+            fence, index, number = pending[0]
+            if app.GetFenceStatus(app.device, fence) != vk.SUCCESS:
+                break
+
+            pending.popleft()
+            self.ready.append((index, number))
+
+            # Wake up the async iterator. `collect` may run in the render thread
+            waiter = self.waiter
+            if waiter is not None:
+                self.waiter = None
+                waiter.get_loop().call_soon_threadsafe(self.wake, waiter)
+
+    @staticmethod
+    def wake(waiter):
+        if not waiter.done():
+            waiter.set_result(None)
+
+    def frame(self, index, number):
+        width, height = self.extent
+        data = (c_ubyte*self.slot_size).from_address(self.mapped + index*self.slot_size)
+        return {
+            'number': number,
+            'image': index,
+            'width': width,
+            'height': height,
+            'format': self.app().formats['color'],
+            'data': memoryview(data)
+        }
+
+    def poll(self):
+        """
+            Return the frames that are done, oldest first
+        """
+        self.collect()
+
+        frames = [self.frame(index, number) for index, number in self.ready]
+        self.ready.clear()
+        return frames
+
+    @staticmethod
+    def as_array(frame):
+        """
+            Return a uint8 (height, width, 4) numpy array sharing the memory of a frame.
+            Requires numpy.
+        """
+        from numpy import frombuffer, uint8
+        return frombuffer(frame['data'], dtype=uint8).reshape(frame['height'], frame['width'], FrameReadback.PIXEL_SIZE)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        """
+            Return the next frame that is done. Stops when the application stops rendering.
+        """
+        while True:
+            if not self.ready:
+                self.collect()
+
+            if self.ready:
+                return self.frame(*self.ready.popleft())
+
+            app = self.app()
+            if app is None or (not app.running and not self.pending):
+                raise StopAsyncIteration
+
+            # Wait until `collect` moves a frame to the ready queue. The ready queue is checked
+            # again once the waiter is set, so a frame collected meanwhile is not missed.
+            # The timeout checks if the application stopped rendering
+            waiter = self.waiter = asyncio.get_event_loop().create_future()
+            try:
+                if not self.ready:
+                    await asyncio.wait_for(waiter, self.WAIT_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self.waiter = None
+
+
 class Application(object):
 
     def create_instance(self):
@@ -244,7 +733,9 @@ class Application(object):
             engine_name=b'test', engine_version=0, api_version=vk.API_VERSION_1_0
         )
 
-        if system_name == 'Windows':
+        if self.headless:
+            extensions = []
+        elif system_name == 'Windows':
             extensions = [b'VK_KHR_surface', b'VK_KHR_win32_surface']
         else:
             extensions = [b'VK_KHR_surface', b'VK_KHR_xcb_surface']
@@ -259,7 +750,7 @@ class Application(object):
             _layer_names = None
 
         extensions = [c_char_p(x) for x in extensions]
-        _extensions = cast((c_char_p*len(extensions))(*extensions), POINTER(c_char_p))
+        _extensions = cast((c_char_p*len(extensions))(*extensions), POINTER(c_char_p)) if extensions else None
 
         create_info = vk.InstanceCreateInfo(
             s_type=vk.STRUCTURE_TYPE_INSTANCE_CREATE_INFO, next=None, flags=0,
@@ -275,11 +766,10 @@ class Application(object):
         instance = vk.Instance(0)
         result = vk.CreateInstance(byref(create_info), None, byref(instance))
         if result == vk.SUCCESS:
-            # For simplicity, all vulkan functions are saved in the application object
-            functions = chain(vk.load_functions(instance, vk.InstanceFunctions, vk.GetInstanceProcAddr),
-                              vk.load_functions(instance, vk.PhysicalDeviceFunctions, vk.GetInstanceProcAddr))
-            for name, function in functions:
-                setattr(self, name, function)
+            # For simplicity, all vulkan functions are accessed from the application object
+            # They are loaded the first time they are used (see `Application.__getattr__`)
+            self.function_tables.append(vk.FunctionTable(instance, vk.InstanceFunctions, vk.GetInstanceProcAddr))
+            self.function_tables.append(vk.FunctionTable(instance, vk.PhysicalDeviceFunctions, vk.GetInstanceProcAddr))
 
             self.instance = instance
 
@@ -293,6 +783,7 @@ class Application(object):
     def create_device(self):
         self.gpu = None
         self.main_queue_family = None
+        self.timestamp_valid_bits = 0
 
         # Enumerate the physical devices
         gpu_count = c_uint(0)
@@ -326,12 +817,15 @@ class Application(object):
             cast(queue_families, POINTER(vk.QueueFamilyProperties))
         )
 
+        # In headless mode, there is no surface to present to
         surface = self.swapchain.surface
-        supported = vk.c_uint(0)
+        supported = vk.c_uint(1)
         for index, queue in enumerate(queue_families):
-            self.GetPhysicalDeviceSurfaceSupportKHR(self.gpu, index, surface, byref(supported))
+            if surface is not None:
+                self.GetPhysicalDeviceSurfaceSupportKHR(self.gpu, index, surface, byref(supported))
             if queue.queue_flags & vk.QUEUE_GRAPHICS_BIT != 0 and supported.value == 1:
                 self.main_queue_family = index
+                self.timestamp_valid_bits = queue.timestamp_valid_bits
                 break
 
         if self.main_queue_family is None:
@@ -350,8 +844,8 @@ class Application(object):
 
         queue_create_infos = (vk.DeviceQueueCreateInfo*1)(*(queue_create_info,))
 
-        extensions = (b'VK_KHR_swapchain',)
-        _extensions = cast((c_char_p*len(extensions))(*extensions), POINTER(c_char_p))
+        extensions = () if self.headless else (b'VK_KHR_swapchain',)
+        _extensions = cast((c_char_p*len(extensions))(*extensions), POINTER(c_char_p)) if extensions else None
         
         if ENABLE_VALIDATION:
             layer_count = 1
@@ -368,7 +862,7 @@ class Application(object):
             enabled_layer_count=layer_count, 
             enabled_layer_names=_layer_names,
 
-            enabled_extension_count=1,
+            enabled_extension_count=len(extensions),
             enabled_extension_names=_extensions,
 
             enabled_features=None
@@ -377,14 +871,10 @@ class Application(object):
         device = vk.Device(0)
         result = self.CreateDevice(self.gpu, byref(create_info), None, byref(device))
         if result == vk.SUCCESS:
-            # For simplicity, all vulkan functions are saved in the application object
-            # For simplicity, all vulkan functions are saved in the application object
-            functions = chain(vk.load_functions(device, vk.QueueFunctions, self.GetDeviceProcAddr),
-                              vk.load_functions(device, vk.DeviceFunctions, self.GetDeviceProcAddr),
-                              vk.load_functions(device, vk.CommandBufferFunctions, self.GetDeviceProcAddr))
-            
-            for name, function in functions:
-                setattr(self, name, function)
+            # For simplicity, all vulkan functions are accessed from the application object
+            # They are loaded the first time they are used (see `Application.__getattr__`)
+            for functions_list in (vk.QueueFunctions, vk.DeviceFunctions, vk.CommandBufferFunctions):
+                self.function_tables.append(vk.FunctionTable(device, functions_list, self.GetDeviceProcAddr))
 
             self.device = device
         else:
@@ -396,6 +886,13 @@ class Application(object):
         self.gpu_mem = vk.PhysicalDeviceMemoryProperties()
         self.GetPhysicalDeviceMemoryProperties(self.gpu, byref(self.gpu_mem))
 
+        # Get the physical device properties (limits, identifiers)
+        self.gpu_props = vk.PhysicalDeviceProperties()
+        self.GetPhysicalDeviceProperties(self.gpu, byref(self.gpu_props))
+
+        # The buffers and the images share large memory blocks
+        self.allocator = MemoryAllocator(self)
+
         # Get the queue that was created with the device
         queue = vk.Queue(0)
         self.GetDeviceQueue(device, self.main_queue_family, 0, byref(queue))
@@ -405,7 +902,10 @@ class Application(object):
             raise RuntimeError("Could not get device queue")
 
     def create_swapchain(self):
-        self.swapchain = Swapchain(self)
+        if self.headless:
+            self.swapchain = OffscreenSwapchain(self)
+        else:
+            self.swapchain = Swapchain(self)
 
     def create_command_pool(self):
         create_info = vk.CommandPoolCreateInfo(
@@ -471,6 +971,9 @@ class Application(object):
         else:
             raise RuntimeError('Failed to drawing buffers')
 
+        # The post present barrier is recorded in the draw buffers
+        if self.merge_post_present:
+            return
 
         result = self.AllocateCommandBuffers(self.device, byref(alloc_info), cast(post_present_buffers, POINTER(vk.CommandBuffer)))
         if result == vk.SUCCESS:
@@ -478,6 +981,18 @@ class Application(object):
         else:
             raise RuntimeError('Failed to present buffers')
     
+    def free_command_buffers(self):
+        len_draw_buffers = len(self.draw_buffers)
+        if len_draw_buffers > 0:
+            self.FreeCommandBuffers(self.device, self.cmd_pool, len_draw_buffers, cast(self.draw_buffers, POINTER(vk.CommandBuffer)))
+
+        len_post_present_buffers = len(self.post_present_buffers)
+        if len_post_present_buffers > 0:
+            self.FreeCommandBuffers(self.device, self.cmd_pool, len_post_present_buffers, cast(self.post_present_buffers, POINTER(vk.CommandBuffer)))
+
+        self.draw_buffers = []
+        self.post_present_buffers = []
+
     def create_depth_stencil(self):
         width, height = self.window.dimensions()
 
@@ -520,29 +1035,12 @@ class Application(object):
             subresource_range=subres_range
         )
 
-        mem_alloc_info = vk.MemoryAllocateInfo(
-            s_type=vk.STRUCTURE_TYPE_MEMORY_ALLOCATE_INFO, next=None,
-            allocation_size=0, memory_type_index=0
-        )
-
         depthstencil_image = vk.Image(0)
         result=self.CreateImage(self.device, byref(create_info), None, byref(depthstencil_image))
         if result != vk.SUCCESS:
             raise RuntimeError('Failed to create depth stencil image')
 
-        memreq = vk.MemoryRequirements()
-        self.GetImageMemoryRequirements(self.device, depthstencil_image, byref(memreq))
-        mem_alloc_info.allocation_size = memreq.size
-        mem_alloc_info.memory_type_index = self.get_memory_type(memreq.memory_type_bits, vk.MEMORY_PROPERTY_DEVICE_LOCAL_BIT)[1]
-        
-        depthstencil_mem = vk.DeviceMemory(0)
-        result = self.AllocateMemory(self.device, byref(mem_alloc_info), None, byref(depthstencil_mem))
-        if result != vk.SUCCESS:
-            raise RuntimeError('Could not allocate depth stencil image memory')
-
-        result = self.BindImageMemory(self.device, depthstencil_image, depthstencil_mem, 0)
-        if result != vk.SUCCESS:
-            raise RuntimeError('Could not bind the depth stencil memory to the image')
+        depthstencil_mem = self.allocator.allocate_image(depthstencil_image, vk.MEMORY_PROPERTY_DEVICE_LOCAL_BIT)
             
         self.set_image_layout(
             self.setup_buffer, depthstencil_image,
@@ -613,14 +1111,113 @@ class Application(object):
 
         self.render_pass = renderpass
 
+    def pipeline_cache_path(self):
+        """
+            Path of the pipeline cache file of the GPU. The cache data is only valid
+            for the device and the driver that created it.
+        """
+        if PIPELINE_CACHE_DIR is None:
+            return None
+
+        props = self.gpu_props
+        name = 'pipeline_{:04x}_{:04x}_{}.bin'.format(
+            props.vendor_ID, props.device_ID, bytes(props.pipeline_cache_UUID).hex()
+        )
+        return os.path.join(PIPELINE_CACHE_DIR, name)
+
+    def read_pipeline_cache(self):
+        """
+            Return the pipeline cache data saved by a previous run or None if there
+            is no file or if the file is corrupt or was created by another device
+        """
+        path = self.pipeline_cache_path()
+        if path is None:
+            return None
+
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+
+        header_size = PIPELINE_CACHE_FILE_HEADER.size
+        if len(data) < header_size + PIPELINE_CACHE_DATA_HEADER.size:
+            print('WARNING: Ignoring truncated pipeline cache {}'.format(path))
+            return None
+
+        magic, crc, size = PIPELINE_CACHE_FILE_HEADER.unpack_from(data)
+        data = data[header_size:]
+        if magic != PIPELINE_CACHE_MAGIC or size != len(data) or crc != zlib.crc32(data):
+            print('WARNING: Ignoring corrupt pipeline cache {}'.format(path))
+            return None
+
+        props = self.gpu_props
+        length, version, vendor, device, uuid = PIPELINE_CACHE_DATA_HEADER.unpack_from(data)
+        if length < PIPELINE_CACHE_DATA_HEADER.size or version != vk.PIPELINE_CACHE_HEADER_VERSION_ONE or \
+           vendor != props.vendor_ID or device != props.device_ID or uuid != bytes(props.pipeline_cache_UUID):
+            print('WARNING: Ignoring pipeline cache {} created by another device or driver'.format(path))
+            return None
+
+        return data
+
+    def save_pipeline_cache(self):
+        """
+            Write the pipeline cache data to disk. The file is replaced atomically, so a
+            crash during the write never leaves a partial cache.
+        """
+        path = self.pipeline_cache_path()
+        if path is None or not self.pipeline_cache:
+            return
+
+        size = vk.c_size_t(0)
+        result = self.GetPipelineCacheData(self.device, self.pipeline_cache, byref(size), None)
+        if result != vk.SUCCESS or size.value == 0:
+            return
+
+        data = (c_ubyte*size.value)()
+        result = self.GetPipelineCacheData(self.device, self.pipeline_cache, byref(size), data)
+        if result != vk.SUCCESS:
+            return
+
+        data = bytes(data)[:size.value]
+        header = PIPELINE_CACHE_FILE_HEADER.pack(PIPELINE_CACHE_MAGIC, zlib.crc32(data), len(data))
+
+        try:
+            os.makedirs(PIPELINE_CACHE_DIR, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=PIPELINE_CACHE_DIR, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(header)
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            print('WARNING: Could not save the pipeline cache: {}'.format(e))
+
     def create_pipeline_cache(self):
+        # Start from the cache saved by the previous run, if any
+        initial_data = self.read_pipeline_cache()
+        if initial_data is not None:
+            initial_data = (c_ubyte*len(initial_data)).from_buffer_copy(initial_data)
+
         create_info = vk.PipelineCacheCreateInfo(
-            s_type=vk.STRUCTURE_TYPE_PIPELINE_CACHE_CREATE_INFO, next=None,
-            flags=0, initial_data_size=0, initial_data=None
+            s_type=vk.STRUCTURE_TYPE_PIPELINE_CACHE_CREATE_INFO, next=None, flags=0,
+            initial_data_size=len(initial_data) if initial_data is not None else 0,
+            initial_data=cast(initial_data, vk.c_void_p) if initial_data is not None else None
         )
 
         pipeline_cache = vk.PipelineCache(0)
         result = self.CreatePipelineCache(self.device, byref(create_info), None, byref(pipeline_cache))
+        if result != vk.SUCCESS and initial_data is not None:
+            # The driver rejected the saved data, start with an empty cache
+            create_info.initial_data_size = 0
+            create_info.initial_data = None
+            result = self.CreatePipelineCache(self.device, byref(create_info), None, byref(pipeline_cache))
+
         if result != vk.SUCCESS:
             raise RuntimeError('Failed to create pipeline cache')
 
@@ -741,38 +1338,20 @@ class Application(object):
         return (False, None)
 
     def load_shader(self, name, stage):
-        # Read the shader data
-        path = './shaders/{}'.format(name)
-        shader_f = open(path, 'rb')
-        shader_bin = shader_f.read()
-        shader_bin_size = len(shader_bin)
-        shader_bin = (c_ubyte*shader_bin_size)(*shader_bin)
-        shader_f.close()
-
-        # Compile the shader
-        module = vk.ShaderModule(0)
-        module_create_info = vk.ShaderModuleCreateInfo(
-            s_type=vk.STRUCTURE_TYPE_SHADER_MODULE_CREATE_INFO, next=None,
-            code_size=len(shader_bin), code=cast(shader_bin, POINTER(c_uint))
-        )
-
-        result = self.CreateShaderModule(self.device, byref(module_create_info), None, byref(module))
-        if result != vk.SUCCESS:
-            raise RuntimeError('Could not compile shader at {}'.format(path))
-
-        shader_info = vk.PipelineShaderStageCreateInfo(
-            s_type=vk.STRUCTURE_TYPE_PIPELINE_SHADER_STAGE_CREATE_INFO, next=None,
-            flags=0, stage=stage, module=module, name=b'main',
-            specialization_info=None
-        )
-
-        self.shaders_modules.append(module)
-        return shader_info
+        """
+            Return the shader stage create info of a SPIR-V file of the shaders directory.
+            The shader modules are shared, release them with `self.shaders.release` once
+            the pipeline is destroyed.
+        """
+        return self.shaders.stage_info(name, stage)
 
     def resize_display(self, width, height):
         if not self.initialized:
             return 
 
+        # Frames may still be in flight
+        self.DeviceWaitIdle(self.device)
+
         self.create_setup_buffer()
 
         # Recreate the swap chain
@@ -781,39 +1360,66 @@ class Application(object):
         # Recreate the frame buffers
         self.DestroyImageView(self.device, self.depth_stencil['view'], None)
         self.DestroyImage(self.device, self.depth_stencil['image'], None)
-        self.FreeMemory(self.device, self.depth_stencil['mem'], None)
+        self.allocator.free(self.depth_stencil['mem'])
         self.create_depth_stencil()
 
         for fb in self.framebuffers:
             self.DestroyFramebuffer(self.device, fb, None)
         self.create_framebuffers()
 
+        if self.readback is not None:
+            self.readback.create()
+
         self.flush_setup_buffer()
 
         # Command buffers need to be recreated as they may store
 	    # references to the recreated frame buffer
-        len_draw_buffers = len(self.draw_buffers)
-        self.FreeCommandBuffers(self.device, self.cmd_pool, len_draw_buffers, cast(self.draw_buffers, POINTER(vk.CommandBuffer)))
-        self.FreeCommandBuffers(self.device, self.cmd_pool, len_draw_buffers, cast(self.post_present_buffers, POINTER(vk.CommandBuffer)))
+        self.free_command_buffers()
         self.create_command_buffers()
 
-    def __init__(self):
+    def __getattr__(self, name):
+        """
+            Load the vulkan function `name` from the function tables and save it
+            in the application object
+        """
+        for table in self.__dict__.get('function_tables', ()):
+            if name in table:
+                function = getattr(table, name)
+                setattr(self, name, function)
+                return function
+
+        raise AttributeError(name)
+
+    def __init__(self, merge_post_present=MERGE_POST_PRESENT, headless=HEADLESS, readback=ENABLE_READBACK, pacing=FRAME_PACING):
         self.initialized = False
+        self.headless = headless
+        self.readback = FrameReadback(self) if readback else None  # Copy of the rendered frames
+        self.function_tables = []      # Vulkan functions, loaded on demand
+        self.merge_post_present = merge_post_present
         self.running = False
         self.zoom = -2.5               # Scene zoom
         self.rotation = (c_float*3)()  # Scene rotation
-        self.shaders_modules = []      # A list of compiled shaders. GC'ed with the application
+        self.shaders = ShaderRegistry(self, join(dirname(abspath(__file__)), 'shaders'))  # Shared shader modules
         self.debugger = Debugger(self) # Throw errors if validations layers are activated
 
         # Syncronization between the system events and the rendering
         self.rendering_done = asyncio.Event()
+        self.pacer = FramePacer(pacing, PACING_TARGET_FPS)  # Present mode and frame rate limit (see pacing.py)
 
-        #System window
-        self.window = Window(self)
+        #System window. In headless mode, the window only holds the size of the images
+        if headless:
+            self.window = OffscreenWindow(self)
+        elif Window is None:
+            raise window_import_error
+        else:
+            self.window = Window(self)
 
         # Vulkan objets
         self.gpu = None
         self.gpu_mem = None
+        self.gpu_props = None
+        self.allocator = None
+        self.uploader = None
         self.instance = None
         self.device = None
         self.queue = None
@@ -821,7 +1427,7 @@ class Application(object):
         self.cmd_pool = None
         self.setup_buffer = None
         self.draw_buffers = []  
-        self.post_present_buffers = []
+        self.post_present_buffers = []  # Empty if the post present barrier is merged in the draw buffers
         self.render_pass = None
         self.pipeline_cache = None
         self.framebuffers = None
@@ -833,6 +1439,7 @@ class Application(object):
         self.create_swapchain()
         self.create_device()
         self.create_command_pool()
+        self.uploader = Uploader(self)
 
         self.create_setup_buffer()
         self.swapchain.create()
@@ -843,6 +1450,8 @@ class Application(object):
         self.create_framebuffers()
         self.flush_setup_buffer()
 
+        if self.readback is not None:
+            self.readback.create()
 
         self.window.show()
 
@@ -855,19 +1464,18 @@ class Application(object):
             if self.swapchain is not None:
                 self.swapchain.destroy()
 
+            if self.readback is not None:
+                self.readback.destroy()
+
             if self.setup_buffer is not None:
                 self.FreeCommandBuffers(dev, self.cmd_pool, 1, byref(self.setup_buffer))
 
-            len_draw_buffers = len(self.draw_buffers)
-            if len_draw_buffers > 0:
-                self.FreeCommandBuffers(dev, self.cmd_pool, len_draw_buffers, cast(self.draw_buffers, POINTER(vk.CommandBuffer)))
-                self.FreeCommandBuffers(dev, self.cmd_pool, len_draw_buffers, cast(self.post_present_buffers, POINTER(vk.CommandBuffer)))
+            self.free_command_buffers()
 
             if self.render_pass is not None:
                 self.DestroyRenderPass(self.device, self.render_pass, None)
 
-            for mod in self.shaders_modules:
-                self.DestroyShaderModule(self.device, mod, None)
+            self.shaders.destroy()
             
             if self.framebuffers is not None:
                 for fb in self.framebuffers:
@@ -880,14 +1488,21 @@ class Application(object):
                 self.DestroyImage(dev, self.depth_stencil['image'], None)
 
             if self.depth_stencil['mem'] is not None:
-                self.FreeMemory(dev, self.depth_stencil['mem'], None)
+                self.allocator.free(self.depth_stencil['mem'])
             
             if self.pipeline_cache:
+                self.save_pipeline_cache()
                 self.DestroyPipelineCache(self.device, self.pipeline_cache, None)
 
             if self.cmd_pool:
                 self.DestroyCommandPool(dev, self.cmd_pool, None)
 
+            if self.uploader is not None:
+                self.uploader.destroy()
+
+            if self.allocator is not None:
+                self.allocator.destroy()
+
         
             self.DestroyDevice(dev, None)
 
@@ -902,22 +1517,145 @@ class TriangleApplication(Application):
 
     VERTEX_BUFFER_BIND_ID = 0
 
-    def create_semaphores(self):
-        create_info = vk.SemaphoreCreateInfo(
+    def create_sync_objects(self):
+        semaphore_info = vk.SemaphoreCreateInfo(
             s_type=vk.STRUCTURE_TYPE_SEMAPHORE_CREATE_INFO,
             next=None, flags=0
         )
 
-        present = vk.Semaphore(0)
-        render = vk.Semaphore(0)
+        # The fences are created signaled, this way the first wait
+        # on a frame slot returns immediately
+        fence_info = vk.FenceCreateInfo(
+            s_type=vk.STRUCTURE_TYPE_FENCE_CREATE_INFO,
+            next=None, flags=vk.FENCE_CREATE_SIGNALED_BIT
+        )
+
+        # One set of synchronization objects per frame in flight
+        # The serialized mode (frames_in_flight == 0) uses a single set
+        for _ in range(max(self.frames_in_flight, 1)):
+            present = vk.Semaphore(0)
+            render = vk.Semaphore(0)
+            fence = vk.Fence(0)
+
+            result1 = self.CreateSemaphore(self.device, byref(semaphore_info), None, byref(present))
+            result2 = self.CreateSemaphore(self.device, byref(semaphore_info), None, byref(render))
+            result3 = self.CreateFence(self.device, byref(fence_info), None, byref(fence))
+            if (result1, result2, result3) != (vk.SUCCESS, vk.SUCCESS, vk.SUCCESS):
+                raise RuntimeError('Failed to create the frame synchronization objects')
+
+            frame = {'present': present, 'render': render, 'fence': fence, 'cmd_pool': None, 'cmdbuf': None}
+            if self.rerecord:
+                self.create_frame_command_buffer(frame)
+
+            self.create_frame_submit_info(frame)
+            self.frames.append(frame)
+
+        self.image_fences = [None] * len(self.swapchain.images)
+
+    def create_profiler(self):
+        regions = ['frame', 'render_pass']
+        if self.readback is not None:
+            regions.append('readback')
+
+        profiler = GpuProfiler(self, regions)
+        if not profiler.supported:
+            print('WARNING: the graphics queue does not support timestamps, the GPU profiler is disabled')
+            return
+
+        profiler.create()
+        self.profiler = profiler
+
+    def create_frame_submit_info(self, frame):
+        """
+            Build the submit and present structures of a frame slot. `draw` only writes
+            the acquired image index and the command buffer handles, so a frame does not
+            allocate any ctypes object.
+        """
+        # The wait semaphore ensures that the image is released by the
+        # presentation engine before its layout is changed
+        # In headless mode, there is no presentation engine to wait for
+        wait_present = not self.headless
+        if self.merge_post_present:
+            stages = c_uint(vk.PIPELINE_STAGE_COLOR_ATTACHMENT_OUTPUT_BIT)
+        else:
+            stages = c_uint(vk.PIPELINE_STAGE_ALL_COMMANDS_BIT)
+
+        frame['image_index'] = c_uint(0)
+        frame['stages'] = stages
+        frame['fence_ptr'] = pointer(frame['fence'])
+
+        frame['prebuf'] = vk.CommandBuffer(0)
+        frame['pre_submit'] = None
+        if not self.merge_post_present:
+            pre_submit = vk.SubmitInfo(
+                s_type=vk.STRUCTURE_TYPE_SUBMIT_INFO,
+                command_buffer_count=1,
+                command_buffers=pointer(frame['prebuf'])
+            )
+            if wait_present:
+                pre_submit.wait_dst_stage_mask = pointer(stages)
+                pre_submit.wait_semaphore_count = 1
+                pre_submit.wait_semaphores = pointer(frame['present'])
+
+            frame['pre_submit'] = pre_submit
+
+        # The submit information structure contains a list of
+        # command buffers and semaphores to be submitted to a queue
+        frame['drawbuf'] = vk.CommandBuffer(0)
+        submit = vk.SubmitInfo(
+            s_type=vk.STRUCTURE_TYPE_SUBMIT_INFO,
+            command_buffer_count=1,
+            command_buffers=pointer(frame['drawbuf'])
+        )
+
+        # The signal semaphore is used during queue presentation
+        # to ensure that the image is not rendered before all
+        # commands have been submitted
+        if not self.headless:
+            submit.signal_semaphore_count = 1
+            submit.signal_semaphores = pointer(frame['render'])
+
+        if self.merge_post_present and wait_present:
+            submit.wait_dst_stage_mask = pointer(stages)
+            submit.wait_semaphore_count = 1
+            submit.wait_semaphores = pointer(frame['present'])
+
+        frame['submit'] = submit
+        frame['present_info'] = None
+        if not self.headless:
+            frame['present_info'] = vk.PresentInfoKHR(
+                s_type=vk.STRUCTURE_TYPE_PRESENT_INFO_KHR, next=None,
+                swapchain_count=1, swapchains=pointer(self.swapchain.swapchain),
+                image_indices=pointer(frame['image_index']),
+                wait_semaphores=pointer(frame['render']),
+                wait_semaphore_count=1
+            )
+
+    def create_frame_command_buffer(self, frame):
+        """
+            Create the transient command pool of a frame in flight and its draw command buffer.
+            The buffer is allocated once, `draw` resets the whole pool before recording it again.
+        """
+        pool_info = vk.CommandPoolCreateInfo(
+            s_type=vk.STRUCTURE_TYPE_COMMAND_POOL_CREATE_INFO, next=None,
+            flags=vk.COMMAND_POOL_CREATE_TRANSIENT_BIT,
+            queue_family_index=self.main_queue_family
+        )
+
+        frame['cmd_pool'] = vk.CommandPool(0)
+        if self.CreateCommandPool(self.device, byref(pool_info), None, byref(frame['cmd_pool'])) != vk.SUCCESS:
+            raise RuntimeError('Could not create a frame command pool')
 
-        result1 = self.CreateSemaphore(self.device, byref(create_info), None, byref(present))
-        result2 = self.CreateSemaphore(self.device, byref(create_info), None, byref(render))
-        if vk.SUCCESS not in (result1, result2):
-            raise RuntimeError('Failed to create the semaphores')
+        alloc_info = vk.CommandBufferAllocateInfo(
+            s_type=vk.STRUCTURE_TYPE_COMMAND_BUFFER_ALLOCATE_INFO, next=None,
+            command_pool=frame['cmd_pool'],
+            level=vk.COMMAND_BUFFER_LEVEL_PRIMARY,
+            command_buffer_count=1
+        )
 
-        self.render_semaphores['present'] = present
-        self.render_semaphores['render'] = render
+        frame['cmdbuf'] = vk.CommandBuffer(0)
+        if self.AllocateCommandBuffers(self.device, byref(alloc_info), byref(frame['cmdbuf'])) != vk.SUCCESS:
+            raise RuntimeError('Failed to allocate a frame command buffer')
 
     def describe_bindings(self):
         bindings = (vk.VertexInputBindingDescription*1)()
@@ -947,13 +1685,6 @@ class TriangleApplication(Application):
         self.triangle['attributes'] = attributes
 
     def create_triangle(self):
-        data = vk.c_void_p(0)
-        memreq = vk.MemoryRequirements()
-        memalloc = vk.MemoryAllocateInfo(
-            s_type=vk.STRUCTURE_TYPE_MEMORY_ALLOCATE_INFO, next=None,
-            allocation_size=0, memory_type_index=0
-        )
-
         # Setup vertices
         vertices_data = (Vertex*3)(
             Vertex(pos=(1.0, 1.0, 0.0), col=(1.0, 0.0,0.0)),
@@ -968,187 +1699,84 @@ class TriangleApplication(Application):
         indices_size = sizeof(indices_data)
 
         #
-        # Store the vertices in the device memory
+        # Store the vertices and the indices in the device memory
         #
 
-        # 1 Create a staging buffer
-        vertex = {'buffer': vk.Buffer(0), 'memory': vk.DeviceMemory(0)}
-        indices = {'buffer': vk.Buffer(0), 'memory': vk.DeviceMemory(0)}
-
-        # 2 Create the vertex buffer
-        vertex_info = vk.BufferCreateInfo(
+        # 1 Create the vertex buffer with device only visibility
+        buffer_info = vk.BufferCreateInfo(
             s_type=vk.STRUCTURE_TYPE_BUFFER_CREATE_INFO, next=None,
-            flags=0, size=vertices_size, usage=vk.BUFFER_USAGE_TRANSFER_SRC_BIT,
+            flags=0, size=vertices_size, usage=vk.BUFFER_USAGE_VERTEX_BUFFER_BIT | vk.BUFFER_USAGE_TRANSFER_DST_BIT,
             sharing_mode=0, queue_family_index_count=0, queue_family_indices=None
         )
 
-        result = self.CreateBuffer(self.device, byref(vertex_info), None, byref(vertex['buffer']))
+        result = self.CreateBuffer(self.device, byref(buffer_info), None, byref(self.triangle['buffer']))
         if result != vk.SUCCESS:
-            raise 'Could not create a buffer'
+            raise RuntimeError('Could not create triangle buffer')
 
-        # 3 Allocate memory for the vertex buffer
-        self.GetBufferMemoryRequirements(self.device, vertex['buffer'], byref(memreq))
-        memalloc.allocation_size = memreq.size
-        memalloc.memory_type_index = self.get_memory_type(memreq.memory_type_bits, vk.MEMORY_PROPERTY_HOST_VISIBLE_BIT)[1]
-        result = self.AllocateMemory(self.device, byref(memalloc), None, byref(vertex['memory']))
-        if result != vk.SUCCESS:
-            raise 'Could not allocate buffer memory'
+        # 2 Allocate the buffer memory and bind the allocated memory to the buffer
+        self.triangle['memory'] = self.allocator.allocate_buffer(self.triangle['buffer'], vk.MEMORY_PROPERTY_DEVICE_LOCAL_BIT)
 
-        # 4  Map the buffer memory and write the data
-        result = self.MapMemory(self.device, vertex['memory'], 0, memalloc.allocation_size, 0, byref(data))
-        if result != vk.SUCCESS:
-            raise 'Could not map memory to local'
-        memmove(data, vertices_data, vertices_size)
-        x = cast(data, POINTER(c_float))
-        self.UnmapMemory(self.device, vertex['memory'])
-
-        # 5 Bind the memory and the buffer together
-        result = self.BindBufferMemory(self.device, vertex['buffer'], vertex['memory'], 0)
-        if result != vk.SUCCESS:
-            raise 'Could not bind buffer memory'
+        # Same steps for the index buffer (with the exception for the usage flags)
+        buffer_info.size = indices_size
+        buffer_info.usage =  vk.BUFFER_USAGE_INDEX_BUFFER_BIT | vk.BUFFER_USAGE_TRANSFER_DST_BIT
 
-        # 6 Create a destination buffer with device only visibility and allocate its memory
-        vertex_info.usage = vk.BUFFER_USAGE_VERTEX_BUFFER_BIT | vk.BUFFER_USAGE_TRANSFER_DST_BIT
-        result = self.CreateBuffer(self.device, byref(vertex_info), None, byref(self.triangle['buffer']))
+        result = self.CreateBuffer(self.device, byref(buffer_info), None, byref(self.triangle['indices_buffer']))
         if result != vk.SUCCESS:
-            raise 'Could not create triangle buffer'
-
-        # 7 Allocate the buffer memory and bind the allocated memory to the buffer
-        self.GetBufferMemoryRequirements(self.device, self.triangle['buffer'], byref(memreq))
-        memalloc.allocation_size = memreq.size
-        memalloc.memory_type_index = self.get_memory_type(memreq.memory_type_bits, vk.MEMORY_PROPERTY_DEVICE_LOCAL_BIT)[1]
-        result = self.AllocateMemory(self.device, byref(memalloc), None, self.triangle['memory'])
-        if result != vk.SUCCESS:
-            raise 'Could not allocate the triangle memory'
-        result = self.BindBufferMemory(self.device, self.triangle['buffer'], self.triangle['memory'], 0)
-        if result != vk.SUCCESS:
-            raise 'Could not bind the triangle memory'
-
-        #
-        # Store the indices in the device memory
-        #
-
-        # Same steps as 1,2,3,4,5
-        indices_info = vertex_info
-        indices_info.size = indices_size
-        indices_info.usage = vk.BUFFER_USAGE_TRANSFER_SRC_BIT
-
-        assert(self.CreateBuffer(self.device, byref(indices_info), None, byref(indices['buffer'])) == vk.SUCCESS)
-        self.GetBufferMemoryRequirements(self.device, indices['buffer'], byref(memreq))
-        memalloc.allocation_size = memreq.size
-        memalloc.memory_type_index = self.get_memory_type(memreq.memory_type_bits, vk.MEMORY_PROPERTY_HOST_VISIBLE_BIT)[1]
-        assert(self.AllocateMemory(self.device, byref(memalloc), None, byref(indices['memory'])) == vk.SUCCESS)
-        assert(self.MapMemory(self.device, indices['memory'], 0, indices_size, 0, byref(data)) == vk.SUCCESS)
-        memmove(data , indices_data, indices_size)
-        self.UnmapMemory(self.device, indices['memory'])
-        assert(self.BindBufferMemory(self.device, indices['buffer'], indices['memory'], 0) == vk.SUCCESS)
-        
-        # Same steps as 5, 7 (with the exception for the usage flags)
-        indices_info.usage =  vk.BUFFER_USAGE_INDEX_BUFFER_BIT | vk.BUFFER_USAGE_TRANSFER_DST_BIT
-        assert(self.CreateBuffer(self.device, byref(indices_info), None, self.triangle['indices_buffer']) == vk.SUCCESS)
-        self.GetBufferMemoryRequirements(self.device, self.triangle['indices_buffer'], byref(memreq))
-        memalloc.allocation_size = memreq.size
-        memalloc.memory_type_index = self.get_memory_type(memreq.memory_type_bits, vk.MEMORY_PROPERTY_DEVICE_LOCAL_BIT)[1]
-        assert(self.AllocateMemory(self.device, byref(memalloc), None, byref(self.triangle['indices_memory']))==vk.SUCCESS)
-        assert(self.BindBufferMemory(self.device, self.triangle['indices_buffer'], self.triangle['indices_memory'], 0) ==vk.SUCCESS)
-       
-        # Copy the staging buffer memory into the final buffers
-        cmd_info = vk.CommandBufferAllocateInfo(
-            s_type = vk.STRUCTURE_TYPE_COMMAND_BUFFER_ALLOCATE_INFO,
-            command_pool=self.cmd_pool,
-            level=vk.COMMAND_BUFFER_LEVEL_PRIMARY,
-            command_buffer_count=1
-        )
-        begin_info = vk.CommandBufferBeginInfo(
-            s_type=vk.STRUCTURE_TYPE_COMMAND_BUFFER_BEGIN_INFO, next=None,
-            flags=0, inheritance_info=None
-        )
-        copy_region = vk.BufferCopy(src_offset=0, dst_offset=0, size=0)
-        copy_command = vk.CommandBuffer(0)
-
-        assert(self.AllocateCommandBuffers(self.device, byref(cmd_info), byref(copy_command)) == vk.SUCCESS)
-        assert(self.BeginCommandBuffer(copy_command, byref(begin_info)) == vk.SUCCESS)
-        
-        #Vertex Buffer
-        copy_region.size = vertices_size
-        self.CmdCopyBuffer(
-            copy_command, vertex['buffer'],
-            self.triangle['buffer'],
-            1,
-            byref(copy_region)
-        )
-
-        #Index Buffer
-        copy_region.size = indices_size
-        self.CmdCopyBuffer(
-            copy_command, indices['buffer'],
-            self.triangle['indices_buffer'],
-            1,
-            byref(copy_region)
-        )
-
-        assert(self.EndCommandBuffer(copy_command) == vk.SUCCESS)
-
-        # Submit commands to the queue
-        submit_info = vk.SubmitInfo(
-            s_type=vk.STRUCTURE_TYPE_SUBMIT_INFO, next=None,
-            wait_semaphore_count=0, wait_semaphores=None,
-            wait_dst_stage_mask=None, command_buffer_count=1,
-            command_buffers=pointer(copy_command),
-            signal_semaphore_count=0, signal_semaphores=None,
-        )
-
-        assert(self.QueueSubmit(self.queue, 1, byref(submit_info), 0)==vk.SUCCESS)
-        assert(self.QueueWaitIdle(self.queue)==vk.SUCCESS)
+            raise RuntimeError('Could not create triangle index buffer')
 
-        # Free temporary ressources
-        self.FreeCommandBuffers(self.device, self.cmd_pool, 1, byref(copy_command))
+        self.triangle['indices_memory'] = self.allocator.allocate_buffer(self.triangle['indices_buffer'], vk.MEMORY_PROPERTY_DEVICE_LOCAL_BIT)
 
-        self.DestroyBuffer(self.device, vertex['buffer'], None)
-        self.FreeMemory(self.device, vertex['memory'], None)
-
-        self.DestroyBuffer(self.device, indices['buffer'], None)
-        self.FreeMemory(self.device, indices['memory'], None)
+        # 3 Copy the data through the staging ring. Both copies are submitted together
+        # The draw commands are submitted after the copies on the same queue, so there is nothing to wait for
+        self.uploader.upload(self.triangle['buffer'], vertices_data)
+        self.uploader.upload(self.triangle['indices_buffer'], indices_data)
+        self.uploader.flush()
 
         self.describe_bindings()
 
     def create_uniform_buffers(self):
-        memreq = vk.MemoryRequirements()
+        # The uniform buffer is a ring with one slot per swapchain image. The draw buffers are
+        # prerecorded for each image and select their slot with a dynamic offset
+        alignment = max(self.gpu_props.limits.min_uniform_buffer_offset_alignment, 1)
+        matsize = sizeof(self.matrices)
+        slot_size = (matsize + alignment - 1) // alignment * alignment
+        slot_count = len(self.swapchain.images)
 
         # Vertex shader uniform buffer block
         buffer_info = vk.BufferCreateInfo(
             s_type=vk.STRUCTURE_TYPE_BUFFER_CREATE_INFO, next=None,
-            flags=0, size=sizeof(Mat4)*3, usage=vk.BUFFER_USAGE_UNIFORM_BUFFER_BIT,
+            flags=0, size=slot_size*slot_count, usage=vk.BUFFER_USAGE_UNIFORM_BUFFER_BIT,
             sharing_mode=0, queue_family_index_count=0, queue_family_indices=None
         )
 
-        alloc_info = vk.MemoryAllocateInfo(
-            s_type=vk.STRUCTURE_TYPE_MEMORY_ALLOCATE_INFO, next=None,
-            allocation_size=0, memory_type_index=0
-        )
-
         result = self.CreateBuffer(self.device, byref(buffer_info), None, self.uniform_data['buffer'])
         if result != vk.SUCCESS:
             raise RuntimeError('Could not create the uniform buffer')
 
-        self.GetBufferMemoryRequirements(self.device, self.uniform_data['buffer'], byref(memreq))
-        alloc_info.allocation_size = memreq.size
-        alloc_info.memory_type_index = self.get_memory_type(memreq.memory_type_bits, vk.MEMORY_PROPERTY_HOST_VISIBLE_BIT)[1]
-
-        result = self.AllocateMemory(self.device, byref(alloc_info), None, byref(self.uniform_data['memory']))
-        if result != vk.SUCCESS:
-            raise RuntimeError('Failed to allocate the uniform buffer memory')
-
-        result = self.BindBufferMemory(self.device, self.uniform_data['buffer'], self.uniform_data['memory'], 0)
-        if result != vk.SUCCESS:
-            raise RuntimeError('Failed to bind the uniform buffer memory')
+        # Coherent memory, this way the writes do not need to be flushed
+        # The memory is mapped once and stays mapped until the buffer is destroyed
+        memory = self.allocator.allocate_buffer(self.uniform_data['buffer'], vk.MEMORY_PROPERTY_HOST_VISIBLE_BIT | vk.MEMORY_PROPERTY_HOST_COHERENT_BIT)
+        self.uniform_data['memory'] = memory
+        self.uniform_data['mapped'] = memory.mapped
+        self.uniform_data['slot_size'] = slot_size
+        self.uniform_data['slot_count'] = slot_count
 
         # Store information in the uniform's descriptor
+        # The offset of the slot is given when the descriptor set is bound
         self.uniform_data['descriptor'].buffer = self.uniform_data['buffer']
         self.uniform_data['descriptor'].offset = 0
-        self.uniform_data['descriptor'].range = sizeof(self.matrices)
+        self.uniform_data['descriptor'].range = matsize
 
+        self.update_projection()
         self.update_uniform_buffers()
+
+    def destroy_uniform_buffers(self):
+        self.DestroyBuffer(self.device, self.uniform_data['buffer'], None)
+        self.allocator.free(self.uniform_data['memory'])
+
+        self.uniform_data['buffer'] = vk.Buffer(0)
+        self.uniform_data['memory'] = None
+        self.uniform_data['mapped'] = None
  
     def create_descriptor_set_layout(self):
         # Setup layout of descriptors used in this example
@@ -1159,7 +1787,7 @@ class TriangleApplication(Application):
 
         # Binding 0 : Uniform buffer (Vertex shader)
         binding = vk.DescriptorSetLayoutBinding(
-            descriptor_type=vk.DESCRIPTOR_TYPE_UNIFORM_BUFFER,
+            descriptor_type=vk.DESCRIPTOR_TYPE_UNIFORM_BUFFER_DYNAMIC,
             descriptor_count=1, stage_flags=vk.SHADER_STAGE_VERTEX_BIT,
             immutable_samplers=None
         )
@@ -1191,8 +1819,16 @@ class TriangleApplication(Application):
         self.pipeline_layout = pipeline_layout
         self.descriptor_set_layout = ds_layout
 
-    def create_pipeline(self):
+    def compile_pipeline(self, description=None):
+        """
+            Create a graphics pipeline from a PipelineDescription (the triangle pipeline
+            by default). The pipeline must be destroyed with `destroy_pipeline`.
+            The structures are not shared with other calls, so the function can run in
+            several threads. Use `self.pipelines` to reuse the compiled pipelines.
+        """
         tri = self.triangle
+        desc = description or PipelineDescription()
+        states = desc.states()
 
         # Vertex input state
         input_state = vk.PipelineVertexInputStateCreateInfo(
@@ -1202,98 +1838,28 @@ class TriangleApplication(Application):
             vertex_binding_descriptions = cast(tri['bindings'], POINTER(vk.VertexInputBindingDescription)),
             vertex_attribute_descriptions = cast(tri['attributes'], POINTER(vk.VertexInputAttributeDescription))
         )
-        tri['input_state'] = input_state
-
-        # Vertex input state
-		# Describes the topoloy used with this pipeline 
-        input_assembly_state = vk.PipelineInputAssemblyStateCreateInfo(
-            s_type=vk.STRUCTURE_TYPE_PIPELINE_INPUT_ASSEMBLY_STATE_CREATE_INFO, next=None,
-            flags=0, primitive_restart_enable=0,
-            topology=vk.PRIMITIVE_TOPOLOGY_TRIANGLE_LIST,  #This pipeline renders vertex data as triangle lists
-        )
-
-        # Rasterization state
-        raster_state = vk.PipelineRasterizationStateCreateInfo(
-            s_type=vk.STRUCTURE_TYPE_PIPELINE_RASTERIZATION_STATE_CREATE_INFO, next=None,
-            flags=0,
-            polygon_mode=vk.POLYGON_MODE_FILL,          # Solid polygon mode
-            cull_mode= vk.CULL_MODE_NONE,               # No culling
-            front_face=vk.FRONT_FACE_CLOCKWISE,
-            depth_clamp_enable=0, rasterizer_discard_enable=0,
-            depth_bias_enable=0, line_width=1.0
-        )
-
-        # Color blend state
-        # Describes blend modes and color masks
-        blend_state = vk.PipelineColorBlendAttachmentState(
-            color_write_mask=0xF, blend_enable=0
-        )
-        color_blend_state = vk.PipelineColorBlendStateCreateInfo(
-            s_type=vk.STRUCTURE_TYPE_PIPELINE_COLOR_BLEND_STATE_CREATE_INFO, next=None,
-            flags=0, logic_op_enable=0, attachment_count=1, attachments=pointer(blend_state)
-        )
-
-        # Viewport state
-        viewport_state = vk.PipelineViewportStateCreateInfo(
-            s_type=vk.STRUCTURE_TYPE_PIPELINE_VIEWPORT_STATE_CREATE_INFO,
-            viewport_count=1, scissor_count=1
-        )
-
-        # Enable dynamic states
-		# Describes the dynamic states to be used with this pipeline
-		# Dynamic states can be set even after the pipeline has been created
-		# So there is no need to create new pipelines just for changing
-		# a viewport's dimensions or a scissor box
-        dynamic_states = (c_uint*2)(vk.DYNAMIC_STATE_VIEWPORT, vk.DYNAMIC_STATE_SCISSOR)
-        dynamic_state = vk.PipelineDynamicStateCreateInfo(
-            s_type=vk.STRUCTURE_TYPE_PIPELINE_DYNAMIC_STATE_CREATE_INFO, next=None,
-            flags=0,dynamic_state_count=2,
-            dynamic_states=cast(dynamic_states, POINTER(c_uint))
-        )
-
-        # Depth and stencil state
-		# Describes depth and stenctil test and compare ops
-        # Basic depth compare setup with depth writes and depth test enabled
-		# No stencil used 
-        op_state = vk.StencilOpState(
-            fail_op=vk.STENCIL_OP_KEEP, pass_op=vk.STENCIL_OP_KEEP,
-            compare_op=vk.COMPARE_OP_ALWAYS
-        )
-        depth_stencil_state = vk.PipelineDepthStencilStateCreateInfo(
-            s_type=vk.STRUCTURE_TYPE_PIPELINE_DEPTH_STENCIL_STATE_CREATE_INFO, next=None, 
-            flags=0, depth_test_enable=1, depth_write_enable=1, 
-            depth_compare_op=vk.COMPARE_OP_LESS_OR_EQUAL,
-            depth_bounds_test_enable=0, stencil_test_enable=0,
-            front=op_state, back=op_state
-        )
-
-        # Multi sampling state
-        # No multi sampling used in this example
-        multisample_state = vk.PipelineMultisampleStateCreateInfo(
-            s_type=vk.STRUCTURE_TYPE_PIPELINE_MULTISAMPLE_STATE_CREATE_INFO, next=None, 
-            flags=0, rasterization_samples=vk.SAMPLE_COUNT_1_BIT
-        )
 
         # Load shaders
 		# Shaders are loaded from the SPIR-V format, which can be generated from glsl
         shader_stages = (vk.PipelineShaderStageCreateInfo * 2)(
-            self.load_shader('triangle.vert.spv', vk.SHADER_STAGE_VERTEX_BIT),
-            self.load_shader('triangle.frag.spv', vk.SHADER_STAGE_FRAGMENT_BIT)
+            self.load_shader(desc.vertex_shader, vk.SHADER_STAGE_VERTEX_BIT),
+            self.load_shader(desc.fragment_shader, vk.SHADER_STAGE_FRAGMENT_BIT)
         )
+        modules = [stage.module for stage in shader_stages]
 
         create_info = vk.GraphicsPipelineCreateInfo(
             s_type=vk.STRUCTURE_TYPE_GRAPHICS_PIPELINE_CREATE_INFO, next=None,
             flags=0, stage_count=2, 
             stages=cast(shader_stages, POINTER(vk.PipelineShaderStageCreateInfo)),
             vertex_input_state=pointer(input_state),
-            input_assembly_state=pointer(input_assembly_state),
+            input_assembly_state=pointer(states['input_assembly']),
             tessellation_state=None,
-            viewport_state=pointer(viewport_state),
-            rasterization_state=pointer(raster_state),
-            multisample_state=pointer(multisample_state),
-            depth_stencil_state=pointer(depth_stencil_state),
-            color_blend_state=pointer(color_blend_state),
-            dynamic_state=pointer(dynamic_state),
+            viewport_state=pointer(states['viewport']),
+            rasterization_state=pointer(states['rasterization']),
+            multisample_state=pointer(states['multisample']),
+            depth_stencil_state=pointer(states['depth_stencil']),
+            color_blend_state=pointer(states['color_blend']),
+            dynamic_state=pointer(states['dynamic']),
             layout=self.pipeline_layout,
             render_pass=self.render_pass,
             subpass=0,
@@ -1301,20 +1867,46 @@ class TriangleApplication(Application):
             basePipelineIndex=0
         )
 
+        # The pipeline cache is internally synchronized, the pipelines can be compiled in parallel
         pipeline = vk.Pipeline(0)
         result = self.CreateGraphicsPipelines(self.device, self.pipeline_cache, 1, byref(create_info), None, byref(pipeline))
         if result != vk.SUCCESS:
-             raise RuntimeError('Failed to create the graphics pipeline')
-        
-        self.pipeline = pipeline
+            for module in modules:
+                self.shaders.release(module)
+            raise RuntimeError('Failed to create the graphics pipeline')
+
+        self.pipelines_shaders[pipeline.value] = modules
+        return pipeline
+
+    def compile_pipelines(self, descriptions):
+        """
+            Compile a batch of PipelineDescription (see `compile_pipeline`) in a thread pool.
+            Return a list of futures of the pipelines, in the order of the descriptions.
+        """
+        if self.pipeline_executor is None:
+            self.pipeline_executor = ThreadPoolExecutor(max_workers=PIPELINE_COMPILE_THREADS)
+
+        return [self.pipeline_executor.submit(self.compile_pipeline, desc) for desc in descriptions]
+
+    def destroy_pipeline(self, pipeline):
+        """
+            Destroy a pipeline created by `compile_pipeline` and release its shader modules
+        """
+        self.DestroyPipeline(self.device, pipeline, None)
+        for module in self.pipelines_shaders.pop(pipeline.value, ()):
+            self.shaders.release(module)
+
+    def create_pipeline(self):
+        self.pipeline = self.pipelines.acquire(PipelineDescription())
+
 
     def create_descriptor_pool(self):
 
         # We need to tell the API the number of max. requested descriptors per type
-        # This example only uses one descriptor type (uniform buffer) and only
+        # This example only uses one descriptor type (dynamic uniform buffer) and only
 		# requests one descriptor of this type
         type_counts = vk.DescriptorPoolSize(
-            type=vk.DESCRIPTOR_TYPE_UNIFORM_BUFFER,
+            type=vk.DESCRIPTOR_TYPE_UNIFORM_BUFFER_DYNAMIC,
             descriptor_count=1
         )
 
@@ -1347,25 +1939,76 @@ class TriangleApplication(Application):
         if result != vk.SUCCESS:
             raise RuntimeError('Could not allocate descriptor set')
 
+        self.descriptor_set = descriptor_set
+        self.write_descriptor_set()
 
+    def write_descriptor_set(self):
         #Binding 0 : Uniform buffer
         write_set = vk.WriteDescriptorSet(
             s_type=vk.STRUCTURE_TYPE_WRITE_DESCRIPTOR_SET, next=None,
-            dst_set=descriptor_set, descriptor_count=1,
-            descriptor_type=vk.DESCRIPTOR_TYPE_UNIFORM_BUFFER,
+            dst_set=self.descriptor_set, descriptor_count=1,
+            descriptor_type=vk.DESCRIPTOR_TYPE_UNIFORM_BUFFER_DYNAMIC,
             buffer_info=pointer(self.uniform_data['descriptor']),
             dst_binding=0 # Binds this uniform buffer to binding point 0
         )
 
         self.UpdateDescriptorSets(self.device, 1, byref(write_set), 0, None)
-        self.descriptor_set = descriptor_set
 
-    def init_command_buffers(self):
-        
-        begin_info = vk.CommandBufferBeginInfo(
-            s_type=vk.STRUCTURE_TYPE_COMMAND_BUFFER_BEGIN_INFO, next=None
+    def record_draws(self, cmdbuf, index, count):
+        """
+            Record `count` draws of the image `index`. The dynamic state and the bindings
+            are recorded first, because secondary command buffers do not inherit them.
+        """
+        width, height = self.window.dimensions()
+
+        # Update dynamic viewport state
+        viewport = vk.Viewport(
+            x=0.0, y=0.0, width=float(width), height=float(height),
+            min_depth=0.0, max_depth=1.0
         )
+        self.CmdSetViewport(cmdbuf, 0, 1, byref(viewport))
+
+        # Update dynamic scissor state
+        scissor = vk.Rect2D(offset=vk.Offset2D(x=0, y=0), extent=vk.Extent2D(width=width, height=height))
+        self.CmdSetScissor(cmdbuf, 0, 1, byref(scissor))
+
+        # Bind descriptor sets describing shader binding points
+        # The dynamic offset selects the uniform buffer slot of the image
+        dynamic_offset = c_uint(index * self.uniform_data['slot_size'])
+        self.CmdBindDescriptorSets(cmdbuf, vk.PIPELINE_BIND_POINT_GRAPHICS, self.pipeline_layout, 0, 1, byref(self.descriptor_set), 1, byref(dynamic_offset))
+
+        # Bind the rendering pipeline (including the shaders)
+        self.CmdBindPipeline(cmdbuf, vk.PIPELINE_BIND_POINT_GRAPHICS, self.pipeline)
+
+        # Bind triangle vertices
+        offsets = c_ulonglong(0)
+        self.CmdBindVertexBuffers(cmdbuf, self.VERTEX_BUFFER_BIND_ID, 1, byref(self.triangle['buffer']), byref(offsets))
 
+        # Bind triangle indices
+        self.CmdBindIndexBuffer(cmdbuf, self.triangle['indices_buffer'], 0, vk.INDEX_TYPE_UINT32)
+
+        # Draw indexed triangle
+        for _ in range(count):
+            self.CmdDrawIndexed(cmdbuf, 3, 1, 0, 0, 1)
+
+    def record_secondary_buffers(self, index):
+        """
+            Split the draws of the image `index` in one job per recording thread.
+            Return the futures of the secondary command buffers.
+        """
+        per_job = -(-self.draw_count // self.recorder.threads)
+        jobs = [
+            lambda cmdbuf, count=min(per_job, self.draw_count-first): self.record_draws(cmdbuf, index, count)
+            for first in range(0, self.draw_count, per_job)
+        ]
+        return self.recorder.record(self.render_pass, self.framebuffers[index], jobs)
+
+    def record_draw_buffer(self, cmdbuf, index, secondary_buffers=None, flags=0):
+        """
+            Record the draw command buffer of the image `index`. If `secondary_buffers` is
+            not None, the draws are executed from these secondary command buffers (see
+            `record_secondary_buffers`) instead of being recorded inline.
+        """
         clear_values = (vk.ClearValue*2)()
         clear_values[0].color = vk.ClearColorValue((c_float*4)(0.1, 0.1, 0.1, 1.0))
         clear_values[1].depth_stencil = vk.ClearDepthStencilValue(depth=1.0, stencil=0)
@@ -1382,9 +2025,19 @@ class TriangleApplication(Application):
             clear_values = cast(clear_values, POINTER(vk.ClearValue))
         )
 
-        for index, cmdbuf in enumerate(self.post_present_buffers):
-            assert(self.BeginCommandBuffer(cmdbuf, byref(begin_info)) == vk.SUCCESS)
+        begin_info = vk.CommandBufferBeginInfo(
+            s_type=vk.STRUCTURE_TYPE_COMMAND_BUFFER_BEGIN_INFO, next=None, flags=flags
+        )
+        assert(self.BeginCommandBuffer(cmdbuf, byref(begin_info)) == vk.SUCCESS)
+
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.reset(cmdbuf, index)
+            profiler.begin(cmdbuf, index, 'frame')
 
+        if self.merge_post_present:
+            # Transition the image from the present layout to the color attachment layout
+            # The submit waits on the acquire semaphore at the color attachment output stage
             subres = vk.ImageSubresourceRange(
                 aspect_mask=vk.IMAGE_ASPECT_COLOR_BIT, base_mip_level=0,
                 level_count=1, base_array_layer=0, layer_count=1,
@@ -1394,7 +2047,7 @@ class TriangleApplication(Application):
                 s_type=vk.STRUCTURE_TYPE_IMAGE_MEMORY_BARRIER, next=None,
                 src_access_mask=0,
                 dst_access_mask=vk.ACCESS_COLOR_ATTACHMENT_WRITE_BIT,
-                old_layout=vk.IMAGE_LAYOUT_PRESENT_SRC_KHR,
+                old_layout=self.swapchain.final_layout,
                 new_layout=vk.IMAGE_LAYOUT_COLOR_ATTACHMENT_OPTIMAL,
                 src_queue_family_index=vk.QUEUE_FAMILY_IGNORED,
                 dst_queue_family_index=vk.QUEUE_FAMILY_IGNORED,
@@ -1403,6 +2056,61 @@ class TriangleApplication(Application):
             )
 
             self.CmdPipelineBarrier(
+                cmdbuf,
+                vk.PIPELINE_STAGE_COLOR_ATTACHMENT_OUTPUT_BIT,
+                vk.PIPELINE_STAGE_COLOR_ATTACHMENT_OUTPUT_BIT,
+                0,
+                0, None,
+                0, None,
+                1, byref(barrier))
+
+        render_pass_begin.framebuffer = self.framebuffers[index]
+        if profiler is not None:
+            profiler.begin(cmdbuf, index, 'render_pass')
+
+        if secondary_buffers is None:
+            self.CmdBeginRenderPass(cmdbuf, byref(render_pass_begin), vk.SUBPASS_CONTENTS_INLINE)
+            self.record_draws(cmdbuf, index, self.draw_count)
+        else:
+            self.CmdBeginRenderPass(cmdbuf, byref(render_pass_begin), vk.SUBPASS_CONTENTS_SECONDARY_COMMAND_BUFFERS)
+            self.recorder.execute(cmdbuf, secondary_buffers)
+
+        self.CmdEndRenderPass(cmdbuf)
+
+        if profiler is not None:
+            profiler.end(cmdbuf, index, 'render_pass')
+
+        # Copy the frame into the readback ring
+        if self.readback is not None:
+            if profiler is not None:
+                profiler.begin(cmdbuf, index, 'readback', vk.PIPELINE_STAGE_TRANSFER_BIT)
+            layout = self.readback.record(cmdbuf, index)
+            if profiler is not None:
+                profiler.end(cmdbuf, index, 'readback', vk.PIPELINE_STAGE_TRANSFER_BIT)
+        else:
+            layout = vk.IMAGE_LAYOUT_COLOR_ATTACHMENT_OPTIMAL
+
+        # Add a present memory barrier to the end of the command buffer
+			# This will transform the frame buffer color attachment to a
+			# new layout for presenting it to the windowing system integration
+        subres = vk.ImageSubresourceRange(
+            aspect_mask=vk.IMAGE_ASPECT_COLOR_BIT, base_mip_level=0,
+            level_count=1, base_array_layer=0, layer_count=1,
+        )
+
+        barrier = vk.ImageMemoryBarrier(
+            s_type=vk.STRUCTURE_TYPE_IMAGE_MEMORY_BARRIER, next=None,
+            src_access_mask=vk.ACCESS_COLOR_ATTACHMENT_WRITE_BIT,
+            dst_access_mask=vk.ACCESS_MEMORY_READ_BIT,
+            old_layout=layout,
+            new_layout=self.swapchain.final_layout,
+            src_queue_family_index=vk.QUEUE_FAMILY_IGNORED,
+            dst_queue_family_index=vk.QUEUE_FAMILY_IGNORED,
+            image=self.swapchain.images[index], 
+            subresource_range=subres
+        )
+
+        self.CmdPipelineBarrier(
 				cmdbuf, 
 				vk.PIPELINE_STAGE_ALL_COMMANDS_BIT, 
 				vk.PIPELINE_STAGE_BOTTOM_OF_PIPE_BIT,
@@ -1411,46 +2119,20 @@ class TriangleApplication(Application):
 				0, None,
 				1, byref(barrier));
 
-            assert(self.EndCommandBuffer(cmdbuf) == vk.SUCCESS)
-
-        for index, cmdbuf in enumerate(self.draw_buffers):
-            assert(self.BeginCommandBuffer(cmdbuf, byref(begin_info)) == vk.SUCCESS)
-
-            render_pass_begin.framebuffer = self.framebuffers[index]
-            self.CmdBeginRenderPass(cmdbuf, byref(render_pass_begin), vk.SUBPASS_CONTENTS_INLINE)
-
-            # Update dynamic viewport state
-            viewport = vk.Viewport(
-                x=0.0, y=0.0, width=float(width), height=float(height),
-                min_depth=0.0, max_depth=1.0
-            )
-            self.CmdSetViewport(cmdbuf, 0, 1, byref(viewport))
-
-            # Update dynamic scissor state
-            scissor = render_area
-            self.CmdSetScissor(cmdbuf, 0, 1, byref(scissor))
-
-            # Bind descriptor sets describing shader binding points
-            self.CmdBindDescriptorSets(cmdbuf, vk.PIPELINE_BIND_POINT_GRAPHICS, self.pipeline_layout, 0, 1, byref(self.descriptor_set), 0, None)
+        if profiler is not None:
+            profiler.end(cmdbuf, index, 'frame')
 
-            # Bind the rendering pipeline (including the shaders)
-            self.CmdBindPipeline(cmdbuf, vk.PIPELINE_BIND_POINT_GRAPHICS, self.pipeline)
+        assert(self.EndCommandBuffer(cmdbuf) == vk.SUCCESS)
 
-            # Bind triangle vertices
-            offsets = c_ulonglong(0)
-            self.CmdBindVertexBuffers(cmdbuf, self.VERTEX_BUFFER_BIND_ID, 1, byref(self.triangle['buffer']), byref(offsets))
-
-            # Bind triangle indices
-            self.CmdBindIndexBuffer(cmdbuf, self.triangle['indices_buffer'], 0, vk.INDEX_TYPE_UINT32)
-
-            # Draw indexed triangle
-            self.CmdDrawIndexed(cmdbuf, 3, 1, 0, 0, 1)
+    def init_command_buffers(self):
+        
+        begin_info = vk.CommandBufferBeginInfo(
+            s_type=vk.STRUCTURE_TYPE_COMMAND_BUFFER_BEGIN_INFO, next=None
+        )
 
-            self.CmdEndRenderPass(cmdbuf)
+        for index, cmdbuf in enumerate(self.post_present_buffers):
+            assert(self.BeginCommandBuffer(cmdbuf, byref(begin_info)) == vk.SUCCESS)
 
-            # Add a present memory barrier to the end of the command buffer
-			# This will transform the frame buffer color attachment to a
-			# new layout for presenting it to the windowing system integration
             subres = vk.ImageSubresourceRange(
                 aspect_mask=vk.IMAGE_ASPECT_COLOR_BIT, base_mip_level=0,
                 level_count=1, base_array_layer=0, layer_count=1,
@@ -1458,10 +2140,10 @@ class TriangleApplication(Application):
 
             barrier = vk.ImageMemoryBarrier(
                 s_type=vk.STRUCTURE_TYPE_IMAGE_MEMORY_BARRIER, next=None,
-                src_access_mask=vk.ACCESS_COLOR_ATTACHMENT_WRITE_BIT,
-                dst_access_mask=vk.ACCESS_MEMORY_READ_BIT,
-                old_layout=vk.IMAGE_LAYOUT_COLOR_ATTACHMENT_OPTIMAL,
-                new_layout=vk.IMAGE_LAYOUT_PRESENT_SRC_KHR,
+                src_access_mask=0,
+                dst_access_mask=vk.ACCESS_COLOR_ATTACHMENT_WRITE_BIT,
+                old_layout=self.swapchain.final_layout,
+                new_layout=vk.IMAGE_LAYOUT_COLOR_ATTACHMENT_OPTIMAL,
                 src_queue_family_index=vk.QUEUE_FAMILY_IGNORED,
                 dst_queue_family_index=vk.QUEUE_FAMILY_IGNORED,
                 image=self.swapchain.images[index], 
@@ -1477,134 +2159,355 @@ class TriangleApplication(Application):
 				0, None,
 				1, byref(barrier));
 
-            
             assert(self.EndCommandBuffer(cmdbuf) == vk.SUCCESS)
 
-    def update_uniform_buffers(self):
-        data = vk.c_void_p(0)
-        matsize = sizeof(Mat4)*3
+        # In the re-recording mode, `draw` records the draw buffer of every frame
+        if self.rerecord:
+            return
 
-        # Projection 
+        # Record the draws of every image in the worker threads while the primary
+        # command buffers are recorded
+        secondary_buffers = [None] * len(self.draw_buffers)
+        if self.recorder is not None:
+            self.recorder.reset()
+            secondary_buffers = [self.record_secondary_buffers(index) for index in range(len(self.draw_buffers))]
+
+        for index, cmdbuf in enumerate(self.draw_buffers):
+            self.record_draw_buffer(cmdbuf, index, secondary_buffers[index])
+
+    def update_projection(self):
         width, height = self.window.dimensions()
-        self.matrices[0].set_data(perspective(60.0, width/height, 0.1, 256.0))
+        if USE_NUMPY_MATH:
+            xmath_numpy.perspective(60.0, width/height, 0.1, 256.0, out=self.matrices_arrays[0])
+        else:
+            self.matrices[0].set_data(perspective(60.0, width/height, 0.1, 256.0))
+
+    def update_uniform_buffers(self, state=None):
+        """
+            Compute the model and the view matrices. The matrices are copied in
+            the uniform buffer slot of the next rendered image by `draw`.
+            `state` is an input snapshot (see `input_changed`), the current
+            rotation and zoom are used by default.
+        """
+        if state is None:
+            rx, ry, rz, zoom = self.rotation[0], self.rotation[1], self.rotation[2], self.zoom
+        else:
+            rx, ry, rz, zoom = state[:4]
+
+        if USE_NUMPY_MATH:
+            # The results are written directly in the matrices memory
+            model, view = self.matrices_arrays[1], self.matrices_arrays[2]
+            xmath_numpy.rotate(None, rx, (1.0, 0.0, 0.0), out=model)
+            xmath_numpy.rotate(model, ry, (0.0, 1.0, 0.0), out=model)
+            xmath_numpy.rotate(model, rz, (0.0, 0.0, 1.0), out=model)
+            xmath_numpy.translate(None, (0.0, 0.0, zoom), out=view)
+            return
 
         # Model
-        mod_mat = rotate(None, self.rotation[0], (1.0, 0.0, 0.0))
-        mod_mat = rotate(mod_mat, self.rotation[1], (0.0, 1.0, 0.0))
-        self.matrices[1].set_data(rotate(mod_mat, self.rotation[2], (0.0, 0.0, 1.0)))
+        mod_mat = rotate(None, rx, (1.0, 0.0, 0.0))
+        mod_mat = rotate(mod_mat, ry, (0.0, 1.0, 0.0))
+        self.matrices[1].set_data(rotate(mod_mat, rz, (0.0, 0.0, 1.0)))
 
         # View
-        self.matrices[2].set_data(translate(None, (0.0, 0.0, self.zoom)))
+        self.matrices[2].set_data(translate(None, (0.0, 0.0, zoom)))
+
+    def input_changed(self):
+        """
+            Called by the window after the rotation or the zoom changed. The values are
+            published as an immutable snapshot: a single attribute assignment, so the
+            render thread never sees a half updated state and no lock is needed.
+            The matrices are only updated by `draw`, once per frame, with the last snapshot.
 
+            The snapshot also holds the time of the first event not rendered yet (the
+            latency is measured from it) and the number of events published so far.
+        """
+        now = time.perf_counter()
+        events = self.input_counters['events'] + 1
+        self.input_counters['events'] = events
 
-        self.MapMemory(self.device, self.uniform_data['memory'], 0, matsize, 0, byref(data))
-        memmove(data, self.matrices, matsize)
-        self.UnmapMemory(self.device, self.uniform_data['memory'])
+        # If the render thread applies `state` concurrently, its first event time is kept:
+        # the next latency is overestimated, never underestimated
+        state = self.input_state
+        first = now if state is None or state is self.applied_input else state[4]
+        self.input_state = (self.rotation[0], self.rotation[1], self.rotation[2], self.zoom, first, events)
+
+    def apply_input(self):
+        """
+            Update the matrices if a new input snapshot was published since the last
+            frame. The snapshots replaced before a frame are counted as skipped updates.
+        """
+        state = self.input_state
+        if state is not self.applied_input:
+            self.applied_input = state
+            self.update_uniform_buffers(state)
+            if self.input_time is None:
+                self.input_time = state[4]
+
+            # The number of events comes from the snapshot, never ahead of the updates
+            counters = self.input_counters
+            counters['updates'] += 1
+            counters['skipped'] = state[5] - counters['updates']
+
+    def latency_report(self):
+        """
+            Return the p50, p99 and max of the time between an input event and the
+            submit of the first frame using it, in milliseconds
+        """
+        values = sorted(self.input_latency)
+        return {
+            'events': len(values),
+            'p50': percentile(values, 50),
+            'p99': percentile(values, 99),
+            'max': values[-1] if values else 0.0,
+        }
+
+    def write_uniform_buffer(self, slot):
+        ubo = self.uniform_data
+        memmove(ubo['mapped'] + slot * ubo['slot_size'], self.matrices, sizeof(self.matrices))
 
     def resize_display(self, width, height):
         if not self.initialized:
             return 
+
+        # The swapchain is only recreated by the render thread, between two frames
+        if self.render_thread is not None and threading.current_thread() is not self.render_thread:
+            self.resize_request = (width, height)
+            return
             
         Application.resize_display(self, width, height)
 
+        self.image_fences = [None] * len(self.swapchain.images)
+
+        # The present infos reference the handle of the recreated swapchain
+        for frame in self.frames:
+            self.create_frame_submit_info(frame)
+
+        # The uniform ring needs one slot per swapchain image
+        if len(self.swapchain.images) != self.uniform_data['slot_count']:
+            self.destroy_uniform_buffers()
+            self.create_uniform_buffers()
+            self.write_descriptor_set()
+
+        # The profiler needs one range of queries per swapchain image
+        if self.profiler is not None and len(self.swapchain.images) != self.profiler.image_count:
+            self.profiler.create()
+
         self.init_command_buffers()
         self.QueueWaitIdle(self.queue)
         self.DeviceWaitIdle(self.device)
 
-        self.update_uniform_buffers()
+        self.update_projection()
+
+    def set_frame_pacing(self, policy, target_fps=None):
+        """
+            Switch the frame pacing policy while rendering. If the present mode or the
+            image count of the policy differ, the swapchain is recreated (the current
+            swapchain is passed as `old_swapchain`) like after a resize.
+        """
+        recreate = self.pacer.set_policy(policy, target_fps)
+        if recreate and self.initialized and not self.headless:
+            self.resize_display(*self.window.dimensions())
 
     def run(self):
         """
-            Add the render phase to the asyncio loop
+            Add the render phase to the asyncio loop, or start the render thread
         """
-        asyncio.ensure_future(self.render())
         self.initialized = True
+        if self.use_render_thread:
+            self.running = True
+            self.render_thread = threading.Thread(target=self.render_thread_main, name='render', daemon=True)
+            self.render_thread.start()
+        else:
+            asyncio.ensure_future(self.render())
 
     def draw(self):
-        current_buffer = c_uint(0)
+        t_start = time.perf_counter()
+        frame = self.frames[self.frame_index]
+        image_index = frame['image_index']
+
+        # Wait until the GPU is done with the last frame that used this slot
+        assert(self.WaitForFences(self.device, 1, frame['fence_ptr'], vk.TRUE, WAIT_FOREVER) == vk.SUCCESS)
 
         #  Get next image in the swap chain (back/front buffer)
-        result = self.AcquireNextImageKHR(
-            self.device, self.swapchain.swapchain, c_ulonglong(-1),
-            self.render_semaphores['present'], vk.Fence(0), byref(current_buffer)
-        )
-        if result != vk.SUCCESS:
-            raise Exception("Could not aquire next image from swapchain")
+        if self.headless:
+            image_index.value = self.swapchain.acquire()
+        else:
+            result = self.AcquireNextImageKHR(
+                self.device, self.swapchain.swapchain, WAIT_FOREVER,
+                frame['present'], NULL_FENCE, byref(image_index)
+            )
+            if result != vk.SUCCESS:
+                raise Exception("Could not aquire next image from swapchain")
 
-        cb = current_buffer.value
+        cb = image_index.value
 
-        prebuf = vk.CommandBuffer(self.post_present_buffers[cb])
-        submit_info = vk.SubmitInfo(
-            s_type=vk.STRUCTURE_TYPE_SUBMIT_INFO,
-            command_buffer_count=1,
-            command_buffers=pointer(prebuf)
-        )
-        assert(self.QueueSubmit(self.queue, 1, byref(submit_info), vk.Fence(0)) == vk.SUCCESS)
-        assert(self.QueueWaitIdle(self.queue) == vk.SUCCESS)
-        
-        # The submit information structure contains a list of
-		# command buffers and semaphores to be submitted to a queue
-		# If you want to submit multiple command buffers, pass an array
-        stages = c_uint(vk.PIPELINE_STAGE_BOTTOM_OF_PIPE_BIT)
-        drawbuf = vk.CommandBuffer(self.draw_buffers[cb])
-        submit_info = vk.SubmitInfo(
-            s_type=vk.STRUCTURE_TYPE_SUBMIT_INFO,
-            wait_dst_stage_mask=pointer(stages),
-
-            # The wait semaphore ensures that the image is presented 
-		    # before we start submitting command buffers again
-            wait_semaphore_count=1,
-            wait_semaphores=pointer(self.render_semaphores['present']),
-
-            # The signal semaphore is used during queue presentation
-            # to ensure that the image is not rendered before all
-            # commands have been submitted
-            signal_semaphore_count=1,
-            signal_semaphores=pointer(self.render_semaphores['render']),
-
-            # Submit the currently active command buffer
-            command_buffer_count=1, 
-            command_buffers=pointer(drawbuf)
-        )
+        # The acquired image may still be used by another frame slot
+        image_fence = self.image_fences[cb]
+        if image_fence is not None and image_fence is not frame['fence']:
+            assert(self.WaitForFences(self.device, 1, byref(image_fence), vk.TRUE, WAIT_FOREVER) == vk.SUCCESS)
+
+        t_acquired = time.perf_counter()
+
+        # The readback checks the frame fences, collect the copies before the fence is reset
+        if self.readback is not None:
+            self.readback.collect()
+
+        # The last frame rendered in the image is done, its timestamps are available
+        if self.profiler is not None:
+            self.profiler.collect(cb)
 
-        #Submit to the graphics queue
-        assert(self.QueueSubmit(self.queue, 1, byref(submit_info), vk.Fence(0)) == vk.SUCCESS)
+        self.image_fences[cb] = frame['fence']
+        assert(self.ResetFences(self.device, 1, frame['fence_ptr']) == vk.SUCCESS)
+
+        # The GPU is done with the uniform slot of the image
+        self.apply_input()
+        self.write_uniform_buffer(cb)
+
+        # The GPU is also done with the command buffer of the frame slot, record it again
+        if self.rerecord:
+            assert(self.ResetCommandPool(self.device, frame['cmd_pool'], 0) == vk.SUCCESS)
+            self.record_draw_buffer(frame['cmdbuf'], cb, flags=vk.COMMAND_BUFFER_USAGE_ONE_TIME_SUBMIT_BIT)
+            frame['drawbuf'].value = frame['cmdbuf'].value
+        else:
+            frame['drawbuf'].value = self.draw_buffers[cb]
+
+        if not self.merge_post_present:
+            frame['prebuf'].value = self.post_present_buffers[cb]
+            assert(self.QueueSubmit(self.queue, 1, byref(frame['pre_submit']), NULL_FENCE) == vk.SUCCESS)
+            self.counters['submits'] += 1
+
+            if self.frames_in_flight == 0:
+                assert(self.QueueWaitIdle(self.queue) == vk.SUCCESS)
+                self.counters['queue_waits'] += 1
+
+        if self.readback is not None:
+            self.readback.submit(cb, frame['fence'])
+
+        # Submit to the graphics queue. The fence is signaled once the frame is rendered
+        assert(self.QueueSubmit(self.queue, 1, byref(frame['submit']), frame['fence']) == vk.SUCCESS)
+        self.counters['submits'] += 1
+
+        if self.profiler is not None:
+            self.profiler.submitted(cb)
+
+        t_submitted = time.perf_counter()
 
         # Present the current buffer to the swap chain
 		# We pass the signal semaphore from the submit info
 		# to ensure that the image is not rendered until
 		# all commands have been submitted
-        present_info = vk.PresentInfoKHR(
-            s_type=vk.STRUCTURE_TYPE_PRESENT_INFO_KHR, next=None,
-            swapchain_count=1, swapchains=pointer(self.swapchain.swapchain),
-            image_indices = pointer(current_buffer),
-            wait_semaphores = pointer(self.render_semaphores['render']),
-            wait_semaphore_count=1
-        )
-        
-        result = self.QueuePresentKHR(self.queue, byref(present_info));
-        if result != vk.SUCCESS:
-            raise "Could not render the scene"
+        if not self.headless:
+            result = self.QueuePresentKHR(self.queue, byref(frame['present_info']));
+            if result != vk.SUCCESS:
+                raise "Could not render the scene"
+
+        self.frame_index = (self.frame_index + 1) % len(self.frames)
+        self.counters['frames'] += 1
+
+        # Acquire: frame slot and image waits + acquire. Submit: CPU work of the frame + queue submits
+        t_end = time.perf_counter()
+        self.frame_timer.record(t_acquired - t_start, t_submitted - t_acquired, t_end - t_submitted, t_end - t_start)
+        self.pacer.record_frame(t_end, t_end - t_start)
+
+        # The frame uses the last input, measure the time since the input event
+        if self.input_time is not None:
+            latency = (t_submitted - self.input_time) * 1e3
+            self.input_latency.append(latency)
+            self.pacer.record_latency(latency)
+            self.input_time = None
+
+    def render_frame(self):
+        """
+            Draw a single frame. In serialized mode, the device is idled
+            before and after the frame.
+        """
+        if self.frames_in_flight == 0:
+            self.DeviceWaitIdle(self.device)
+            self.draw()
+            self.DeviceWaitIdle(self.device)
+            self.counters['queue_waits'] += 2
+        else:
+            self.draw()
+
+    def counters_per_frame(self):
+        """
+            Return the average number of queue submits and queue waits per frame
+        """
+        frames = self.counters['frames'] or 1
+        return {
+            'submits': self.counters['submits'] / frames,
+            'queue_waits': self.counters['queue_waits'] / frames
+        }
+
+    def pause_gc(self):
+        """
+            With FREEZE_GC, move every object created so far to the permanent generation
+            and disable the garbage collector for the render loop
+        """
+        if FREEZE_GC:
+            gc.collect()
+            gc.freeze()
+            gc.disable()
+
+    def resume_gc(self):
+        if FREEZE_GC:
+            gc.enable()
+            gc.unfreeze()
 
+    def render_headless(self, duration=None):
+        """
+            Render the scene in a plain loop for `duration` seconds (forever if None).
+            The frame rate is printed every second.
+        """
+        print("Running headless!")
+        frame_counter = 0
+        t_start = t_fps = time.perf_counter()
+        self.running = True
+        self.pause_gc()
+
+        try:
+            while self.running:
+                self.render_frame()
+                self.pacer.wait()
+
+                frame_counter += 1
+                t_now = time.perf_counter()
+                if t_now - t_fps > 1:
+                    print('Triangle - {} fps - {}'.format(frame_counter, self.frame_timer.summary()))
+                    if self.profiler is not None:
+                        print(self.profiler.summary())
+                    frame_counter = 0
+                    t_fps = t_now
+
+                if duration is not None and t_now - t_start > duration:
+                    self.running = False
+        except KeyboardInterrupt:
+            self.running = False
+
+        self.resume_gc()
+
+        # Wait for the frames in flight before releasing the resources
+        self.DeviceWaitIdle(self.device)
 
     async def render(self):
         """
             Render the scene
         """
         print("Running!")
-        import time
         loop = asyncio.get_event_loop()
         frame_counter = 0
         fps_timer = 0.0
         self.running = True
+        self.pause_gc()
 
         while self.running:
             t_start = loop.time()
 
             # draw
-            self.DeviceWaitIdle(self.device)
-            self.draw()
-            self.DeviceWaitIdle(self.device)
+            self.render_frame()
+
+            # The present may have read window events in the queue of the connection
+            self.window.process_queued_events()
             #time.sleep(1/30)
             
             frame_counter += 1
@@ -1612,44 +2515,120 @@ class TriangleApplication(Application):
             delta = t_end-t_start
             fps_timer += delta
             if fps_timer > 1:
-                self.window.set_title('Triangle - {} fps'.format(frame_counter))
+                total = self.frame_timer.report()['total']
+                self.window.set_title('Triangle - {} fps - p50 {:.2f} ms - p99 {:.2f} ms'.format(frame_counter, total['p50'], total['p99']))
+                if self.profiler is not None:
+                    print(self.profiler.summary())
                 frame_counter = 0
                 fps_timer = 0.0
 
 
-            await asyncio.sleep(0)
-        
+            # Yield to the window events, until the next frame deadline of the pacing policy
+            await asyncio.sleep(self.pacer.next_delay())
 
+        self.resume_gc()
+        
+        # Wait for the frames in flight before releasing the resources
+        self.DeviceWaitIdle(self.device)
         self.rendering_done.set()
 
-    def __init__(self):
-        Application.__init__(self)
+    def render_thread_main(self):
+        """
+            Render loop of the render thread. The thread owns the queue and the swapchain:
+            the input snapshots and the resize requests of the event loop are applied
+            between two frames.
+        """
+        loop = self.loop
+        frame_counter = 0
+        t_fps = time.perf_counter()
+        self.pause_gc()
+
+        while self.running:
+            resize = self.resize_request
+            if resize is not None:
+                self.resize_request = None
+                self.resize_display(*resize)
+
+            self.render_frame()
+            self.window.schedule_queued_events()
+            self.pacer.wait()
+
+            frame_counter += 1
+            t_now = time.perf_counter()
+            if t_now - t_fps > 1:
+                total = self.frame_timer.report()['total']
+                title = 'Triangle - {} fps - p50 {:.2f} ms - p99 {:.2f} ms'.format(frame_counter, total['p50'], total['p99'])
+                loop.call_soon_threadsafe(self.window.set_title, title)
+                if self.profiler is not None:
+                    print(self.profiler.summary())
+                frame_counter = 0
+                t_fps = t_now
+
+        self.resume_gc()
+
+        # Wait for the frames in flight before releasing the resources
+        self.DeviceWaitIdle(self.device)
+        loop.call_soon_threadsafe(self.rendering_done.set)
+
+    def __init__(self, frames_in_flight=FRAMES_IN_FLIGHT, merge_post_present=MERGE_POST_PRESENT, headless=HEADLESS, readback=ENABLE_READBACK,
+                 record_threads=RECORD_THREADS, draw_count=1, rerecord=RERECORD_COMMAND_BUFFERS, profile=ENABLE_GPU_PROFILER,
+                 render_thread=RENDER_THREAD, pacing=FRAME_PACING):
+        Application.__init__(self, merge_post_present, headless, readback, pacing)
+
+        # Scheduling of the frames (see `run`)
+        self.use_render_thread = render_thread
+        self.render_thread = None
+        self.loop = asyncio.get_event_loop()
+        self.resize_request = None     # Size requested by the event loop, applied by the render thread
+        self.input_state = None        # Last input snapshot published by `input_changed`
+        self.applied_input = None      # Input snapshot used by the matrices
+        self.input_time = None         # Time of the first input event not rendered yet
+        self.input_latency = deque(maxlen=INPUT_LATENCY_HISTORY)
+        self.input_counters = {'events': 0, 'updates': 0, 'skipped': 0}  # Input snapshots published VS applied by `draw`
+
+        self.frames_in_flight = frames_in_flight
+        self.rerecord = rerecord       # Record the draw buffers every frame (see create_frame_command_buffer)
+        self.draw_count = draw_count   # Number of triangle draws per frame
+        self.recorder = SecondaryRecorder(self, record_threads) if record_threads > 0 else None
+        self.frame_timer = FrameTimer()  # CPU time of the last frames (see frametimes.py)
+        self.profiler = None
+        if profile:
+            self.create_profiler()
+        self.counters = {'frames': 0, 'submits': 0, 'queue_waits': 0}  # Render loop statistics
 
         self.pipeline_layout = None
         self.pipeline = None
+        self.pipelines_shaders = {}   # Pipeline handle -> shader modules used by the pipeline
+        self.pipeline_executor = None # Thread pool of `compile_pipelines`
+        self.pipelines = PipelineRegistry(self)
         self.descriptor_set = None
         self.descriptor_set_layout = None
         self.descriptor_pool = None
-        self.render_semaphores = {'present': None, 'render': None}
+        self.frames = []          # Per frame in flight: present/render semaphores and a fence
+        self.frame_index = 0
+        self.image_fences = []    # Fence of the frame that last rendered into each swapchain image
         self.matrices = (Mat4*3)(Mat4(), Mat4(), Mat4()) # 0: Projection, 1: Model, 2: View
+        self.matrices_arrays = [m.as_array() for m in self.matrices] if USE_NUMPY_MATH else None
 
         self.uniform_data = {
             'buffer': vk.Buffer(0),
-            'memory': vk.DeviceMemory(0),
-            'descriptor': vk.DescriptorBufferInfo()
+            'memory': None,     # Allocation of the memory allocator
+            'descriptor': vk.DescriptorBufferInfo(),
+            'mapped': None,     # Address of the persistently mapped memory
+            'slot_size': 0,     # Size of a ring slot, aligned on minUniformBufferOffsetAlignment
+            'slot_count': 0
         }
 
         self.triangle = {
             'buffer': vk.Buffer(0),
-            'memory': vk.DeviceMemory(0),
+            'memory': None,
             'indices_buffer': vk.Buffer(0),
-            'indices_memory': vk.DeviceMemory(0),
+            'indices_memory': None,
             'bindings': None,
-            'attributes': None,
-            'input_state': None
+            'attributes': None
         }
 
-        self.create_semaphores()
+        self.create_sync_objects()
         self.create_triangle()
         self.create_uniform_buffers()
         self.create_descriptor_set_layout()
@@ -1660,34 +2639,82 @@ class TriangleApplication(Application):
 
     def __del__(self):
         if self.device is not None:
+            # Uploads may still be in flight
+            self.DeviceWaitIdle(self.device)
+
             self.DestroyDescriptorPool(self.device, self.descriptor_pool, None)
 
-            self.DestroyPipeline(self.device, self.pipeline, None)
+            if self.pipeline_executor is not None:
+                self.pipeline_executor.shutdown()
+
+            if self.recorder is not None:
+                self.recorder.destroy()
+
+            if self.profiler is not None:
+                self.profiler.destroy()
+
+            self.pipelines.release(self.pipeline)
+            self.pipelines.destroy()
 
             self.DestroyPipelineLayout(self.device, self.pipeline_layout, None)
 
             self.DestroyDescriptorSetLayout(self.device, self.descriptor_set_layout, None)
 
             self.DestroyBuffer(self.device, self.triangle['buffer'], None)
-            self.FreeMemory(self.device, self.triangle['memory'], None)
+            self.allocator.free(self.triangle['memory'])
 
             self.DestroyBuffer(self.device, self.triangle['indices_buffer'], None)
-            self.FreeMemory(self.device, self.triangle['indices_memory'], None)
+            self.allocator.free(self.triangle['indices_memory'])
 
-            self.DestroyBuffer(self.device, self.uniform_data['buffer'], None)
-            self.FreeMemory(self.device, self.uniform_data['memory'], None)
+            self.destroy_uniform_buffers()
 
-            self.DestroySemaphore(self.device, self.render_semaphores['present'], None)
-            self.DestroySemaphore(self.device, self.render_semaphores['render'], None)
+            for frame in self.frames:
+                self.DestroySemaphore(self.device, frame['present'], None)
+                self.DestroySemaphore(self.device, frame['render'], None)
+                self.DestroyFence(self.device, frame['fence'], None)
+                if frame['cmd_pool'] is not None:
+                    self.DestroyCommandPool(self.device, frame['cmd_pool'], None)
 
         Application.__del__(self)
 
 def main():
-    app = TriangleApplication()
-    app.run()
+    headless = HEADLESS or '--headless' in sys.argv
+
+    # `--pacing <policy>` selects the frame pacing policy (see pacing.py)
+    pacing = FRAME_PACING
+    pacing_selected = 'TRIANGLE_PACING' in os.environ
+    if '--pacing' in sys.argv:
+        index = sys.argv.index('--pacing') + 1
+        pacing = sys.argv[index] if index < len(sys.argv) else None
+        pacing_selected = True
+
+    if pacing not in PACING_POLICIES:
+        sys.exit('usage: triangle.py [--headless] [--pacing {{{}}}] [--frame-times <file.csv|file.json>]'.format(
+            ','.join(PACING_POLICIES)
+        ))
+
+    app = TriangleApplication(headless=headless, pacing=pacing)
+
+    # `--frame-times <file.csv|file.json>` exports the frame times on exit
+    frame_times_path = None
+    if '--frame-times' in sys.argv:
+        frame_times_path = sys.argv[sys.argv.index('--frame-times') + 1]
+
+    if headless:
+        app.initialized = True
+        app.render_headless()
+    else:
+        app.run()
+
+        loop = asyncio.get_event_loop()
+        loop.run_forever()
+
+    if frame_times_path is not None:
+        app.frame_timer.export(frame_times_path)
 
-    loop = asyncio.get_event_loop()
-    loop.run_forever()
+    # The frame pacing stats are only printed if a policy was chosen or switched
+    if pacing_selected or len(app.pacer.stats) > 1:
+        print(app.pacer.summary())
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Staging uploader. The data is written in a persistently mapped staging
+    ring and the copies are recorded in batches: every upload queued before
+    a flush is copied by a single command buffer with one BufferCopy region
+    per upload. The uploads return futures backed by the batch fence, the
+    queue is never idled.
+
+    Usage:
+        future = app.uploader.upload(buffer, data)
+        app.uploader.flush()
+        ...
+        future.wait()   # or `await future`, or `future.done()`
+"""
+import vk, weakref, asyncio
+from collections import deque
+from ctypes import byref, pointer, memmove, c_ubyte, c_ulonglong
+
+from allocator import align_up
+
+# Size of the staging ring
+DEFAULT_STAGING_SIZE = 4 * 1024 * 1024
+
+# Alignment of the uploads in the staging ring (optimalBufferCopyOffsetAlignment of most drivers)
+STAGING_ALIGNMENT = 16
+
+# Interval between two checks of the batch fence when an upload is awaited, in seconds
+UPLOAD_POLL_INTERVAL = 0.001
+
+class UploadFuture(object):
+    """
+        Completion of an upload. Done once the fence of its batch is signaled.
+    """
+
+    __slots__ = ('uploader', 'serial')
+
+    def __init__(self, uploader, serial):
+        self.uploader = weakref.ref(uploader)
+        self.serial = serial
+
+    def done(self):
+        """
+            Return True if the copy is done. Never waits.
+        """
+        uploader = self.uploader()
+        return uploader is None or uploader.is_done(self.serial)
+
+    def wait(self):
+        """
+            Block until the copy is done. The batch is submitted if it was not flushed.
+        """
+        uploader = self.uploader()
+        if uploader is not None:
+            uploader.wait(self.serial)
+
+    async def wait_async(self):
+        """
+            Wait until the copy is done without blocking the event loop. The batch is
+            submitted if it was not flushed.
+        """
+        uploader = self.uploader()
+        if uploader is not None and uploader.serial == self.serial:
+            uploader.flush()
+
+        while not self.done():
+            await asyncio.sleep(UPLOAD_POLL_INTERVAL)
+
+    def __await__(self):
+        return self.wait_async().__await__()
+
+class UploadBatch(object):
+    """
+        A command buffer and its fence, reused once the fence is signaled
+    """
+
+    def __init__(self, uploader):
+        app = uploader.app()
+
+        alloc_info = vk.CommandBufferAllocateInfo(
+            s_type=vk.STRUCTURE_TYPE_COMMAND_BUFFER_ALLOCATE_INFO, next=None,
+            command_pool=uploader.cmd_pool,
+            level=vk.COMMAND_BUFFER_LEVEL_PRIMARY,
+            command_buffer_count=1
+        )
+
+        self.cmdbuf = vk.CommandBuffer(0)
+        if app.AllocateCommandBuffers(app.device, byref(alloc_info), byref(self.cmdbuf)) != vk.SUCCESS:
+            raise RuntimeError('Failed to allocate an upload command buffer')
+
+        fence_info = vk.FenceCreateInfo(s_type=vk.STRUCTURE_TYPE_FENCE_CREATE_INFO, next=None, flags=0)
+        self.fence = vk.Fence(0)
+        if app.CreateFence(app.device, byref(fence_info), None, byref(self.fence)) != vk.SUCCESS:
+            raise RuntimeError('Failed to create an upload fence')
+
+        self.serial = 0
+        self.ring_size = 0  # Bytes of the staging ring used by the batch
+
+class Uploader(object):
+    """
+        Copy host data into device buffers through a persistent staging ring
+    """
+
+    def __init__(self, app, size=DEFAULT_STAGING_SIZE):
+        self.app = weakref.ref(app)
+        self.size = size
+
+        # Staging ring
+        buffer_info = vk.BufferCreateInfo(
+            s_type=vk.STRUCTURE_TYPE_BUFFER_CREATE_INFO, next=None,
+            flags=0, size=size, usage=vk.BUFFER_USAGE_TRANSFER_SRC_BIT,
+            sharing_mode=0, queue_family_index_count=0, queue_family_indices=None
+        )
+
+        self.buffer = vk.Buffer(0)
+        if app.CreateBuffer(app.device, byref(buffer_info), None, byref(self.buffer)) != vk.SUCCESS:
+            raise RuntimeError('Could not create the staging buffer')
+
+        # Coherent memory, this way the writes do not need to be flushed
+        self.memory = app.allocator.allocate_buffer(self.buffer, vk.MEMORY_PROPERTY_HOST_VISIBLE_BIT | vk.MEMORY_PROPERTY_HOST_COHERENT_BIT)
+        self.mapped = self.memory.mapped
+
+        # The command buffers are short lived and reset individually
+        pool_info = vk.CommandPoolCreateInfo(
+            s_type=vk.STRUCTURE_TYPE_COMMAND_POOL_CREATE_INFO, next=None,
+            flags=vk.COMMAND_POOL_CREATE_TRANSIENT_BIT | vk.COMMAND_POOL_CREATE_RESET_COMMAND_BUFFER_BIT,
+            queue_family_index=app.main_queue_family
+        )
+
+        self.cmd_pool = vk.CommandPool(0)
+        if app.CreateCommandPool(app.device, byref(pool_info), None, byref(self.cmd_pool)) != vk.SUCCESS:
+            raise RuntimeError('Could not create the upload command pool')
+
+        self.head = 0             # Next free offset of the ring
+        self.used = 0             # Bytes of the ring used by the pending and the submitted batches
+        self.pending = {}         # Destination buffer -> [BufferCopy] of the batch being built
+        self.pending_size = 0     # Bytes of the ring used by the batch being built
+        self.in_flight = deque()  # Submitted batches, oldest first
+        self.free_batches = []
+        self.serial = 1           # Serial of the batch being built
+        self.completed = 0        # Serial of the last completed batch
+        self.counters = {'uploads': 0, 'bytes': 0, 'batches': 0, 'stalls': 0}
+
+    def upload(self, buffer, data, offset=0):
+        """
+            Queue the copy of `data` (any object supporting the buffer protocol: bytes, ctypes
+            arrays and structures, numpy arrays) at `offset` in `buffer`. The data is copied
+            in the staging ring right away, so it can be reused when the function returns.
+            Data bigger than half the ring is split in several copies.
+        """
+        data = memoryview(data).cast('B')
+        size = len(data)
+        chunk_size = self.size // 2
+
+        for start in range(0, size, chunk_size):
+            chunk = data[start:start+chunk_size]
+            ring_offset = self.reserve(len(chunk))
+
+            # memmove only takes ctypes objects and bytes: the writable buffers are wrapped
+            # without a copy, the read only ones (bytes) are copied first
+            source = chunk.tobytes() if chunk.readonly else (c_ubyte*len(chunk)).from_buffer(chunk)
+            memmove(self.mapped + ring_offset, source, len(chunk))
+
+            regions = self.pending.setdefault(buffer.value, [])
+            regions.append(vk.BufferCopy(src_offset=ring_offset, dst_offset=offset+start, size=len(chunk)))
+
+        self.counters['uploads'] += 1
+        self.counters['bytes'] += size
+        return UploadFuture(self, self.serial)
+
+    def reserve(self, size):
+        """
+            Return the offset of `size` free bytes in the staging ring. Wait for the oldest
+            batches if the ring is full.
+        """
+        offset = align_up(self.head, STAGING_ALIGNMENT)
+        if offset + size > self.size:
+            # Wrap around, the end of the ring is skipped
+            needed = self.size - self.head + size
+            offset = 0
+        else:
+            needed = offset - self.head + size
+
+        while self.used + needed > self.size:
+            if not self.in_flight:
+                self.flush()
+                if not self.in_flight:
+                    raise RuntimeError('The staging ring is too small')
+
+            self.counters['stalls'] += 1
+            self.retire(wait=True)
+
+            if self.used == 0:
+                # The ring is empty, start again from the beginning
+                self.head = offset = 0
+                needed = size
+
+        self.head = offset + size
+        self.used += needed
+        self.pending_size += needed
+        return offset
+
+    def flush(self):
+        """
+            Submit the queued uploads in a single command buffer. Return the future of the batch.
+        """
+        app = self.app()
+        if not self.pending:
+            # Nothing to submit, the future completes with the last submitted batch
+            return UploadFuture(self, self.serial - 1)
+
+        future = UploadFuture(self, self.serial)
+
+        batch = self.free_batches.pop() if self.free_batches else UploadBatch(self)
+        batch.serial = self.serial
+        batch.ring_size = self.pending_size
+
+        begin_info = vk.CommandBufferBeginInfo(
+            s_type=vk.STRUCTURE_TYPE_COMMAND_BUFFER_BEGIN_INFO, next=None,
+            flags=vk.COMMAND_BUFFER_USAGE_ONE_TIME_SUBMIT_BIT, inheritance_info=None
+        )
+
+        cmdbuf = batch.cmdbuf
+        if app.BeginCommandBuffer(cmdbuf, byref(begin_info)) != vk.SUCCESS:
+            raise RuntimeError('Failed to start recording the upload command buffer')
+
+        for dst, regions in self.pending.items():
+            regions = (vk.BufferCopy*len(regions))(*regions)
+            app.CmdCopyBuffer(cmdbuf, self.buffer, vk.Buffer(dst), len(regions), regions)
+
+        # Make the copies visible to the commands submitted after the batch
+        barrier = vk.MemoryBarrier(
+            s_type=vk.STRUCTURE_TYPE_MEMORY_BARRIER, next=None,
+            src_access_mask=vk.ACCESS_TRANSFER_WRITE_BIT,
+            dst_access_mask=vk.ACCESS_MEMORY_READ_BIT
+        )
+
+        app.CmdPipelineBarrier(
+            cmdbuf,
+            vk.PIPELINE_STAGE_TRANSFER_BIT,
+            vk.PIPELINE_STAGE_ALL_COMMANDS_BIT,
+            0,
+            1, byref(barrier),
+            0, None,
+            0, None)
+
+        if app.EndCommandBuffer(cmdbuf) != vk.SUCCESS:
+            raise RuntimeError('Failed to end the upload command buffer')
+
+        submit_info = vk.SubmitInfo(
+            s_type=vk.STRUCTURE_TYPE_SUBMIT_INFO, next=None,
+            wait_semaphore_count=0, wait_semaphores=None,
+            wait_dst_stage_mask=None, command_buffer_count=1,
+            command_buffers=pointer(cmdbuf),
+            signal_semaphore_count=0, signal_semaphores=None,
+        )
+
+        if app.QueueSubmit(app.queue, 1, byref(submit_info), batch.fence) != vk.SUCCESS:
+            raise RuntimeError('Upload submit failed')
+
+        self.in_flight.append(batch)
+        self.pending = {}
+        self.pending_size = 0
+        self.serial += 1
+        self.counters['batches'] += 1
+        return future
+
+    def retire(self, wait=False):
+        """
+            Release the batches that are done. If `wait` is True, wait for the oldest batch.
+        """
+        app = self.app()
+        while self.in_flight:
+            batch = self.in_flight[0]
+            if wait:
+                app.WaitForFences(app.device, 1, byref(batch.fence), vk.TRUE, c_ulonglong(-1))
+                wait = False
+            elif app.GetFenceStatus(app.device, batch.fence) != vk.SUCCESS:
+                break
+
+            self.in_flight.popleft()
+            app.ResetFences(app.device, 1, byref(batch.fence))
+            app.ResetCommandBuffer(batch.cmdbuf, 0)
+            self.used -= batch.ring_size
+            self.completed = batch.serial
+            self.free_batches.append(batch)
+
+    def is_done(self, serial):
+        if serial > self.completed:
+            self.retire()
+        return serial <= self.completed
+
+    def wait(self, serial):
+        if serial == self.serial:
+            self.flush()
+            serial = min(serial, self.serial - 1)
+
+        while serial > self.completed:
+            self.retire(wait=True)
+
+    def destroy(self):
+        app = self.app()
+        self.wait(self.serial - 1)
+
+        for batch in self.free_batches:
+            app.DestroyFence(app.device, batch.fence, None)
+
+        app.DestroyCommandPool(app.device, self.cmd_pool, None)
+        app.DestroyBuffer(app.device, self.buffer, None)
+        app.allocator.free(self.memory)
+
+        self.free_batches = []
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 from ctypes import (c_void_p, c_float, c_uint8, c_uint, c_uint64, c_int, c_size_t, c_char, c_char_p, cast, Structure, Union, POINTER)
 from platform import system
+from functools import lru_cache
+from threading import RLock
 
 
 # Sysem initialization
@@ -32,6 +34,15 @@ ANativeWindow = c_void_p
 def MAKE_VERSION(major, minor, patch):
     return (major<<22) | (minor<<12) | patch
 
+# Lazy definitions. The structures, the unions and the functions lists are created the
+# first time they are accessed, see `__getattr__` at the end of the module.
+_lazy_definitions = {}
+_lazy_lock = RLock()     # The definitions are created by one thread at a time
+_lazy_resolving = set()  # Definitions being created, with their dependencies
+
+def define_lazy(name, definition):
+    _lazy_definitions[name] = definition
+
 def define_structure(name, *args):
     return type(name, (Structure,), {'_fields_': args})
 
@@ -51,6 +62,41 @@ def load_functions(vk_object, functions_list, loader):
             print('Function {} could not be loaded. (__debug__ == True)'.format(py_name))
     return functions
 
+@lru_cache(maxsize=None)
+def function_prototype(return_type, *args):
+    return FUNCTYPE(return_type, *args)
+
+class FunctionTable(object):
+    """
+        Dispatch table over a list of vulkan functions. A function pointer is
+        resolved with `loader` the first time the function is accessed and then
+        saved in the table. Functions that cannot be loaded raise an AttributeError.
+    """
+
+    def __init__(self, vk_object, functions_list, loader):
+        self._vk_object = vk_object
+        self._loader = loader
+        self._signatures = {}
+        for name, return_type, *args in functions_list:
+            self._signatures[name.decode()[2::]] = (name, return_type, tuple(args))
+
+    def __getattr__(self, py_name):
+        signature = self.__dict__.get('_signatures', {}).get(py_name)
+        if signature is None:
+            raise AttributeError(py_name)
+
+        name, return_type, args = signature
+        fn_ptr = cast(self._loader(self._vk_object, name), c_void_p)
+        if not fn_ptr:
+            raise AttributeError('Function {} could not be loaded'.format(py_name))
+
+        fn = function_prototype(return_type, *args)(fn_ptr.value)
+        setattr(self, py_name, fn)
+        return fn
+
+    def __contains__(self, py_name):
+        return py_name in self._signatures
+
 API_VERSION_1_0 = MAKE_VERSION(1,0,0)
 
 
@@ -975,61 +1021,61 @@ fn_DebugReportCallbackEXT = FUNCTYPE( Bool32, DebugReportFlagsEXT, DebugReportOb
 
 # STRUCTURES
 
-Offset2D = define_structure('Offset2D',
+define_lazy('Offset2D', lambda: define_structure('Offset2D',
     ('x', c_int),
     ('y', c_int),
-)
+))
 
-Offset3D = define_structure('Offset3D',
+define_lazy('Offset3D', lambda: define_structure('Offset3D',
     ('x', c_int),
     ('y', c_int),
     ('z', c_int),
-)
+))
 
-Extent2D = define_structure('Extent2D',
+define_lazy('Extent2D', lambda: define_structure('Extent2D',
     ('width', c_uint),
     ('height', c_uint),
-)
+))
 
-Extent3D = define_structure('Extent3D',
+define_lazy('Extent3D', lambda: define_structure('Extent3D',
     ('width', c_uint),
     ('height', c_uint),
     ('depth', c_uint),
-)
+))
 
-Viewport = define_structure('Viewport',
+define_lazy('Viewport', lambda: define_structure('Viewport',
     ('x', c_float),
     ('y', c_float),
     ('width', c_float),
     ('height', c_float),
     ('min_depth', c_float),
     ('max_depth', c_float),
-)
+))
 
-Rect2D = define_structure('Rect2D',
+define_lazy('Rect2D', lambda: define_structure('Rect2D',
     ('offset', Offset2D),
     ('extent', Extent2D),
-)
+))
 
-Rect3D = define_structure('Rect3D',
+define_lazy('Rect3D', lambda: define_structure('Rect3D',
     ('offset', Offset3D),
     ('extent', Extent3D),
-)
+))
 
-ClearRect = define_structure('ClearRect',
+define_lazy('ClearRect', lambda: define_structure('ClearRect',
     ('rect', Rect2D),
     ('base_array_layer', c_uint),
     ('layer_count', c_uint),
-)
+))
 
-ComponentMapping = define_structure('ComponentMapping',
+define_lazy('ComponentMapping', lambda: define_structure('ComponentMapping',
     ('r', ComponentSwizzle),
     ('g', ComponentSwizzle),
     ('b', ComponentSwizzle),
     ('a', ComponentSwizzle),
-)
+))
 
-PhysicalDeviceLimits = define_structure('PhysicalDeviceLimits',
+define_lazy('PhysicalDeviceLimits', lambda: define_structure('PhysicalDeviceLimits',
     ('max_image_dimension1_D', c_uint),
     ('max_image_dimension2_D', c_uint),
     ('max_image_dimension3_D', c_uint),
@@ -1136,17 +1182,17 @@ PhysicalDeviceLimits = define_structure('PhysicalDeviceLimits',
     ('optimal_buffer_copy_offset_alignment', DeviceSize),
     ('optimal_buffer_copy_row_pitch_alignment', DeviceSize),
     ('non_coherent_atom_size', DeviceSize),
-)
+))
 
-PhysicalDeviceSparseProperties = define_structure('PhysicalDeviceSparseProperties',
+define_lazy('PhysicalDeviceSparseProperties', lambda: define_structure('PhysicalDeviceSparseProperties',
     ('residency_standard2_DBlock_shape', Bool32),
     ('residency_standard2_DMultisample_block_shape', Bool32),
     ('residency_standard3_DBlock_shape', Bool32),
     ('residency_aligned_mip_size', Bool32),
     ('residency_non_resident_strict', Bool32),
-)
+))
 
-PhysicalDeviceProperties = define_structure('PhysicalDeviceProperties',
+define_lazy('PhysicalDeviceProperties', lambda: define_structure('PhysicalDeviceProperties',
     ('api_version', c_uint),
     ('driver_version', c_uint),
     ('vendor_ID', c_uint),
@@ -1156,21 +1202,21 @@ PhysicalDeviceProperties = define_structure('PhysicalDeviceProperties',
     ('pipeline_cache_UUID', (c_uint8*UUID_SIZE)),
     ('limits', PhysicalDeviceLimits),
     ('sparse_properties', PhysicalDeviceSparseProperties),
-)
+))
 
-ExtensionProperties = define_structure('ExtensionProperties',
+define_lazy('ExtensionProperties', lambda: define_structure('ExtensionProperties',
     ('extension_name', (c_char*MAX_EXTENSION_NAME_SIZE)),
     ('spec_version', c_uint),
-)
+))
 
-LayerProperties = define_structure('LayerProperties',
+define_lazy('LayerProperties', lambda: define_structure('LayerProperties',
     ('layer_name', (c_char*MAX_EXTENSION_NAME_SIZE)),
     ('spec_version', c_uint),
     ('implementation_version', c_uint),
     ('description', (c_char*MAX_DESCRIPTION_SIZE)),
-)
+))
 
-ApplicationInfo = define_structure('ApplicationInfo',
+define_lazy('ApplicationInfo', lambda: define_structure('ApplicationInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('application_name', c_char_p),
@@ -1178,27 +1224,27 @@ ApplicationInfo = define_structure('ApplicationInfo',
     ('engine_name', c_char_p),
     ('engine_version', c_uint),
     ('api_version', c_uint),
-)
+))
 
-AllocationCallbacks = define_structure('AllocationCallbacks',
+define_lazy('AllocationCallbacks', lambda: define_structure('AllocationCallbacks',
     ('user_data', c_void_p),
     ('allocation', fn_AllocationFunction),
     ('reallocation', fn_ReallocationFunction),
     ('free', fn_FreeFunction),
     ('internal_allocation', fn_InternalAllocationNotification),
     ('internal_free', fn_InternalFreeNotification),
-)
+))
 
-DeviceQueueCreateInfo = define_structure('DeviceQueueCreateInfo',
+define_lazy('DeviceQueueCreateInfo', lambda: define_structure('DeviceQueueCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', DeviceQueueCreateFlags),
     ('queue_family_index', c_uint),
     ('queue_count', c_uint),
     ('queue_priorities', POINTER(c_float)),
-)
+))
 
-PhysicalDeviceFeatures = define_structure('PhysicalDeviceFeatures',
+define_lazy('PhysicalDeviceFeatures', lambda: define_structure('PhysicalDeviceFeatures',
     ('robust_buffer_access', Bool32),
     ('full_draw_index_uint32', Bool32),
     ('image_cube_array', Bool32),
@@ -1254,9 +1300,9 @@ PhysicalDeviceFeatures = define_structure('PhysicalDeviceFeatures',
     ('sparse_residency_aliased', Bool32),
     ('variable_multisample_rate', Bool32),
     ('inherited_queries', Bool32),
-)
+))
 
-DeviceCreateInfo = define_structure('DeviceCreateInfo',
+define_lazy('DeviceCreateInfo', lambda: define_structure('DeviceCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', DeviceCreateFlags),
@@ -1267,9 +1313,9 @@ DeviceCreateInfo = define_structure('DeviceCreateInfo',
     ('enabled_extension_count', c_uint),
     ('enabled_extension_names', POINTER(c_char_p)),
     ('enabled_features', POINTER(PhysicalDeviceFeatures)),
-)
+))
 
-InstanceCreateInfo = define_structure('InstanceCreateInfo',
+define_lazy('InstanceCreateInfo', lambda: define_structure('InstanceCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', InstanceCreateFlags),
@@ -1278,94 +1324,94 @@ InstanceCreateInfo = define_structure('InstanceCreateInfo',
     ('enabled_layer_names', POINTER(c_char_p)),
     ('enabled_extension_count', c_uint),
     ('enabled_extension_names', POINTER(c_char_p)),
-)
+))
 
-QueueFamilyProperties = define_structure('QueueFamilyProperties',
+define_lazy('QueueFamilyProperties', lambda: define_structure('QueueFamilyProperties',
     ('queue_flags', QueueFlags),
     ('queue_count', c_uint),
     ('timestamp_valid_bits', c_uint),
     ('min_image_transfer_granularity', Extent3D),
-)
+))
 
-MemoryType = define_structure('MemoryType',
+define_lazy('MemoryType', lambda: define_structure('MemoryType',
     ('property_flags', MemoryPropertyFlags),
     ('heap_index', c_uint),
-)
+))
 
-MemoryHeap = define_structure('MemoryHeap',
+define_lazy('MemoryHeap', lambda: define_structure('MemoryHeap',
     ('size', DeviceSize),
     ('flags', MemoryHeapFlags),
-)
+))
 
-PhysicalDeviceMemoryProperties = define_structure('PhysicalDeviceMemoryProperties',
+define_lazy('PhysicalDeviceMemoryProperties', lambda: define_structure('PhysicalDeviceMemoryProperties',
     ('memory_type_count', c_uint),
     ('memory_types', (MemoryType*MAX_MEMORY_TYPES)),
     ('memory_heap_count', c_uint),
     ('memory_heaps', (MemoryHeap*MAX_MEMORY_HEAPS)),
-)
+))
 
-MemoryAllocateInfo = define_structure('MemoryAllocateInfo',
+define_lazy('MemoryAllocateInfo', lambda: define_structure('MemoryAllocateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('allocation_size', DeviceSize),
     ('memory_type_index', c_uint),
-)
+))
 
-MemoryRequirements = define_structure('MemoryRequirements',
+define_lazy('MemoryRequirements', lambda: define_structure('MemoryRequirements',
     ('size', DeviceSize),
     ('alignment', DeviceSize),
     ('memory_type_bits', c_uint),
-)
+))
 
-SparseImageFormatProperties = define_structure('SparseImageFormatProperties',
+define_lazy('SparseImageFormatProperties', lambda: define_structure('SparseImageFormatProperties',
     ('aspect_mask', ImageAspectFlags),
     ('image_granularity', Extent3D),
     ('flags', SparseImageFormatFlags),
-)
+))
 
-SparseImageMemoryRequirements = define_structure('SparseImageMemoryRequirements',
+define_lazy('SparseImageMemoryRequirements', lambda: define_structure('SparseImageMemoryRequirements',
     ('format_properties', SparseImageFormatProperties),
     ('image_mip_tail_first_lod', c_uint),
     ('image_mip_tail_size', DeviceSize),
     ('image_mip_tail_offset', DeviceSize),
     ('image_mip_tail_stride', DeviceSize),
-)
+))
 
-MappedMemoryRange = define_structure('MappedMemoryRange',
+define_lazy('MappedMemoryRange', lambda: define_structure('MappedMemoryRange',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('memory', DeviceMemory),
     ('offset', DeviceSize),
     ('size', DeviceSize),
-)
+))
 
-FormatProperties = define_structure('FormatProperties',
+define_lazy('FormatProperties', lambda: define_structure('FormatProperties',
     ('linear_tiling_features', FormatFeatureFlags),
     ('optimal_tiling_features', FormatFeatureFlags),
     ('buffer_features', FormatFeatureFlags),
-)
+))
 
-ImageFormatProperties = define_structure('ImageFormatProperties',
+define_lazy('ImageFormatProperties', lambda: define_structure('ImageFormatProperties',
     ('max_extent', Extent3D),
     ('max_mip_levels', c_uint),
     ('max_array_layers', c_uint),
     ('sample_counts', SampleCountFlags),
     ('max_resource_size', DeviceSize),
-)
+))
 
-DescriptorBufferInfo = define_structure('DescriptorBufferInfo',
+define_lazy('DescriptorBufferInfo', lambda: define_structure('DescriptorBufferInfo',
     ('buffer', Buffer),
     ('offset', DeviceSize),
     ('range', DeviceSize),
-)
+))
 
-DescriptorImageInfo = define_structure('DescriptorImageInfo',
+define_lazy('DescriptorImageInfo', lambda: define_structure('DescriptorImageInfo',
     ('sampler', Sampler),
     ('image_view', ImageView),
     ('image_layout', ImageLayout),
-)
+))
 
-WriteDescriptorSet = define_structure('WriteDescriptorSet',
+define_lazy('WriteDescriptorSet', lambda: define_structure('WriteDescriptorSet',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('dst_set', DescriptorSet),
@@ -1376,9 +1422,9 @@ WriteDescriptorSet = define_structure('WriteDescriptorSet',
     ('image_info', POINTER(DescriptorImageInfo)),
     ('buffer_info', POINTER(DescriptorBufferInfo)),
     ('texel_buffer_view', POINTER(BufferView)),
-)
+))
 
-CopyDescriptorSet = define_structure('CopyDescriptorSet',
+define_lazy('CopyDescriptorSet', lambda: define_structure('CopyDescriptorSet',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('src_set', DescriptorSet),
@@ -1388,9 +1434,9 @@ CopyDescriptorSet = define_structure('CopyDescriptorSet',
     ('dst_binding', c_uint),
     ('dst_array_element', c_uint),
     ('descriptor_count', c_uint),
-)
+))
 
-BufferCreateInfo = define_structure('BufferCreateInfo',
+define_lazy('BufferCreateInfo', lambda: define_structure('BufferCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', BufferCreateFlags),
@@ -1399,9 +1445,9 @@ BufferCreateInfo = define_structure('BufferCreateInfo',
     ('sharing_mode', SharingMode),
     ('queue_family_index_count', c_uint),
     ('queue_family_indices', POINTER(c_uint)),
-)
+))
 
-BufferViewCreateInfo = define_structure('BufferViewCreateInfo',
+define_lazy('BufferViewCreateInfo', lambda: define_structure('BufferViewCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', BufferViewCreateFlags),
@@ -1409,37 +1455,37 @@ BufferViewCreateInfo = define_structure('BufferViewCreateInfo',
     ('format', Format),
     ('offset', DeviceSize),
     ('range', DeviceSize),
-)
+))
 
-ImageSubresource = define_structure('ImageSubresource',
+define_lazy('ImageSubresource', lambda: define_structure('ImageSubresource',
     ('aspect_mask', ImageAspectFlags),
     ('mip_level', c_uint),
     ('array_layer', c_uint),
-)
+))
 
-ImageSubresourceLayers = define_structure('ImageSubresourceLayers',
+define_lazy('ImageSubresourceLayers', lambda: define_structure('ImageSubresourceLayers',
     ('aspect_mask', ImageAspectFlags),
     ('mip_level', c_uint),
     ('base_array_layer', c_uint),
     ('layer_count', c_uint),
-)
+))
 
-ImageSubresourceRange = define_structure('ImageSubresourceRange',
+define_lazy('ImageSubresourceRange', lambda: define_structure('ImageSubresourceRange',
     ('aspect_mask', ImageAspectFlags),
     ('base_mip_level', c_uint),
     ('level_count', c_uint),
     ('base_array_layer', c_uint),
     ('layer_count', c_uint),
-)
+))
 
-MemoryBarrier = define_structure('MemoryBarrier',
+define_lazy('MemoryBarrier', lambda: define_structure('MemoryBarrier',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('src_access_mask', AccessFlags),
     ('dst_access_mask', AccessFlags),
-)
+))
 
-BufferMemoryBarrier = define_structure('BufferMemoryBarrier',
+define_lazy('BufferMemoryBarrier', lambda: define_structure('BufferMemoryBarrier',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('src_access_mask', AccessFlags),
@@ -1449,9 +1495,9 @@ BufferMemoryBarrier = define_structure('BufferMemoryBarrier',
     ('buffer', Buffer),
     ('offset', DeviceSize),
     ('size', DeviceSize),
-)
+))
 
-ImageMemoryBarrier = define_structure('ImageMemoryBarrier',
+define_lazy('ImageMemoryBarrier', lambda: define_structure('ImageMemoryBarrier',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('src_access_mask', AccessFlags),
@@ -1462,9 +1508,9 @@ ImageMemoryBarrier = define_structure('ImageMemoryBarrier',
     ('dst_queue_family_index', c_uint),
     ('image', Image),
     ('subresource_range', ImageSubresourceRange),
-)
+))
 
-ImageCreateInfo = define_structure('ImageCreateInfo',
+define_lazy('ImageCreateInfo', lambda: define_structure('ImageCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', ImageCreateFlags),
@@ -1480,17 +1526,17 @@ ImageCreateInfo = define_structure('ImageCreateInfo',
     ('queue_family_index_count', c_uint),
     ('queue_family_indices', POINTER(c_uint)),
     ('initial_layout', ImageLayout),
-)
+))
 
-SubresourceLayout = define_structure('SubresourceLayout',
+define_lazy('SubresourceLayout', lambda: define_structure('SubresourceLayout',
     ('offset', DeviceSize),
     ('size', DeviceSize),
     ('row_pitch', DeviceSize),
     ('array_pitch', DeviceSize),
     ('depth_pitch', DeviceSize),
-)
+))
 
-ImageViewCreateInfo = define_structure('ImageViewCreateInfo',
+define_lazy('ImageViewCreateInfo', lambda: define_structure('ImageViewCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', ImageViewCreateFlags),
@@ -1499,50 +1545,50 @@ ImageViewCreateInfo = define_structure('ImageViewCreateInfo',
     ('format', Format),
     ('components', ComponentMapping),
     ('subresource_range', ImageSubresourceRange),
-)
+))
 
-BufferCopy = define_structure('BufferCopy',
+define_lazy('BufferCopy', lambda: define_structure('BufferCopy',
     ('src_offset', DeviceSize),
     ('dst_offset', DeviceSize),
     ('size', DeviceSize),
-)
+))
 
-SparseMemoryBind = define_structure('SparseMemoryBind',
+define_lazy('SparseMemoryBind', lambda: define_structure('SparseMemoryBind',
     ('resource_offset', DeviceSize),
     ('size', DeviceSize),
     ('memory', DeviceMemory),
     ('memory_offset', DeviceSize),
     ('flags', SparseMemoryBindFlags),
-)
+))
 
-SparseImageMemoryBind = define_structure('SparseImageMemoryBind',
+define_lazy('SparseImageMemoryBind', lambda: define_structure('SparseImageMemoryBind',
     ('subresource', ImageSubresource),
     ('offset', Offset3D),
     ('extent', Extent3D),
     ('memory', DeviceMemory),
     ('memory_offset', DeviceSize),
     ('flags', SparseMemoryBindFlags),
-)
+))
 
-SparseBufferMemoryBindInfo = define_structure('SparseBufferMemoryBindInfo',
+define_lazy('SparseBufferMemoryBindInfo', lambda: define_structure('SparseBufferMemoryBindInfo',
     ('buffer', Buffer),
     ('bind_count', c_uint),
     ('binds', POINTER(SparseMemoryBind)),
-)
+))
 
-SparseImageOpaqueMemoryBindInfo = define_structure('SparseImageOpaqueMemoryBindInfo',
+define_lazy('SparseImageOpaqueMemoryBindInfo', lambda: define_structure('SparseImageOpaqueMemoryBindInfo',
     ('image', Image),
     ('bind_count', c_uint),
     ('binds', POINTER(SparseMemoryBind)),
-)
+))
 
-SparseImageMemoryBindInfo = define_structure('SparseImageMemoryBindInfo',
+define_lazy('SparseImageMemoryBindInfo', lambda: define_structure('SparseImageMemoryBindInfo',
     ('image', Image),
     ('bind_count', c_uint),
     ('binds', POINTER(SparseImageMemoryBind)),
-)
+))
 
-BindSparseInfo = define_structure('BindSparseInfo',
+define_lazy('BindSparseInfo', lambda: define_structure('BindSparseInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('wait_semaphore_count', c_uint),
@@ -1555,100 +1601,100 @@ BindSparseInfo = define_structure('BindSparseInfo',
     ('image_binds', POINTER(SparseImageMemoryBindInfo)),
     ('signal_semaphore_count', c_uint),
     ('signal_semaphores', POINTER(Semaphore)),
-)
+))
 
-ImageCopy = define_structure('ImageCopy',
+define_lazy('ImageCopy', lambda: define_structure('ImageCopy',
     ('src_subresource', ImageSubresourceLayers),
     ('src_offset', Offset3D),
     ('dst_subresource', ImageSubresourceLayers),
     ('dst_offset', Offset3D),
     ('extent', Extent3D),
-)
+))
 
-ImageBlit = define_structure('ImageBlit',
+define_lazy('ImageBlit', lambda: define_structure('ImageBlit',
     ('src_subresource', ImageSubresourceLayers),
     ('src_offsets', (Offset3D*2)),
     ('dst_subresource', ImageSubresourceLayers),
     ('dst_offsets', (Offset3D*2)),
-)
+))
 
-BufferImageCopy = define_structure('BufferImageCopy',
+define_lazy('BufferImageCopy', lambda: define_structure('BufferImageCopy',
     ('buffer_offset', DeviceSize),
     ('buffer_row_length', c_uint),
     ('buffer_image_height', c_uint),
     ('image_subresource', ImageSubresourceLayers),
     ('image_offset', Offset3D),
     ('image_extent', Extent3D),
-)
+))
 
-ImageResolve = define_structure('ImageResolve',
+define_lazy('ImageResolve', lambda: define_structure('ImageResolve',
     ('src_subresource', ImageSubresourceLayers),
     ('src_offset', Offset3D),
     ('dst_subresource', ImageSubresourceLayers),
     ('dst_offset', Offset3D),
     ('extent', Extent3D),
-)
+))
 
-ShaderModuleCreateInfo = define_structure('ShaderModuleCreateInfo',
+define_lazy('ShaderModuleCreateInfo', lambda: define_structure('ShaderModuleCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', ShaderModuleCreateFlags),
     ('code_size', c_size_t),
     ('code', POINTER(c_uint)),
-)
+))
 
-DescriptorSetLayoutBinding = define_structure('DescriptorSetLayoutBinding',
+define_lazy('DescriptorSetLayoutBinding', lambda: define_structure('DescriptorSetLayoutBinding',
     ('binding', c_uint),
     ('descriptor_type', DescriptorType),
     ('descriptor_count', c_uint),
     ('stage_flags', ShaderStageFlags),
     ('immutable_samplers', POINTER(Sampler)),
-)
+))
 
-DescriptorSetLayoutCreateInfo = define_structure('DescriptorSetLayoutCreateInfo',
+define_lazy('DescriptorSetLayoutCreateInfo', lambda: define_structure('DescriptorSetLayoutCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', DescriptorSetLayoutCreateFlags),
     ('binding_count', c_uint),
     ('bindings', POINTER(DescriptorSetLayoutBinding)),
-)
+))
 
-DescriptorPoolSize = define_structure('DescriptorPoolSize',
+define_lazy('DescriptorPoolSize', lambda: define_structure('DescriptorPoolSize',
     ('type', DescriptorType),
     ('descriptor_count', c_uint),
-)
+))
 
-DescriptorPoolCreateInfo = define_structure('DescriptorPoolCreateInfo',
+define_lazy('DescriptorPoolCreateInfo', lambda: define_structure('DescriptorPoolCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', DescriptorPoolCreateFlags),
     ('max_sets', c_uint),
     ('pool_size_count', c_uint),
     ('pool_sizes', POINTER(DescriptorPoolSize)),
-)
+))
 
-DescriptorSetAllocateInfo = define_structure('DescriptorSetAllocateInfo',
+define_lazy('DescriptorSetAllocateInfo', lambda: define_structure('DescriptorSetAllocateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('descriptor_pool', DescriptorPool),
     ('descriptor_set_count', c_uint),
     ('set_layouts', POINTER(DescriptorSetLayout)),
-)
+))
 
-SpecializationMapEntry = define_structure('SpecializationMapEntry',
+define_lazy('SpecializationMapEntry', lambda: define_structure('SpecializationMapEntry',
     ('constant_ID', c_uint),
     ('offset', c_uint),
     ('size', c_size_t),
-)
+))
 
-SpecializationInfo = define_structure('SpecializationInfo',
+define_lazy('SpecializationInfo', lambda: define_structure('SpecializationInfo',
     ('map_entry_count', c_uint),
     ('map_entries', POINTER(SpecializationMapEntry)),
     ('data_size', c_size_t),
     ('data', c_void_p),
-)
+))
 
-PipelineShaderStageCreateInfo = define_structure('PipelineShaderStageCreateInfo',
+define_lazy('PipelineShaderStageCreateInfo', lambda: define_structure('PipelineShaderStageCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', PipelineShaderStageCreateFlags),
@@ -1656,9 +1702,9 @@ PipelineShaderStageCreateInfo = define_structure('PipelineShaderStageCreateInfo'
     ('module', ShaderModule),
     ('name', c_char_p),
     ('specialization_info', POINTER(SpecializationInfo)),
-)
+))
 
-ComputePipelineCreateInfo = define_structure('ComputePipelineCreateInfo',
+define_lazy('ComputePipelineCreateInfo', lambda: define_structure('ComputePipelineCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', PipelineCreateFlags),
@@ -1666,22 +1712,22 @@ ComputePipelineCreateInfo = define_structure('ComputePipelineCreateInfo',
     ('layout', PipelineLayout),
     ('base_pipeline_handle', Pipeline),
     ('base_pipeline_index', c_int),
-)
+))
 
-VertexInputBindingDescription = define_structure('VertexInputBindingDescription',
+define_lazy('VertexInputBindingDescription', lambda: define_structure('VertexInputBindingDescription',
     ('binding', c_uint),
     ('stride', c_uint),
     ('input_rate', VertexInputRate),
-)
+))
 
-VertexInputAttributeDescription = define_structure('VertexInputAttributeDescription',
+define_lazy('VertexInputAttributeDescription', lambda: define_structure('VertexInputAttributeDescription',
     ('location', c_uint),
     ('binding', c_uint),
     ('format', Format),
     ('offset', c_uint),
-)
+))
 
-PipelineVertexInputStateCreateInfo = define_structure('PipelineVertexInputStateCreateInfo',
+define_lazy('PipelineVertexInputStateCreateInfo', lambda: define_structure('PipelineVertexInputStateCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', PipelineVertexInputStateCreateFlags),
@@ -1689,24 +1735,24 @@ PipelineVertexInputStateCreateInfo = define_structure('PipelineVertexInputStateC
     ('vertex_binding_descriptions', POINTER(VertexInputBindingDescription)),
     ('vertex_attribute_description_count', c_uint),
     ('vertex_attribute_descriptions', POINTER(VertexInputAttributeDescription)),
-)
+))
 
-PipelineInputAssemblyStateCreateInfo = define_structure('PipelineInputAssemblyStateCreateInfo',
+define_lazy('PipelineInputAssemblyStateCreateInfo', lambda: define_structure('PipelineInputAssemblyStateCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', PipelineInputAssemblyStateCreateFlags),
     ('topology', PrimitiveTopology),
     ('primitive_restart_enable', Bool32),
-)
+))
 
-PipelineTessellationStateCreateInfo = define_structure('PipelineTessellationStateCreateInfo',
+define_lazy('PipelineTessellationStateCreateInfo', lambda: define_structure('PipelineTessellationStateCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', PipelineTessellationStateCreateFlags),
     ('patch_control_points', c_uint),
-)
+))
 
-PipelineViewportStateCreateInfo = define_structure('PipelineViewportStateCreateInfo',
+define_lazy('PipelineViewportStateCreateInfo', lambda: define_structure('PipelineViewportStateCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', PipelineViewportStateCreateFlags),
@@ -1714,9 +1760,9 @@ PipelineViewportStateCreateInfo = define_structure('PipelineViewportStateCreateI
     ('viewports', POINTER(Viewport)),
     ('scissor_count', c_uint),
     ('scissors', POINTER(Rect2D)),
-)
+))
 
-PipelineRasterizationStateCreateInfo = define_structure('PipelineRasterizationStateCreateInfo',
+define_lazy('PipelineRasterizationStateCreateInfo', lambda: define_structure('PipelineRasterizationStateCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', PipelineRasterizationStateCreateFlags),
@@ -1730,9 +1776,9 @@ PipelineRasterizationStateCreateInfo = define_structure('PipelineRasterizationSt
     ('depth_bias_clamp', c_float),
     ('depth_bias_slope_factor', c_float),
     ('line_width', c_float),
-)
+))
 
-PipelineMultisampleStateCreateInfo = define_structure('PipelineMultisampleStateCreateInfo',
+define_lazy('PipelineMultisampleStateCreateInfo', lambda: define_structure('PipelineMultisampleStateCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', PipelineMultisampleStateCreateFlags),
@@ -1742,9 +1788,9 @@ PipelineMultisampleStateCreateInfo = define_structure('PipelineMultisampleStateC
     ('sample_mask', POINTER(SampleMask)),
     ('alpha_toCoverage_enable', Bool32),
     ('alpha_toOne_enable', Bool32),
-)
+))
 
-PipelineColorBlendAttachmentState = define_structure('PipelineColorBlendAttachmentState',
+define_lazy('PipelineColorBlendAttachmentState', lambda: define_structure('PipelineColorBlendAttachmentState',
     ('blend_enable', Bool32),
     ('src_color_blend_factor', BlendFactor),
     ('dst_color_blend_factor', BlendFactor),
@@ -1753,9 +1799,9 @@ PipelineColorBlendAttachmentState = define_structure('PipelineColorBlendAttachme
     ('dst_alpha_blend_factor', BlendFactor),
     ('alpha_blend_op', BlendOp),
     ('color_write_mask', ColorComponentFlags),
-)
+))
 
-PipelineColorBlendStateCreateInfo = define_structure('PipelineColorBlendStateCreateInfo',
+define_lazy('PipelineColorBlendStateCreateInfo', lambda: define_structure('PipelineColorBlendStateCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', PipelineColorBlendStateCreateFlags),
@@ -1764,17 +1810,17 @@ PipelineColorBlendStateCreateInfo = define_structure('PipelineColorBlendStateCre
     ('attachment_count', c_uint),
     ('attachments', POINTER(PipelineColorBlendAttachmentState)),
     ('blend_constants', (c_float*4)),
-)
+))
 
-PipelineDynamicStateCreateInfo = define_structure('PipelineDynamicStateCreateInfo',
+define_lazy('PipelineDynamicStateCreateInfo', lambda: define_structure('PipelineDynamicStateCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', PipelineDynamicStateCreateFlags),
     ('dynamic_state_count', c_uint),
     ('dynamic_states', POINTER(DynamicState)),
-)
+))
 
-StencilOpState = define_structure('StencilOpState',
+define_lazy('StencilOpState', lambda: define_structure('StencilOpState',
     ('fail_op', StencilOp),
     ('pass_op', StencilOp),
     ('depth_fail_op', StencilOp),
@@ -1782,9 +1828,9 @@ StencilOpState = define_structure('StencilOpState',
     ('compare_mask', c_uint),
     ('write_mask', c_uint),
     ('reference', c_uint),
-)
+))
 
-PipelineDepthStencilStateCreateInfo = define_structure('PipelineDepthStencilStateCreateInfo',
+define_lazy('PipelineDepthStencilStateCreateInfo', lambda: define_structure('PipelineDepthStencilStateCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', PipelineDepthStencilStateCreateFlags),
@@ -1797,9 +1843,9 @@ PipelineDepthStencilStateCreateInfo = define_structure('PipelineDepthStencilStat
     ('back', StencilOpState),
     ('min_depth_bounds', c_float),
     ('max_depth_bounds', c_float),
-)
+))
 
-GraphicsPipelineCreateInfo = define_structure('GraphicsPipelineCreateInfo',
+define_lazy('GraphicsPipelineCreateInfo', lambda: define_structure('GraphicsPipelineCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', PipelineCreateFlags),
@@ -1819,23 +1865,23 @@ GraphicsPipelineCreateInfo = define_structure('GraphicsPipelineCreateInfo',
     ('subpass', c_uint),
     ('base_pipeline_handle', Pipeline),
     ('base_pipeline_index', c_int),
-)
+))
 
-PipelineCacheCreateInfo = define_structure('PipelineCacheCreateInfo',
+define_lazy('PipelineCacheCreateInfo', lambda: define_structure('PipelineCacheCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', PipelineCacheCreateFlags),
     ('initial_data_size', c_size_t),
     ('initial_data', c_void_p),
-)
+))
 
-PushConstantRange = define_structure('PushConstantRange',
+define_lazy('PushConstantRange', lambda: define_structure('PushConstantRange',
     ('stage_flags', ShaderStageFlags),
     ('offset', c_uint),
     ('size', c_uint),
-)
+))
 
-PipelineLayoutCreateInfo = define_structure('PipelineLayoutCreateInfo',
+define_lazy('PipelineLayoutCreateInfo', lambda: define_structure('PipelineLayoutCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', PipelineLayoutCreateFlags),
@@ -1843,9 +1889,9 @@ PipelineLayoutCreateInfo = define_structure('PipelineLayoutCreateInfo',
     ('set_layouts', POINTER(DescriptorSetLayout)),
     ('push_constant_range_count', c_uint),
     ('push_constant_ranges', POINTER(PushConstantRange)),
-)
+))
 
-SamplerCreateInfo = define_structure('SamplerCreateInfo',
+define_lazy('SamplerCreateInfo', lambda: define_structure('SamplerCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', SamplerCreateFlags),
@@ -1864,24 +1910,24 @@ SamplerCreateInfo = define_structure('SamplerCreateInfo',
     ('max_lod', c_float),
     ('border_color', BorderColor),
     ('unnormalized_coordinates', Bool32),
-)
+))
 
-CommandPoolCreateInfo = define_structure('CommandPoolCreateInfo',
+define_lazy('CommandPoolCreateInfo', lambda: define_structure('CommandPoolCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', CommandPoolCreateFlags),
     ('queue_family_index', c_uint),
-)
+))
 
-CommandBufferAllocateInfo = define_structure('CommandBufferAllocateInfo',
+define_lazy('CommandBufferAllocateInfo', lambda: define_structure('CommandBufferAllocateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('command_pool', CommandPool),
     ('level', CommandBufferLevel),
     ('command_buffer_count', c_uint),
-)
+))
 
-CommandBufferInheritanceInfo = define_structure('CommandBufferInheritanceInfo',
+define_lazy('CommandBufferInheritanceInfo', lambda: define_structure('CommandBufferInheritanceInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('render_pass', RenderPass),
@@ -1890,32 +1936,32 @@ CommandBufferInheritanceInfo = define_structure('CommandBufferInheritanceInfo',
     ('occlusion_query_enable', Bool32),
     ('query_flags', QueryControlFlags),
     ('pipeline_statistics', QueryPipelineStatisticFlags),
-)
+))
 
-CommandBufferBeginInfo = define_structure('CommandBufferBeginInfo',
+define_lazy('CommandBufferBeginInfo', lambda: define_structure('CommandBufferBeginInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', CommandBufferUsageFlags),
     ('inheritance_info', POINTER(CommandBufferInheritanceInfo)),
-)
+))
 
-ClearColorValue = define_union('ClearColorValue',
+define_lazy('ClearColorValue', lambda: define_union('ClearColorValue',
     ('float32', (c_float*4)),
     ('int32', (c_int*4)),
     ('uint32', (c_uint*4)),
-)
+))
 
-ClearDepthStencilValue = define_structure('ClearDepthStencilValue',
+define_lazy('ClearDepthStencilValue', lambda: define_structure('ClearDepthStencilValue',
     ('depth', c_float),
     ('stencil', c_uint),
-)
+))
 
-ClearValue = define_union('ClearValue',
+define_lazy('ClearValue', lambda: define_union('ClearValue',
     ('color', ClearColorValue),
     ('depth_stencil', ClearDepthStencilValue),
-)
+))
 
-RenderPassBeginInfo = define_structure('RenderPassBeginInfo',
+define_lazy('RenderPassBeginInfo', lambda: define_structure('RenderPassBeginInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('render_pass', RenderPass),
@@ -1923,15 +1969,15 @@ RenderPassBeginInfo = define_structure('RenderPassBeginInfo',
     ('render_area', Rect2D),
     ('clear_value_count', c_uint),
     ('clear_values', POINTER(ClearValue)),
-)
+))
 
-ClearAttachment = define_structure('ClearAttachment',
+define_lazy('ClearAttachment', lambda: define_structure('ClearAttachment',
     ('aspect_mask', ImageAspectFlags),
     ('color_attachment', c_uint),
     ('clear_value', ClearValue),
-)
+))
 
-AttachmentDescription = define_structure('AttachmentDescription',
+define_lazy('AttachmentDescription', lambda: define_structure('AttachmentDescription',
     ('flags', AttachmentDescriptionFlags),
     ('format', Format),
     ('samples', SampleCountFlagBits),
@@ -1941,14 +1987,14 @@ AttachmentDescription = define_structure('AttachmentDescription',
     ('stencil_store_op', AttachmentStoreOp),
     ('initial_layout', ImageLayout),
     ('final_layout', ImageLayout),
-)
+))
 
-AttachmentReference = define_structure('AttachmentReference',
+define_lazy('AttachmentReference', lambda: define_structure('AttachmentReference',
     ('attachment', c_uint),
     ('layout', ImageLayout),
-)
+))
 
-SubpassDescription = define_structure('SubpassDescription',
+define_lazy('SubpassDescription', lambda: define_structure('SubpassDescription',
     ('flags', SubpassDescriptionFlags),
     ('pipeline_bind_point', PipelineBindPoint),
     ('input_attachment_count', c_uint),
@@ -1959,9 +2005,9 @@ SubpassDescription = define_structure('SubpassDescription',
     ('depth_stencil_attachment', POINTER(AttachmentReference)),
     ('preserve_attachment_count', c_uint),
     ('preserve_attachments', POINTER(c_uint)),
-)
+))
 
-SubpassDependency = define_structure('SubpassDependency',
+define_lazy('SubpassDependency', lambda: define_structure('SubpassDependency',
     ('src_subpass', c_uint),
     ('dst_subpass', c_uint),
     ('src_stage_mask', PipelineStageFlags),
@@ -1969,9 +2015,9 @@ SubpassDependency = define_structure('SubpassDependency',
     ('src_access_mask', AccessFlags),
     ('dst_access_mask', AccessFlags),
     ('dependency_flags', DependencyFlags),
-)
+))
 
-RenderPassCreateInfo = define_structure('RenderPassCreateInfo',
+define_lazy('RenderPassCreateInfo', lambda: define_structure('RenderPassCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', RenderPassCreateFlags),
@@ -1981,36 +2027,36 @@ RenderPassCreateInfo = define_structure('RenderPassCreateInfo',
     ('subpasses', POINTER(SubpassDescription)),
     ('dependency_count', c_uint),
     ('dependencies', POINTER(SubpassDependency)),
-)
+))
 
-EventCreateInfo = define_structure('EventCreateInfo',
+define_lazy('EventCreateInfo', lambda: define_structure('EventCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', EventCreateFlags),
-)
+))
 
-FenceCreateInfo = define_structure('FenceCreateInfo',
+define_lazy('FenceCreateInfo', lambda: define_structure('FenceCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', FenceCreateFlags),
-)
+))
 
-SemaphoreCreateInfo = define_structure('SemaphoreCreateInfo',
+define_lazy('SemaphoreCreateInfo', lambda: define_structure('SemaphoreCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', SemaphoreCreateFlags),
-)
+))
 
-QueryPoolCreateInfo = define_structure('QueryPoolCreateInfo',
+define_lazy('QueryPoolCreateInfo', lambda: define_structure('QueryPoolCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', QueryPoolCreateFlags),
     ('query_type', QueryType),
     ('query_count', c_uint),
     ('pipeline_statistics', QueryPipelineStatisticFlags),
-)
+))
 
-FramebufferCreateInfo = define_structure('FramebufferCreateInfo',
+define_lazy('FramebufferCreateInfo', lambda: define_structure('FramebufferCreateInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', FramebufferCreateFlags),
@@ -2020,30 +2066,30 @@ FramebufferCreateInfo = define_structure('FramebufferCreateInfo',
     ('width', c_uint),
     ('height', c_uint),
     ('layers', c_uint),
-)
+))
 
-DrawIndirectCommand = define_structure('DrawIndirectCommand',
+define_lazy('DrawIndirectCommand', lambda: define_structure('DrawIndirectCommand',
     ('vertex_count', c_uint),
     ('instance_count', c_uint),
     ('first_vertex', c_uint),
     ('first_instance', c_uint),
-)
+))
 
-DrawIndexedIndirectCommand = define_structure('DrawIndexedIndirectCommand',
+define_lazy('DrawIndexedIndirectCommand', lambda: define_structure('DrawIndexedIndirectCommand',
     ('index_count', c_uint),
     ('instance_count', c_uint),
     ('first_index', c_uint),
     ('vertex_offset', c_int),
     ('first_instance', c_uint),
-)
+))
 
-DispatchIndirectCommand = define_structure('DispatchIndirectCommand',
+define_lazy('DispatchIndirectCommand', lambda: define_structure('DispatchIndirectCommand',
     ('x', c_uint),
     ('y', c_uint),
     ('z', c_uint),
-)
+))
 
-SubmitInfo = define_structure('SubmitInfo',
+define_lazy('SubmitInfo', lambda: define_structure('SubmitInfo',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('wait_semaphore_count', c_uint),
@@ -2053,9 +2099,9 @@ SubmitInfo = define_structure('SubmitInfo',
     ('command_buffers', POINTER(CommandBuffer)),
     ('signal_semaphore_count', c_uint),
     ('signal_semaphores', POINTER(Semaphore)),
-)
+))
 
-DisplayPropertiesKHR = define_structure('DisplayPropertiesKHR',
+define_lazy('DisplayPropertiesKHR', lambda: define_structure('DisplayPropertiesKHR',
     ('display', DisplayKHR),
     ('display_name', c_char_p),
     ('physical_dimensions', Extent2D),
@@ -2063,31 +2109,31 @@ DisplayPropertiesKHR = define_structure('DisplayPropertiesKHR',
     ('supported_transforms', SurfaceTransformFlagsKHR),
     ('plane_reorder_possible', Bool32),
     ('persistent_content', Bool32),
-)
+))
 
-DisplayPlanePropertiesKHR = define_structure('DisplayPlanePropertiesKHR',
+define_lazy('DisplayPlanePropertiesKHR', lambda: define_structure('DisplayPlanePropertiesKHR',
     ('current_display', DisplayKHR),
     ('current_stack_index', c_uint),
-)
+))
 
-DisplayModeParametersKHR = define_structure('DisplayModeParametersKHR',
+define_lazy('DisplayModeParametersKHR', lambda: define_structure('DisplayModeParametersKHR',
     ('visible_region', Extent2D),
     ('refresh_rate', c_uint),
-)
+))
 
-DisplayModePropertiesKHR = define_structure('DisplayModePropertiesKHR',
+define_lazy('DisplayModePropertiesKHR', lambda: define_structure('DisplayModePropertiesKHR',
     ('display_mode', DisplayModeKHR),
     ('parameters', DisplayModeParametersKHR),
-)
+))
 
-DisplayModeCreateInfoKHR = define_structure('DisplayModeCreateInfoKHR',
+define_lazy('DisplayModeCreateInfoKHR', lambda: define_structure('DisplayModeCreateInfoKHR',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', DisplayModeCreateFlagsKHR),
     ('parameters', DisplayModeParametersKHR),
-)
+))
 
-DisplayPlaneCapabilitiesKHR = define_structure('DisplayPlaneCapabilitiesKHR',
+define_lazy('DisplayPlaneCapabilitiesKHR', lambda: define_structure('DisplayPlaneCapabilitiesKHR',
     ('supported_alpha', DisplayPlaneAlphaFlagsKHR),
     ('min_src_position', Offset2D),
     ('max_src_position', Offset2D),
@@ -2097,9 +2143,9 @@ DisplayPlaneCapabilitiesKHR = define_structure('DisplayPlaneCapabilitiesKHR',
     ('max_dst_position', Offset2D),
     ('min_dst_extent', Extent2D),
     ('max_dst_extent', Extent2D),
-)
+))
 
-DisplaySurfaceCreateInfoKHR = define_structure('DisplaySurfaceCreateInfoKHR',
+define_lazy('DisplaySurfaceCreateInfoKHR', lambda: define_structure('DisplaySurfaceCreateInfoKHR',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', DisplaySurfaceCreateFlagsKHR),
@@ -2110,17 +2156,17 @@ DisplaySurfaceCreateInfoKHR = define_structure('DisplaySurfaceCreateInfoKHR',
     ('global_alpha', c_float),
     ('alpha_mode', DisplayPlaneAlphaFlagBitsKHR),
     ('image_extent', Extent2D),
-)
+))
 
-DisplayPresentInfoKHR = define_structure('DisplayPresentInfoKHR',
+define_lazy('DisplayPresentInfoKHR', lambda: define_structure('DisplayPresentInfoKHR',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('src_rect', Rect2D),
     ('dst_rect', Rect2D),
     ('persistent', Bool32),
-)
+))
 
-SurfaceCapabilitiesKHR = define_structure('SurfaceCapabilitiesKHR',
+define_lazy('SurfaceCapabilitiesKHR', lambda: define_structure('SurfaceCapabilitiesKHR',
     ('min_image_count', c_uint),
     ('max_image_count', c_uint),
     ('current_extent', Extent2D),
@@ -2131,61 +2177,61 @@ SurfaceCapabilitiesKHR = define_structure('SurfaceCapabilitiesKHR',
     ('current_transform', SurfaceTransformFlagBitsKHR),
     ('supported_composite_alpha', CompositeAlphaFlagsKHR),
     ('supported_usage_flags', ImageUsageFlags),
-)
+))
 
-AndroidSurfaceCreateInfoKHR = define_structure('AndroidSurfaceCreateInfoKHR',
+define_lazy('AndroidSurfaceCreateInfoKHR', lambda: define_structure('AndroidSurfaceCreateInfoKHR',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', AndroidSurfaceCreateFlagsKHR),
     ('window', ANativeWindow),
-)
+))
 
-MirSurfaceCreateInfoKHR = define_structure('MirSurfaceCreateInfoKHR',
+define_lazy('MirSurfaceCreateInfoKHR', lambda: define_structure('MirSurfaceCreateInfoKHR',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', MirSurfaceCreateFlagsKHR),
     ('connection', MirConnection),
     ('mir_surface', MirSurface),
-)
+))
 
-WaylandSurfaceCreateInfoKHR = define_structure('WaylandSurfaceCreateInfoKHR',
+define_lazy('WaylandSurfaceCreateInfoKHR', lambda: define_structure('WaylandSurfaceCreateInfoKHR',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', WaylandSurfaceCreateFlagsKHR),
     ('display', wl_display),
     ('surface', wl_surface),
-)
+))
 
-Win32SurfaceCreateInfoKHR = define_structure('Win32SurfaceCreateInfoKHR',
+define_lazy('Win32SurfaceCreateInfoKHR', lambda: define_structure('Win32SurfaceCreateInfoKHR',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', Win32SurfaceCreateFlagsKHR),
     ('hinstance', HINSTANCE),
     ('hwnd', HWND),
-)
+))
 
-XlibSurfaceCreateInfoKHR = define_structure('XlibSurfaceCreateInfoKHR',
+define_lazy('XlibSurfaceCreateInfoKHR', lambda: define_structure('XlibSurfaceCreateInfoKHR',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', XlibSurfaceCreateFlagsKHR),
     ('dpy', Display),
     ('window', Window),
-)
+))
 
-XcbSurfaceCreateInfoKHR = define_structure('XcbSurfaceCreateInfoKHR',
+define_lazy('XcbSurfaceCreateInfoKHR', lambda: define_structure('XcbSurfaceCreateInfoKHR',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', XcbSurfaceCreateFlagsKHR),
     ('connection', xcb_connection_t),
     ('window', xcb_window_t),
-)
+))
 
-SurfaceFormatKHR = define_structure('SurfaceFormatKHR',
+define_lazy('SurfaceFormatKHR', lambda: define_structure('SurfaceFormatKHR',
     ('format', Format),
     ('color_space', ColorSpaceKHR),
-)
+))
 
-SwapchainCreateInfoKHR = define_structure('SwapchainCreateInfoKHR',
+define_lazy('SwapchainCreateInfoKHR', lambda: define_structure('SwapchainCreateInfoKHR',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', SwapchainCreateFlagsKHR),
@@ -2204,9 +2250,9 @@ SwapchainCreateInfoKHR = define_structure('SwapchainCreateInfoKHR',
     ('present_mode', PresentModeKHR),
     ('clipped', Bool32),
     ('old_swapchain', SwapchainKHR),
-)
+))
 
-PresentInfoKHR = define_structure('PresentInfoKHR',
+define_lazy('PresentInfoKHR', lambda: define_structure('PresentInfoKHR',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('wait_semaphore_count', c_uint),
@@ -2215,31 +2261,31 @@ PresentInfoKHR = define_structure('PresentInfoKHR',
     ('swapchains', POINTER(SwapchainKHR)),
     ('image_indices', POINTER(c_uint)),
     ('results', POINTER(Result)),
-)
+))
 
-DebugReportCallbackCreateInfoEXT = define_structure('DebugReportCallbackCreateInfoEXT',
+define_lazy('DebugReportCallbackCreateInfoEXT', lambda: define_structure('DebugReportCallbackCreateInfoEXT',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('flags', DebugReportFlagsEXT),
     ('callback', fn_DebugReportCallbackEXT),
     ('user_data', c_void_p),
-)
+))
 
-PipelineRasterizationStateRasterizationOrderAMD = define_structure('PipelineRasterizationStateRasterizationOrderAMD',
+define_lazy('PipelineRasterizationStateRasterizationOrderAMD', lambda: define_structure('PipelineRasterizationStateRasterizationOrderAMD',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('rasterization_order', RasterizationOrderAMD),
-)
+))
 
-DebugMarkerObjectNameInfoEXT = define_structure('DebugMarkerObjectNameInfoEXT',
+define_lazy('DebugMarkerObjectNameInfoEXT', lambda: define_structure('DebugMarkerObjectNameInfoEXT',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('object_type', DebugReportObjectTypeEXT),
     ('object', c_uint64),
     ('object_name', c_char_p),
-)
+))
 
-DebugMarkerObjectTagInfoEXT = define_structure('DebugMarkerObjectTagInfoEXT',
+define_lazy('DebugMarkerObjectTagInfoEXT', lambda: define_structure('DebugMarkerObjectTagInfoEXT',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('object_type', DebugReportObjectTypeEXT),
@@ -2247,38 +2293,38 @@ DebugMarkerObjectTagInfoEXT = define_structure('DebugMarkerObjectTagInfoEXT',
     ('tag_name', c_uint64),
     ('tag_size', c_size_t),
     ('tag', c_void_p),
-)
+))
 
-DebugMarkerMarkerInfoEXT = define_structure('DebugMarkerMarkerInfoEXT',
+define_lazy('DebugMarkerMarkerInfoEXT', lambda: define_structure('DebugMarkerMarkerInfoEXT',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('marker_name', c_char_p),
     ('color', (c_float*4)),
-)
+))
 
-DedicatedAllocationImageCreateInfoNV = define_structure('DedicatedAllocationImageCreateInfoNV',
+define_lazy('DedicatedAllocationImageCreateInfoNV', lambda: define_structure('DedicatedAllocationImageCreateInfoNV',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('dedicated_allocation', Bool32),
-)
+))
 
-DedicatedAllocationBufferCreateInfoNV = define_structure('DedicatedAllocationBufferCreateInfoNV',
+define_lazy('DedicatedAllocationBufferCreateInfoNV', lambda: define_structure('DedicatedAllocationBufferCreateInfoNV',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('dedicated_allocation', Bool32),
-)
+))
 
-DedicatedAllocationMemoryAllocateInfoNV = define_structure('DedicatedAllocationMemoryAllocateInfoNV',
+define_lazy('DedicatedAllocationMemoryAllocateInfoNV', lambda: define_structure('DedicatedAllocationMemoryAllocateInfoNV',
     ('s_type', StructureType),
     ('next', c_void_p),
     ('image', Image),
     ('buffer', Buffer),
-)
+))
 
 
 # FUNCTIONS 
 
-DeviceFunctions = (
+define_lazy('DeviceFunctions', lambda: (
     (b'vkDestroyDevice', None, Device, POINTER(AllocationCallbacks), ),
     (b'vkGetDeviceQueue', None, Device, c_uint, c_uint, POINTER(Queue), ),
     (b'vkDeviceWaitIdle', Result, Device, ),
@@ -2356,22 +2402,22 @@ DeviceFunctions = (
     (b'vkAcquireNextImageKHR', Result, Device, SwapchainKHR, c_uint64, Semaphore, Fence, POINTER(c_uint), ),
     (b'vkDebugMarkerSetObjectNameEXT', Result, Device, POINTER(DebugMarkerObjectNameInfoEXT), ),
     (b'vkDebugMarkerSetObjectTagEXT', Result, Device, POINTER(DebugMarkerObjectTagInfoEXT), ),
-)
+))
 
-LoaderFunctions = (
+define_lazy('LoaderFunctions', lambda: (
     (b'vkCreateInstance', Result, POINTER(InstanceCreateInfo), POINTER(AllocationCallbacks), POINTER(Instance), ),
     (b'vkEnumerateInstanceLayerProperties', Result, POINTER(c_uint), POINTER(LayerProperties), ),
     (b'vkEnumerateInstanceExtensionProperties', Result, c_char_p, POINTER(c_uint), POINTER(ExtensionProperties), ),
-)
+))
 
-QueueFunctions = (
+define_lazy('QueueFunctions', lambda: (
     (b'vkQueueSubmit', Result, Queue, c_uint, POINTER(SubmitInfo), Fence, ),
     (b'vkQueueWaitIdle', Result, Queue, ),
     (b'vkQueueBindSparse', Result, Queue, c_uint, POINTER(BindSparseInfo), Fence, ),
     (b'vkQueuePresentKHR', Result, Queue, POINTER(PresentInfoKHR), ),
-)
+))
 
-PhysicalDeviceFunctions = (
+define_lazy('PhysicalDeviceFunctions', lambda: (
     (b'vkGetPhysicalDeviceProperties', None, PhysicalDevice, POINTER(PhysicalDeviceProperties), ),
     (b'vkGetPhysicalDeviceQueueFamilyProperties', None, PhysicalDevice, POINTER(c_uint), POINTER(QueueFamilyProperties), ),
     (b'vkGetPhysicalDeviceMemoryProperties', None, PhysicalDevice, POINTER(PhysicalDeviceMemoryProperties), ),
@@ -2397,9 +2443,9 @@ PhysicalDeviceFunctions = (
     (b'vkGetPhysicalDeviceWin32PresentationSupportKHR', Bool32, PhysicalDevice, c_uint, ),
     (b'vkGetPhysicalDeviceXlibPresentationSupportKHR', Bool32, PhysicalDevice, c_uint, Display, VisualID, ),
     (b'vkGetPhysicalDeviceXcbPresentationSupportKHR', Bool32, PhysicalDevice, c_uint, xcb_connection_t, xcb_visualid_t, ),
-)
+))
 
-CommandBufferFunctions = (
+define_lazy('CommandBufferFunctions', lambda: (
     (b'vkBeginCommandBuffer', Result, CommandBuffer, POINTER(CommandBufferBeginInfo), ),
     (b'vkEndCommandBuffer', Result, CommandBuffer, ),
     (b'vkResetCommandBuffer', Result, CommandBuffer, CommandBufferResetFlags, ),
@@ -2450,9 +2496,9 @@ CommandBufferFunctions = (
     (b'vkCmdDebugMarkerBeginEXT', None, CommandBuffer, POINTER(DebugMarkerMarkerInfoEXT), ),
     (b'vkCmdDebugMarkerEndEXT', None, CommandBuffer, ),
     (b'vkCmdDebugMarkerInsertEXT', None, CommandBuffer, POINTER(DebugMarkerMarkerInfoEXT), ),
-)
+))
 
-InstanceFunctions = (
+define_lazy('InstanceFunctions', lambda: (
     (b'vkDestroyInstance', None, Instance, POINTER(AllocationCallbacks), ),
     (b'vkEnumeratePhysicalDevices', Result, Instance, POINTER(c_uint), POINTER(PhysicalDevice), ),
     (b'vkGetDeviceProcAddr', fn_VoidFunction, Device, c_char_p, ),
@@ -2467,7 +2513,7 @@ InstanceFunctions = (
     (b'vkCreateDebugReportCallbackEXT', Result, Instance, POINTER(DebugReportCallbackCreateInfoEXT), POINTER(AllocationCallbacks), POINTER(DebugReportCallbackEXT), ),
     (b'vkDestroyDebugReportCallbackEXT', None, Instance, DebugReportCallbackEXT, POINTER(AllocationCallbacks), ),
     (b'vkDebugReportMessageEXT', None, Instance, DebugReportFlagsEXT, DebugReportObjectTypeEXT, c_uint64, c_size_t, c_int, c_char_p, c_char_p, ),
-)
+))
 
 GetInstanceProcAddr = vk.vkGetInstanceProcAddr
 GetInstanceProcAddr.restype = fn_VoidFunction
@@ -2594,9 +2640,43 @@ STRUCTURE_TYPE_DEDICATED_ALLOCATION_MEMORY_ALLOCATE_INFO_NV = 1000026002
 
 
 
-# Load the loader functions in the module namespace
-loc = locals()
-for name, fnptr in load_functions(Instance(0), LoaderFunctions, GetInstanceProcAddr):
-    loc[name] = fnptr
-del loc
+# The loader functions are loaded in the module namespace on first access
+define_lazy('_loader_functions', lambda: FunctionTable(Instance(0), LoaderFunctions, GetInstanceProcAddr))
+define_lazy('CreateInstance', lambda: _loader_functions.CreateInstance)
+define_lazy('EnumerateInstanceLayerProperties', lambda: _loader_functions.EnumerateInstanceLayerProperties)
+define_lazy('EnumerateInstanceExtensionProperties', lambda: _loader_functions.EnumerateInstanceExtensionProperties)
+
+
+def __getattr__(name):
+    """
+        Create a lazy definition the first time it is accessed. The lazy
+        definitions it depends on are created first. Thread safe: the definition
+        is only removed once its value is in the module namespace.
+    """
+    with _lazy_lock:
+        # Another thread may have created it while this one waited for the lock
+        namespace = globals()
+        if name in namespace:
+            return namespace[name]
+
+        definition = _lazy_definitions.get(name)
+        if definition is None or name in _lazy_resolving:
+            raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+
+        _lazy_resolving.add(name)
+        try:
+            for dependency in definition.__code__.co_names:
+                if dependency in _lazy_definitions and dependency not in _lazy_resolving:
+                    __getattr__(dependency)
+
+            value = definition()
+            namespace[name] = value
+            del _lazy_definitions[name]
+        finally:
+            _lazy_resolving.discard(name)
+
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_definitions))
 
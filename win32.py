@@ -51,6 +51,7 @@ WS_MAXIMIZEBOX = 0x00010000
 WS_OVERLAPPEDWINDOW = WS_OVERLAPPED | WS_CAPTION | WS_SYSMENU | WS_THICKFRAME | WS_MINIMIZEBOX | WS_MAXIMIZEBOX
 
 SIZE_MAXIMIZED = 2
+SIZE_MINIMIZED = 1
 SIZE_RESTORED = 0
 
 CW_USEDEFAULT = 0x80000000
@@ -150,7 +151,7 @@ def wndproc(window, hwnd, msg, w, l):
             app.rotation[1] += (mouse_pos[0] - float(x)) * 1.25
 
         mouse_pos = (x,y)
-        app.update_uniform_buffers()
+        app.input_changed()
 
     elif msg in (WM_RBUTTONDOWN, WM_LBUTTONDOWN):
         x, y = float(c_short(l).value), float(c_short(l>>16).value)
@@ -160,10 +161,13 @@ def wndproc(window, hwnd, msg, w, l):
         app = window.app()
         wheel_delta = float(c_short(w>>16).value)
         app.zoom += wheel_delta*0.002
-        app.update_uniform_buffers()
+        app.input_changed()
 
     if msg == WM_SIZE:
         resize_target = c_short(l).value, c_short(l>>16).value
+        if w != SIZE_MINIMIZED:
+            window.size = resize_target
+
         if w in (SIZE_MAXIMIZED, SIZE_RESTORED):
             window.app().resize_display(*resize_target)
 
@@ -218,6 +222,7 @@ class Win32Window(object):
         self.__class_name = "VULKAN_TEST_"+str(id(self))
         self.__hwnd = None
         self.app = weakref.ref(app)
+        self.size = (0, 0)  # Client area size, tracked from the WM_SIZE messages
 
         mod = GetModuleHandleW(None)
 
@@ -247,6 +252,8 @@ class Win32Window(object):
             NULL, NULL, mod, NULL
         )
 
+        self.refresh_dimensions()
+
         # Process events
         asyncio.ensure_future(process_events(self.app))
 
@@ -263,9 +270,19 @@ class Win32Window(object):
         return self.__hwnd
 
     def dimensions(self):
+        """
+            Return the last known size of the window client area
+        """
+        return self.size
+
+    def refresh_dimensions(self):
+        """
+            Query the size of the window client area and return it
+        """
         dim = RECT()
         GetClientRect(self.__hwnd, byref(dim))
-        return (dim.right, dim.bottom)
+        self.size = (dim.right, dim.bottom)
+        return self.size
 
     def show(self):
         ShowWindow(self.__hwnd, SW_SHOWNORMAL)
@@ -274,6 +291,13 @@ class Win32Window(object):
         title = c_wchar_p(title)
         SetWindowTextW(self.__hwnd, title)
 
+    def process_queued_events(self):
+        # The messages are only read by `process_events`
+        pass
+
+    def schedule_queued_events(self):
+        pass
+
 
 class WinSwapchain(object):
 
@@ -210,6 +210,22 @@ xcb_poll_for_event = xcb.xcb_poll_for_event
 xcb_poll_for_event.restype = POINTER(xcb_generic_event_t)
 xcb_poll_for_event.argtypes = (xcb_connection_t,)
 
+xcb_poll_for_queued_event = xcb.xcb_poll_for_queued_event
+xcb_poll_for_queued_event.restype = POINTER(xcb_generic_event_t)
+xcb_poll_for_queued_event.argtypes = (xcb_connection_t,)
+
+xcb_get_file_descriptor = xcb.xcb_get_file_descriptor
+xcb_get_file_descriptor.restype = c_int
+xcb_get_file_descriptor.argtypes = (xcb_connection_t,)
+
+xcb_connection_has_error = xcb.xcb_connection_has_error
+xcb_connection_has_error.restype = c_int
+xcb_connection_has_error.argtypes = (xcb_connection_t,)
+
+xcb_send_event = xcb.xcb_send_event
+xcb_send_event.restype = xcb_void_cookie_t
+xcb_send_event.argtypes = (xcb_connection_t, c_ubyte, xcb_window_t, c_uint, c_void_p)
+
 xcb_intern_atom = xcb.xcb_intern_atom
 xcb_intern_atom.restype = xcb_intern_atom_cookie_t
 xcb_intern_atom.argtypes = (xcb_connection_t, c_ubyte, c_ushort, c_char_p)
@@ -234,25 +250,14 @@ mouse_pos = (0, 0)
 resize_target = (0, 0)
 
 def handle_event(window, event_ptr):
-    global mouse_buttons, mouse_pos, resize_target
+    global mouse_buttons, resize_target
 
     evt = event_ptr.contents.response_type & 0x7f
     if evt in (XCB_CLIENT_MESSAGE, XCB_DESTROY_NOTIFY):
         return False
     elif evt == XCB_MOTION_NOTIFY:
         motion_event = cast(event_ptr, POINTER(xcb_motion_notify_event_t)).contents
-        app = window.app()
-        x, y = float(motion_event.event_x), float(motion_event.event_y)
-        
-        if mouse_buttons['left']:
-            app.rotation[0] += (mouse_pos[1] - y) * 0.80 
-            app.rotation[1] += (mouse_pos[0] - x) * 0.80 
-
-        elif mouse_buttons['right']:
-            app.zoom += (mouse_pos[1] - y) * 0.005
-            
-        mouse_pos = (x, y)
-        app.update_uniform_buffers()
+        handle_motion(window, float(motion_event.event_x), float(motion_event.event_y))
     
     elif evt in (XCB_BUTTON_PRESS, XCB_BUTTON_RELEASE):
         press_event = cast(event_ptr, POINTER(xcb_button_press_event_t)).contents
@@ -268,26 +273,71 @@ def handle_event(window, event_ptr):
     elif evt == XCB_CONFIGURE_NOTIFY:
         resize_event = cast(event_ptr, POINTER(xcb_configure_notify_event_t)).contents
         width, height = resize_event.width, resize_event.height
+        window.size = (width, height)
         if width != resize_target[0] or height != resize_target[1]:
             window.app().resize_display(width, height)
 
         resize_target = (width, height)
     return True
 
-async def process_events(window):
-    listen_events = True
-    while listen_events:
+def handle_motion(window, x, y):
+    global mouse_pos
 
-        # Poll events until there are none left
-        event = xcb_poll_for_event(window.connection)
-        while event:
+    app = window.app()
+    if mouse_buttons['left']:
+        app.rotation[0] += (mouse_pos[1] - y) * 0.80 
+        app.rotation[1] += (mouse_pos[0] - x) * 0.80 
+
+    elif mouse_buttons['right']:
+        app.zoom += (mouse_pos[1] - y) * 0.005
+        
+    mouse_pos = (x, y)
+    app.input_changed()
+
+def process_events(window, poll=xcb_poll_for_event):
+    """
+        Handle every event of the connection, or only the events already in the
+        XCB queue with `poll=xcb_poll_for_queued_event`. The motion events of a batch are
+        coalesced: the rotation only depends on the first and the last pointer
+        positions, so only the last position is handled, once. A pending motion
+        is handled before any other event to keep the buttons state in order.
+    """
+    counters = window.counters
+    listen_events = True
+    motion = None
+    event = poll(window.connection)
+    while event:
+        counters['events'] += 1
+        if event.contents.response_type & 0x7f == XCB_MOTION_NOTIFY:
+            if motion is not None:
+                counters['coalesced'] += 1
+
+            motion_event = cast(event, POINTER(xcb_motion_notify_event_t)).contents
+            motion = (float(motion_event.event_x), float(motion_event.event_y))
+        else:
+            if motion is not None:
+                handle_motion(window, *motion)
+                motion = None
             listen_events &= handle_event(window, event)
-            free(event)
 
-            event = xcb_poll_for_event(window.connection)
+        free(event)
+        event = poll(window.connection)
+
+    if motion is not None:
+        handle_motion(window, *motion)
+
+    if not listen_events or xcb_connection_has_error(window.connection):
+        window.stop_events()
+        asyncio.ensure_future(close_window(window))
 
-        await asyncio.sleep(1/30)
+def read_events(window):
+    """
+        Reader callback of the connection socket: handle the events that woke up the loop
+    """
+    window.counters['wakeups'] += 1
+    process_events(window)
 
+async def close_window(window):
     app = window.app()
     if app is not None:
         app.running = False
@@ -352,18 +402,64 @@ class XlibWindow(object):
         self.window = window
         self.connection = connection
 
-        asyncio.ensure_future(process_events(self))
+        # The window size is then tracked from the configure notify events
+        self.size = (0, 0)
+        self.refresh_dimensions()
+
+        # The events are handled when the connection socket is readable
+        self.counters = {'wakeups': 0, 'queue_drains': 0, 'events': 0, 'coalesced': 0}
+        self.fd = xcb_get_file_descriptor(connection)
+        self.listening = True
+        self.loop = asyncio.get_event_loop()
+        self.loop.add_reader(self.fd, read_events, self)
+        self.queued_scheduled = False
+
+    def stop_events(self):
+        if self.listening:
+            self.listening = False
+            self.loop.remove_reader(self.fd)
+
+    def process_queued_events(self):
+        """
+            Handle the events already read in the XCB queue. The presentation engine and
+            the replies on the connection read the pending events into the queue without
+            making the socket readable, so the queue is drained after every frame.
+            Must be called by the event loop thread, see `schedule_queued_events`.
+        """
+        self.queued_scheduled = False
+        if self.listening:
+            self.counters['queue_drains'] += 1
+            process_events(self, xcb_poll_for_queued_event)
+
+    def schedule_queued_events(self):
+        """
+            Render thread: drain the XCB queue in the event loop thread after a frame
+        """
+        if not self.queued_scheduled:
+            self.queued_scheduled = True
+            self.loop.call_soon_threadsafe(self.process_queued_events)
 
     def __del__(self):
+        self.stop_events()
         xcb_destroy_window(self.connection, self.window)
         xcb_disconnect(self.connection)
 
     def dimensions(self):
+        """
+            Return the last known size of the window. No request is sent to the X server
+        """
+        return self.size
+
+    def refresh_dimensions(self):
+        """
+            Query the size of the window from the X server (round trip) and return it
+        """
         cookie = xcb_get_geometry(self.connection, self.window)
         geo_ptr = xcb_get_geometry_reply(self.connection, cookie, NULL)
         geo = geo_ptr.contents
+        self.size = (geo.width, geo.height)
         free(geo_ptr)
-        return (geo.width, geo.height)
+        return self.size
 
     def show(self):
         xcb_map_window(self.connection, self.window)
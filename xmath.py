@@ -31,6 +31,14 @@ class Mat4(Structure):
         self.r3[::] = data[2]
         self.r4[::] = data[3]
 
+    def as_array(self):
+        """
+            Return a float32 (4, 4) numpy array sharing the memory of the matrix.
+            Requires numpy.
+        """
+        from numpy.ctypeslib import as_array
+        return as_array((Mat4.rowtype*4).from_buffer(self))
+
 identity = [[1,0,0,0], [0,1,0,0], [0,0,1,0], [0,0,0,1]]
 vec_scalar_mult = lambda v, s: [i*s for i in v]
 vec_add = lambda v1, v2: [ i+j for i,j in zip(v1, v2) ]
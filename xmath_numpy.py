@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+# Numpy implementation of the xmath functions
+# The matrices are float32 4x4 arrays. Every function accepts an `out` array
+# (ex: the view returned by Mat4.as_array) and writes the result in place
+
+from math import tan, radians, sin, cos
+
+import numpy as np
+
+identity = np.identity(4, dtype=np.float32)
+identity.setflags(write=False)
+
+def perspective(fov, aspect, z_near, z_far, out=None):
+    if out is None:
+        out = np.empty((4, 4), dtype=np.float32)
+
+    tan_half_fov = tan(radians(fov)/2)
+
+    out.fill(0.0)
+    out[0, 0] = 1/(aspect*tan_half_fov)
+    out[1, 1] = 1/(tan_half_fov)
+    out[2, 3] = -1
+    out[2, 2] = z_far / (z_near - z_far)
+    out[3, 2] = -(z_far*z_near) / (z_far - z_near)
+
+    return out
+
+def translate(mat=None, vec=(0.0, 0.0, 0.0), out=None):
+    mat = identity if mat is None else mat
+    if out is None:
+        out = np.empty((4, 4), dtype=np.float32)
+
+    # Compute the translation row before `out` is written, `out` may be `mat`
+    row = np.dot(vec, mat[:3]) + mat[3]
+    if out is not mat:
+        out[:3] = mat[:3]
+    out[3] = row
+
+    return out
+
+def rotate(mat=None, angle=0, vec=(0.0, 0.0, 0.0), out=None):
+    mat = identity if mat is None else mat
+    if out is None:
+        out = np.empty((4, 4), dtype=np.float32)
+
+    a = radians(angle)
+    c = cos(a)
+    s = sin(a)
+    t = 1.0-c
+    x, y, z = vec
+
+    rot = np.array((
+        (c + t*x*x,     t*x*y + s*z,   t*x*z - s*y),
+        (t*y*x - s*z,   c + t*y*y,     t*y*z + s*x),
+        (t*z*x + s*y,   t*z*y - s*x,   c + t*z*z),
+    ), dtype=np.float32)
+
+    # Compute the rotated rows before `out` is written, `out` may be `mat`
+    rows = np.dot(rot, mat[:3])
+    out[3] = mat[3]
+    out[:3] = rows
+
+    return out
+
+# Batched versions. The matrices are (N, 4, 4) float32 blocks, ready to be copied
+# as is in a uniform or a storage buffer
+
+def as_block(mats):
+    """
+        Return a float32 (N, 4, 4) numpy array sharing the memory of a ctypes array of Mat4
+    """
+    return np.ctypeslib.as_array(mats).view(np.float32).reshape(len(mats), 4, 4)
+
+def identity_many(count, out=None):
+    if out is None:
+        out = np.empty((count, 4, 4), dtype=np.float32)
+    out[:] = identity
+    return out
+
+def translate_many(mats=None, vecs=((0.0, 0.0, 0.0),), out=None):
+    """
+        Translate every matrix of `mats` (N, 4, 4) by the matching row of `vecs` (N, 3).
+        `mats` defaults to N identity matrices.
+    """
+    vecs = np.asarray(vecs, dtype=np.float32)
+    count = len(vecs)
+    if mats is None:
+        mats = identity_many(count, out)
+    if out is None:
+        out = np.empty((count, 4, 4), dtype=np.float32)
+
+    # Compute the translation rows before `out` is written, `out` may be `mats`
+    rows = np.einsum('ni,nij->nj', vecs, mats[:, :3]) + mats[:, 3]
+    if out is not mats:
+        out[:, :3] = mats[:, :3]
+    out[:, 3] = rows
+
+    return out
+
+def rotation_many(angles, axes, out=None):
+    """
+        Build the (N, 4, 4) rotation matrices of `angles` (N,) in degrees around `axes` (N, 3).
+        A single axis (3,) is broadcasted to every angle.
+    """
+    a = np.radians(np.asarray(angles, dtype=np.float32))
+    count = len(a)
+    axes = np.broadcast_to(np.asarray(axes, dtype=np.float32), (count, 3))
+    if out is None:
+        out = np.empty((count, 4, 4), dtype=np.float32)
+
+    c = np.cos(a)
+    s = np.sin(a)
+    t = 1.0-c
+    x, y, z = axes[:, 0], axes[:, 1], axes[:, 2]
+
+    out[:, 0, 0] = c + t*x*x
+    out[:, 0, 1] = t*x*y + s*z
+    out[:, 0, 2] = t*x*z - s*y
+    out[:, 1, 0] = t*y*x - s*z
+    out[:, 1, 1] = c + t*y*y
+    out[:, 1, 2] = t*y*z + s*x
+    out[:, 2, 0] = t*z*x + s*y
+    out[:, 2, 1] = t*z*y - s*x
+    out[:, 2, 2] = c + t*z*z
+    out[:, :3, 3] = 0.0
+    out[:, 3] = (0.0, 0.0, 0.0, 1.0)
+
+    return out
+
+def rotate_many(mats=None, angles=(0.0,), axes=(0.0, 0.0, 0.0), out=None):
+    """
+        Rotate every matrix of `mats` (N, 4, 4) by the matching angle (N,) and axis (N, 3).
+        `mats` defaults to N identity matrices.
+    """
+    if mats is None:
+        return rotation_many(angles, axes, out)
+
+    return compose_many(rotation_many(angles, axes), mats, out=out)
+
+def compose_many(*mats, out=None):
+    """
+        Multiply the (N, 4, 4) blocks from left to right: compose_many(a, b, c) is a @ b @ c.
+        Blocks of shape (4, 4) are broadcasted to every matrix.
+    """
+    result = mats[0]
+    for mat in mats[1:]:
+        result = np.matmul(result, mat)
+
+    if out is None:
+        return np.array(result, dtype=np.float32)
+
+    out[:] = result
+    return out